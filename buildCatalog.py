@@ -0,0 +1,142 @@
+import argparse
+import concurrent.futures
+import os
+
+from common_utils import enum_converters, project_builds
+from classes.PblRecordManager import PblRecordManager
+from classes.StringStorage import StringStorage
+from classes.ObjectCatalog import ObjectCatalog
+from classes.ObjectStore import ObjectStore
+
+
+# PBL is needed for parsing .key files, which will be done by the PblRecordManager class
+# The file "pbl.dll" should be in the working directory, in the "bin" folder
+# Each worker process imports this module again, so it gets its own instance
+pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
+pbl_record_manager = PblRecordManager(pbl_dll_path)
+
+
+# Read the catalog information of all Objects in a Pool (run in a worker process)
+# Only the first 2 bytes of each Object are decompressed, to get its type
+### project_folder_path = Project path (folder with .db and .key files)
+### PoolID              = name of the Pool
+# * returns a list of tuples (ObjectID hash, data hash, type enum, file offset, compressed size, decompressed size)
+def get_pool_catalog_rows(project_folder_path, PoolID):
+    rows = []
+    
+    # Load all records from the .key file
+    pbl_records = pbl_record_manager.get_all_records(project_folder_path, PoolID)
+    
+    # Open the .db file once for all Objects
+    with open(os.path.join(project_folder_path, PoolID + '.db'), 'rb') as db_file:
+        for ObjectID_hash, pbl_data in pbl_records.items():
+            (db_file_position, compressed_size, decompressed_size) = PblRecordManager.parse_pbl_data(pbl_data)
+            compressed_data = PblRecordManager.get_compressed_object_data(db_file, db_file_position, compressed_size)
+            
+            # An Object which is too short to have a type is still cataloged
+            try:
+                object_type_enum = PblRecordManager.get_object_type_enum_from_compressed_data(compressed_data)
+            except Exception:
+                object_type_enum = None
+            
+            rows.append((ObjectID_hash, ObjectStore.get_data_hash(compressed_data), object_type_enum, db_file_position, compressed_size, decompressed_size))
+    
+    return rows
+
+
+# Add all Objects of all Pools of a Project to the catalog, replacing its previous ones (without committing them)
+# The Pools are read in parallel, the ObjectIDs are resolved in the main process (the strings database is only loaded once)
+### catalog             = instance of ObjectCatalog
+### string_storage      = instance of StringStorage, loaded from the target Project
+### project_folder_path = Project path (folder with .db and .key files)
+### executor            = pool of worker processes
+def catalog_project(catalog, string_storage, project_folder_path, executor):
+    project_name = os.path.basename(os.path.abspath(project_folder_path))
+    
+    pool_ids = project_builds.get_pool_ids(project_folder_path)
+    
+    # The Project is replaced completely, so Pools which were removed don't stay in the catalog
+    catalog.clear_project(project_name)
+    
+    futures = {executor.submit(get_pool_catalog_rows, project_folder_path, PoolID): PoolID for PoolID in pool_ids}
+    object_count = 0
+    for future in concurrent.futures.as_completed(futures):
+        PoolID = futures[future]
+        db_file_type = enum_converters.get_db_file_type(PoolID)
+        
+        rows = []
+        for (ObjectID_hash, data_hash, object_type_enum, db_file_position, compressed_size, decompressed_size) in future.result():
+            # The key of each record is the hash of the Object's name
+            ObjectID = string_storage.get_ascii_string(ObjectID_hash)
+            object_type = None if object_type_enum is None else enum_converters.object_types.get(object_type_enum)
+            rows.append((project_name, PoolID, db_file_type, ObjectID, ObjectID_hash, data_hash, object_type_enum, object_type, db_file_position, compressed_size, decompressed_size))
+        
+        catalog.add_objects(rows)
+        object_count += len(rows)
+    
+    print('Cataloged {} Objects from {} Pools of {}'.format(object_count, len(pool_ids), project_name))
+
+
+def buildCatalog_project(project_folder_path, catalog_file_path, jobs = None):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    # Create an instance of the StringStorage class, used for loading the strings database
+    # The strings database is unique to each project
+    string_storage = StringStorage(project_folder_path)
+    
+    catalog = ObjectCatalog(catalog_file_path)
+    project_builds.run_project_builds([project_folder_path], lambda project_path, executor: catalog_project(catalog, string_storage, project_path, executor), catalog, jobs)
+
+
+def buildCatalog_projects(projects_folder_path, catalog_file_path, jobs = None):
+    if not os.path.isdir(projects_folder_path):
+        raise RuntimeError('Must provide folder to all projects')
+    
+    catalog = ObjectCatalog(catalog_file_path)
+    
+    # Catalog a project, if it's valid
+    ### project_path = Project path (folder with .db and .key files)
+    ### executor     = pool of worker processes
+    def catalog_valid_project(project_path, executor):
+        # A valid project must contain string databases
+        # If an error occurs while trying to load them, the project is invalid
+        project_name = os.path.basename(project_path)
+        try:
+            string_storage = StringStorage(project_path)
+        except FileNotFoundError:
+            print('{}: Invalid project'.format(project_name))
+            if project_name == '_META':
+                print('    Did you accidentally provide a specific project folder instead of the folder with all projects?')
+            return
+        
+        catalog_project(catalog, string_storage, project_path, executor)
+    
+    # Only parse folders
+    project_paths = [os.path.join(projects_folder_path, x) for x in sorted(os.listdir(projects_folder_path)) if os.path.isdir(os.path.join(projects_folder_path, x))]
+    project_builds.run_project_builds(project_paths, catalog_valid_project, catalog, jobs)
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build an SQLite catalog of all Objects in MCD projects, without loading them')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # All Objects from all Pools of a project
+    parser_project = subparsers.add_parser('project', help='Catalog all Objects of a project')
+    parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('catalog_file_path', help='Path of the SQLite catalog (created if it doesn\'t exist, the project is replaced if it\'s already in it)')
+    parser_project.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_project.set_defaults(func=buildCatalog_project)
+    
+    # All Objects from all Pools of all projects
+    parser_all_projects = subparsers.add_parser('projects', help='Catalog all Objects of all projects')
+    parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
+    parser_all_projects.add_argument('catalog_file_path', help='Path of the SQLite catalog (created if it doesn\'t exist, the projects are replaced if they\'re already in it)')
+    parser_all_projects.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_all_projects.set_defaults(func=buildCatalog_projects)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)
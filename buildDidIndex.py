@@ -0,0 +1,175 @@
+import argparse
+import concurrent.futures
+import os
+
+from common_utils import object_hasher, project_builds
+from classes.DidIndex import DidIndex
+from dumpMWB import get_ecu_variant_map, get_ecu_variant_layer_data, get_mwb_keys_and_table, get_mwb_name_and_table_row_parameter_by_did
+from buildSymbolTables import get_worker_project
+
+
+# Get the DIDs of a variant, with the hash of each STRUCTURE
+### object_loader          = instance of ObjectLoader, with StringStorage instance loaded from the target Project
+### layer_data_objects     = list of "layer data" objects, for solving references which don't specify a PoolID
+### project_folder_path    = Project path (folder with .db and .key files)
+### ecu_variant_layer_data = "layer data" object of the variant
+# * returns a list of (DID, LONG-NAME, LONG-NAME-ID, STRUCTURE hash) tuples, or None if the variant has no MWBs
+def get_variant_dids(object_loader, layer_data_objects, project_folder_path, ecu_variant_layer_data):
+    mwb_keys_and_table_result = get_mwb_keys_and_table(object_loader, layer_data_objects, project_folder_path, ecu_variant_layer_data)
+    if mwb_keys_and_table_result is None:
+        return None
+    mwb_keys, mwb_table = mwb_keys_and_table_result
+    
+    dids = []
+    for mwb_did in mwb_keys:
+        # A missing table row (or one which isn't a STRUCTURE) is still indexed, without hash
+        structure_hash = None
+        table_row_result = get_mwb_name_and_table_row_parameter_by_did(object_loader, project_folder_path, mwb_keys, mwb_table, mwb_did)
+        if table_row_result is not None:
+            mwb_structure = table_row_result[2]['dop']
+            if type(mwb_structure) is dict and mwb_structure.get('type') == 'STRUCTURE':
+                structure_hash = object_hasher.get_object_hash(mwb_structure)
+        
+        dids.append((mwb_did, mwb_keys[mwb_did]['long_name'], mwb_keys[mwb_did]['long_name_id'], structure_hash))
+    return dids
+
+
+# Get the DIDs of a BASE-VARIANT and of each of its ECU-VARIANTs (run in a worker process)
+### project_folder_path = Project path (folder with .db and .key files)
+### PoolID              = name of the BASE-VARIANT Pool
+# * returns a list of (variant name, BASE-VARIANT name, DIDs) tuples (see get_variant_dids), without the variants which have no MWBs
+def get_base_variant_dids(project_folder_path, PoolID):
+    (object_loader, protocol_layer_data_list) = get_worker_project(project_folder_path)
+    
+    db_project_data = object_loader.load_object_by_id(project_folder_path, PoolID, '#RtGen_DB_PROJECT_DATA')
+    base_variant_name = db_project_data['ecu_base_variant_ref']['object_id']
+    base_variant_layer_data = object_loader.load_object_by_id(project_folder_path, PoolID, '#RtGen_DB_LAYER_DATA')
+    
+    # The BASE-VARIANT has its own MWBs too, like in dumpMWB
+    variants = [(base_variant_name, base_variant_layer_data)]
+    ecu_variant_map = get_ecu_variant_map(db_project_data) or {}
+    for ecu_variant_name, ecu_variant_reference in ecu_variant_map.items():
+        variants.append((ecu_variant_name, get_ecu_variant_layer_data(object_loader, project_folder_path, ecu_variant_reference)))
+    
+    results = []
+    for (variant_name, variant_layer_data) in variants:
+        layer_data_objects = [variant_layer_data, base_variant_layer_data] + protocol_layer_data_list
+        dids = get_variant_dids(object_loader, layer_data_objects, project_folder_path, variant_layer_data)
+        if dids is not None:
+            results.append((variant_name, base_variant_name, dids))
+    return results
+
+
+# Build the DIDs of a Project into the index, replacing its previous ones (without committing them)
+# The BASE-VARIANTs are parsed in parallel, the index is written in the main process
+### project_folder_path = Project path (folder with .db and .key files)
+### did_index           = instance of DidIndex
+### executor            = pool of worker processes
+def build_project_dids(project_folder_path, did_index, executor):
+    project_name = os.path.basename(os.path.abspath(project_folder_path))
+    pool_ids = project_builds.get_pool_ids(project_folder_path, 'Base Variant')
+    
+    did_index.clear_project(project_name)
+    
+    futures = {executor.submit(get_base_variant_dids, project_folder_path, PoolID): PoolID for PoolID in pool_ids}
+    variant_count = 0
+    did_count = 0
+    for future in concurrent.futures.as_completed(futures):
+        for (variant_name, base_variant_name, dids) in future.result():
+            did_index.add_variant(project_name, base_variant_name, variant_name, dids)
+            variant_count += 1
+            did_count += len(dids)
+    
+    print('Indexed {} DIDs of {} variants from {} BASE-VARIANTs of {}'.format(did_count, variant_count, len(pool_ids), project_name))
+
+
+# Build the index, one Project at a time (see project_builds.run_project_builds)
+### project_folder_paths = list of Project paths
+### index_file_path      = path of the SQLite index
+### jobs                 = number of worker processes (None = number of CPUs)
+def run_build(project_folder_paths, index_file_path, jobs):
+    did_index = DidIndex(index_file_path)
+    project_builds.run_project_builds(project_folder_paths, lambda project_folder_path, executor: build_project_dids(project_folder_path, did_index, executor), did_index, jobs)
+
+
+# Display rows of the index
+### rows = list of rows returned by DidIndex
+def print_rows(rows):
+    for (project_name, base_variant_name, variant_name, did, long_name, long_name_id, structure_hash) in rows:
+        print('{} {} {} 0x{:04X} {} - {} {}'.format(project_name, base_variant_name, variant_name, did, long_name_id, long_name, structure_hash))
+
+
+def buildDidIndex_project(project_folder_path, index_file_path, jobs = None):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    run_build([project_folder_path], index_file_path, jobs)
+
+
+def buildDidIndex_projects(projects_folder_path, index_file_path, jobs = None):
+    if not os.path.isdir(projects_folder_path):
+        raise RuntimeError('Must provide folder to all projects')
+    
+    run_build(project_builds.get_project_folder_paths(projects_folder_path), index_file_path, jobs)
+
+
+def buildDidIndex_did(index_file_path, did, project_name = None):
+    if not os.path.isfile(index_file_path):
+        raise RuntimeError('DID index not found: {}'.format(index_file_path))
+    
+    did_index = DidIndex(index_file_path)
+    rows = did_index.find_did(int(did, 16), project_name)
+    if len(rows) == 0:
+        print('DID {} is not defined by any variant'.format(did))
+    print_rows(rows)
+    did_index.close()
+
+
+def buildDidIndex_structure(index_file_path, structure_hash):
+    if not os.path.isfile(index_file_path):
+        raise RuntimeError('DID index not found: {}'.format(index_file_path))
+    
+    did_index = DidIndex(index_file_path)
+    rows = did_index.find_structure(structure_hash)
+    if len(rows) == 0:
+        print('No DID has STRUCTURE {}'.format(structure_hash))
+    print_rows(rows)
+    did_index.close()
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build an index of the MWB DIDs of all variants of MCD projects, for finding which variants define a DID (and with which STRUCTURE)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # All variants of a project
+    parser_project = subparsers.add_parser('project', help='Index the DIDs of a project')
+    parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('index_file_path', help='Path of the SQLite index (created if it doesn\'t exist, the project is replaced if it was indexed before)')
+    parser_project.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_project.set_defaults(func=buildDidIndex_project)
+    
+    # All variants of all projects, in the same index
+    parser_all_projects = subparsers.add_parser('projects', help='Index the DIDs of all projects')
+    parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
+    parser_all_projects.add_argument('index_file_path', help='Path of the SQLite index (created if it doesn\'t exist, each project is replaced if it was indexed before)')
+    parser_all_projects.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_all_projects.set_defaults(func=buildDidIndex_projects)
+    
+    # Variants which define a DID
+    parser_did = subparsers.add_parser('did', help='Find all variants which define a DID')
+    parser_did.add_argument('index_file_path', help='Path of the SQLite index')
+    parser_did.add_argument('did', help='UDS DID, specified as two HEX bytes')
+    parser_did.add_argument('--project', dest='project_name', default=None, help='Only search this project')
+    parser_did.set_defaults(func=buildDidIndex_did)
+    
+    # DIDs which share a STRUCTURE
+    parser_structure = subparsers.add_parser('structure', help='Find all DIDs (of all variants) with the same STRUCTURE')
+    parser_structure.add_argument('index_file_path', help='Path of the SQLite index')
+    parser_structure.add_argument('structure_hash', help='Hash of the STRUCTURE, as displayed by the "did" command')
+    parser_structure.set_defaults(func=buildDidIndex_structure)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)
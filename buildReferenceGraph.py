@@ -0,0 +1,184 @@
+import argparse
+import concurrent.futures
+import os
+import struct
+import time
+import traceback
+
+from common_utils import common_loaders, enum_converters
+from classes.PblRecordManager import PblRecordManager
+from classes.ObjectLoader import ObjectLoader
+from classes.ObjectLocator import ObjectLocator
+from classes.StringStorage import StringStorage
+from classes.ReferenceGraph import ReferenceGraph
+
+
+# Import the `__all__` list from the "__init__.py" module of the "object_loaders" package as the list of supported Objects to unpack
+from object_loaders import __all__ as supported_object_types
+
+
+# PBL is needed for parsing .key files, which will be done by the PblRecordManager class
+# The file "pbl.dll" should be in the working directory, in the "bin" folder
+# Each worker process imports this module again, so it gets its own instance
+pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
+pbl_record_manager = PblRecordManager(pbl_dll_path)
+
+
+# StringStorage of the Project, loaded once in each worker process
+worker_string_storage = None
+
+
+# Load the strings database in a worker process
+### project_folder_path = Project path (folder with .db and .key files)
+def init_worker(project_folder_path):
+    global worker_string_storage
+    worker_string_storage = StringStorage(project_folder_path)
+
+
+# Load all Objects of a Pool and get the references of each one (run in a worker process)
+### project_folder_path = Project path (folder with .db and .key files)
+### PoolID              = name of the Pool
+# * returns a list of (ObjectID, references) tuples, and a list of (ObjectID, error) tuples for the Objects which failed to load
+def get_pool_references(project_folder_path, PoolID):
+    object_loader = ObjectLoader(None, worker_string_storage)
+    pool_references = []
+    failures = []
+    
+    # Load all records from the .key file
+    pbl_records = pbl_record_manager.get_all_records(project_folder_path, PoolID)
+    
+    # Open the .db file once for all Objects
+    with open(os.path.join(project_folder_path, PoolID + '.db'), 'rb') as db_file:
+        for ObjectID_hash, pbl_data in pbl_records.items():
+            ObjectID = worker_string_storage.get_ascii_string(ObjectID_hash)
+            
+            try:
+                object_data = ObjectLoader.get_object_data_from_opened_db_file(pbl_data, db_file)
+                
+                # Only attempt to parse known object types
+                object_type = enum_converters.object_types.get(struct.unpack('<H', object_data[:2])[0])
+                if object_type not in supported_object_types:
+                    continue
+                
+                # All references loaded along with the Object are recorded
+                common_loaders.start_recording_references()
+                object_loader.load_object_by_object_data(object_data)
+                pool_references.append((ObjectID, common_loaders.stop_recording_references()))
+            except Exception as e:
+                common_loaders.stop_recording_references()
+                failures.append((ObjectID, '{}: {}'.format(type(e).__name__, e)))
+    
+    return (pool_references, failures)
+
+
+# Build the reference graph of a Project
+# The Pools are loaded in parallel, and references without PoolID are resolved if a single Pool contains the referenced Object
+### project_folder_path = Project path (folder with .db and .key files)
+### graph_file_path     = path of the graph file
+### jobs                = number of worker processes (None = number of CPUs)
+def build_reference_graph(project_folder_path, graph_file_path, jobs = None):
+    # The PoolID simply refers to the file's name (without extension)
+    pool_ids = []
+    for current_filename in sorted(os.listdir(project_folder_path)):
+        (PoolID, extension) = os.path.splitext(current_filename)
+        if extension == '.db' and os.path.isfile(os.path.join(project_folder_path, current_filename)):
+            pool_ids.append(PoolID)
+    
+    # Needed for finding the Pools of references without PoolID
+    string_storage = StringStorage(project_folder_path)
+    object_locator = ObjectLocator(pbl_record_manager, project_folder_path)
+    
+    graph = ReferenceGraph()
+    failure_count = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(project_folder_path,)) as executor:
+        futures = {executor.submit(get_pool_references, project_folder_path, PoolID): PoolID for PoolID in pool_ids}
+        for future in concurrent.futures.as_completed(futures):
+            PoolID = futures[future]
+            (pool_references, failures) = future.result()
+            
+            for (ObjectID, references) in pool_references:
+                resolved_references = []
+                for (referenced_PoolID, referenced_ObjectID) in references:
+                    if referenced_ObjectID is None:
+                        continue
+                    if referenced_PoolID is None:
+                        candidate_pool_ids = object_locator.get_pool_ids(string_storage.get_ascii_hash(referenced_ObjectID))
+                        if len(candidate_pool_ids) == 1:
+                            referenced_PoolID = candidate_pool_ids[0]
+                    resolved_references.append((referenced_PoolID, referenced_ObjectID))
+                graph.add_references(PoolID, ObjectID, resolved_references)
+            
+            for (ObjectID, error) in failures:
+                print('Failed to load {} from {}: {}'.format(ObjectID, PoolID, error))
+            failure_count += len(failures)
+    
+    graph.save(graph_file_path)
+    
+    (object_count, reference_count) = graph.get_size()
+    print('{} Objects, {} references ({} Objects failed to load)'.format(object_count, reference_count, failure_count))
+
+
+def buildReferenceGraph_project(project_folder_path, graph_file_path, jobs = None):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    # Get the starting timestamp
+    start_time = time.time()
+    
+    # Run the app
+    # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
+    try:
+        build_reference_graph(project_folder_path, graph_file_path, jobs)
+    except:
+        print('Error:\n{}'.format(traceback.format_exc()))
+    
+    # Get the elapsed time and split it into hours, minutes, seconds
+    elapsed_seconds = time.time() - start_time
+    (hours, remainder) = divmod(elapsed_seconds, 3600)
+    (minutes, seconds) = divmod(remainder, 60)
+    
+    # Display the time taken by the script to run
+    print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
+
+
+def buildReferenceGraph_references(graph_file_path, pool_id, object_id):
+    for (PoolID, ObjectID) in ReferenceGraph.load(graph_file_path).get_references(pool_id, object_id):
+        print('{} {}'.format(PoolID, ObjectID))
+
+
+def buildReferenceGraph_referencing(graph_file_path, pool_id, object_id, recursive = False):
+    for (PoolID, ObjectID) in ReferenceGraph.load(graph_file_path).get_referencing_objects(pool_id, object_id, recursive):
+        print('{} {}'.format(PoolID, ObjectID))
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build and query a graph of the references between all Objects of an MCD project')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # Build the graph of a project
+    parser_project = subparsers.add_parser('project', help='Load all Objects of a project and save the graph of their references')
+    parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('graph_file_path', help='Path of the graph file')
+    parser_project.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_project.set_defaults(func=buildReferenceGraph_project)
+    
+    # Objects referenced by an Object
+    parser_references = subparsers.add_parser('references', help='List the Objects referenced by an Object')
+    parser_references.add_argument('graph_file_path', help='Path of the graph file')
+    parser_references.add_argument('pool_id', help='PoolID of the Object (filename without extension)')
+    parser_references.add_argument('object_id', help='ObjectID of the Object')
+    parser_references.set_defaults(func=buildReferenceGraph_references)
+    
+    # Objects referencing an Object
+    parser_referencing = subparsers.add_parser('referencing', help='List the Objects which reference an Object')
+    parser_referencing.add_argument('graph_file_path', help='Path of the graph file')
+    parser_referencing.add_argument('pool_id', help='PoolID of the Object (filename without extension)')
+    parser_referencing.add_argument('object_id', help='ObjectID of the Object')
+    parser_referencing.add_argument('--recursive', action='store_true', help='Also list the Objects which reference those, and so on')
+    parser_referencing.set_defaults(func=buildReferenceGraph_referencing)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)
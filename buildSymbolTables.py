@@ -0,0 +1,152 @@
+import argparse
+import concurrent.futures
+import os
+
+from common_utils import project_builds
+from classes.StringStorage import StringStorage
+from classes.ObjectLoader import ObjectLoader
+from classes.SymbolTable import SymbolTable
+from dumpMWB import pbl_record_manager, get_protocol_layer_data_list, get_protocol_layer_pool_ids, get_ecu_variant_map, get_ecu_variant_layer_data
+
+
+# Extension of the symbol table of each Project, when building them for all Projects
+symbol_table_extension = '.symbols.sqlite'
+
+
+# ObjectLoader and protocol "layer data" objects of the Project currently flattened by a worker process, as (project_folder_path, object_loader, protocol_layer_data_list)
+worker_project = (None, None, None)
+
+
+# Get the ObjectLoader and the protocol "layer data" objects of a Project in a worker process
+# They are the same for all BASE-VARIANTs, so they're only loaded once per Project
+### project_folder_path = Project path (folder with .db and .key files)
+def get_worker_project(project_folder_path):
+    global worker_project
+    if worker_project[0] != project_folder_path:
+        object_loader = ObjectLoader(pbl_record_manager, StringStorage(project_folder_path))
+        worker_project = (project_folder_path, object_loader, get_protocol_layer_data_list(object_loader, project_folder_path))
+    return worker_project[1:]
+
+
+# Flatten the symbols of a BASE-VARIANT and of each of its ECU-VARIANTs (run in a worker process)
+### project_folder_path = Project path (folder with .db and .key files)
+### PoolID              = name of the BASE-VARIANT Pool
+# * returns a list of (variant name, BASE-VARIANT name, symbols) tuples (see SymbolTable.flatten_layers)
+def get_base_variant_symbols(project_folder_path, PoolID):
+    (object_loader, protocol_layer_data_list) = get_worker_project(project_folder_path)
+    
+    db_project_data = object_loader.load_object_by_id(project_folder_path, PoolID, '#RtGen_DB_PROJECT_DATA')
+    base_variant_name = db_project_data['ecu_base_variant_ref']['object_id']
+    base_variant_layer_data = object_loader.load_object_by_id(project_folder_path, PoolID, '#RtGen_DB_LAYER_DATA')
+    
+    # The PoolID of each layer is needed to know which layers don't inherit some names
+    protocol_pool_ids = get_protocol_layer_pool_ids(protocol_layer_data_list)
+    
+    # The BASE-VARIANT has its own symbols too, it's resolved through itself and the protocols
+    variants = [(base_variant_name, SymbolTable.flatten_layers([base_variant_layer_data] + protocol_layer_data_list, [PoolID] + protocol_pool_ids))]
+    
+    # The layers are in the same order as when the dumpers resolve references without PoolID
+    ecu_variant_map = get_ecu_variant_map(db_project_data) or {}
+    for ecu_variant_name, ecu_variant_reference in ecu_variant_map.items():
+        ecu_variant_layer_data = get_ecu_variant_layer_data(object_loader, project_folder_path, ecu_variant_reference)
+        ecu_variant_PoolID = ObjectLoader.decode_object_reference(ecu_variant_reference)[0]
+        variants.append((ecu_variant_name, SymbolTable.flatten_layers([ecu_variant_layer_data, base_variant_layer_data] + protocol_layer_data_list, [ecu_variant_PoolID, PoolID] + protocol_pool_ids)))
+    
+    return [(variant_name, base_variant_name, symbols) for (variant_name, symbols) in variants]
+
+
+# Build the symbol table of a Project, replacing its previous contents
+# The BASE-VARIANTs are flattened in parallel, the table is written in the main process
+# Each Project has its own table, which is only saved if the whole Project was flattened
+### project  = (Project path, path of the SQLite symbol table)
+### executor = pool of worker processes
+def build_symbol_table(project, executor):
+    (project_folder_path, symbol_table_file_path) = project
+    project_name = os.path.basename(os.path.abspath(project_folder_path))
+    pool_ids = project_builds.get_pool_ids(project_folder_path, 'Base Variant')
+    
+    symbol_table = SymbolTable(symbol_table_file_path)
+    try:
+        symbol_table.clear()
+        
+        futures = {executor.submit(get_base_variant_symbols, project_folder_path, PoolID): PoolID for PoolID in pool_ids}
+        variant_count = 0
+        symbol_count = 0
+        for future in concurrent.futures.as_completed(futures):
+            for (variant_name, base_variant_name, symbols) in future.result():
+                symbol_table.add_variant(variant_name, base_variant_name, symbols)
+                variant_count += 1
+                symbol_count += sum(len(x) for x in symbols.values())
+    except:
+        symbol_table.rollback()
+        symbol_table.close()
+        raise
+    
+    # Save the Project all at once, so the table never contains only part of it
+    symbol_table.close()
+    print('Flattened {} symbols of {} variants from {} BASE-VARIANTs of {}'.format(symbol_count, variant_count, len(pool_ids), project_name))
+
+
+def buildSymbolTables_project(project_folder_path, symbol_table_file_path, jobs = None):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    project_builds.run_project_builds([(project_folder_path, symbol_table_file_path)], build_symbol_table, None, jobs)
+
+
+def buildSymbolTables_projects(projects_folder_path, output_folder_path, jobs = None):
+    if not os.path.isdir(projects_folder_path):
+        raise RuntimeError('Must provide folder to all projects')
+    
+    # Each project gets its own symbol table, named like it
+    projects = [(x, os.path.join(output_folder_path, os.path.basename(x) + symbol_table_extension)) for x in project_builds.get_project_folder_paths(projects_folder_path)]
+    project_builds.run_project_builds(projects, build_symbol_table, None, jobs)
+
+
+def buildSymbolTables_resolve(symbol_table_file_path, variant, kind, name):
+    if not os.path.isfile(symbol_table_file_path):
+        raise RuntimeError('Symbol table not found: {}'.format(symbol_table_file_path))
+    
+    symbol_table = SymbolTable(symbol_table_file_path)
+    reference = symbol_table.resolve(variant, kind, name)
+    if reference is None:
+        if symbol_table.get_base_variant_name(variant) is None:
+            print('Unknown variant: {}'.format(variant))
+        else:
+            print('{} {} is not visible from {}'.format(kind, name, variant))
+    else:
+        print('{} {}'.format(*reference))
+    symbol_table.close()
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build flattened per-variant symbol tables of MCD projects, for resolving names without loading any layer data')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # All variants of a project
+    parser_project = subparsers.add_parser('project', help='Build the symbol table of a project')
+    parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('symbol_table_file_path', help='Path of the SQLite symbol table (created if it doesn\'t exist, replaced if it does)')
+    parser_project.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_project.set_defaults(func=buildSymbolTables_project)
+    
+    # All variants of all projects, one table per project
+    parser_all_projects = subparsers.add_parser('projects', help='Build the symbol tables of all projects')
+    parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
+    parser_all_projects.add_argument('output_folder_path', help='Output folder, each project\'s table is named "<project>{}"'.format(symbol_table_extension))
+    parser_all_projects.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_all_projects.set_defaults(func=buildSymbolTables_projects)
+    
+    # Resolve a single name
+    parser_resolve = subparsers.add_parser('resolve', help='Resolve a name visible from a variant to its PoolID and ObjectID')
+    parser_resolve.add_argument('symbol_table_file_path', help='Path of the SQLite symbol table')
+    parser_resolve.add_argument('variant', help='Name of the ECU-VARIANT or BASE-VARIANT')
+    parser_resolve.add_argument('kind', choices=list(SymbolTable.kinds), help='Kind of symbol')
+    parser_resolve.add_argument('name', help='Name of the symbol (e.g. the ObjectID of a DOP reference without PoolID)')
+    parser_resolve.set_defaults(func=buildSymbolTables_resolve)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)
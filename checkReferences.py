@@ -0,0 +1,243 @@
+import argparse
+import concurrent.futures
+import os
+import struct
+import sys
+import time
+import traceback
+
+from common_utils import common_loaders, enum_converters, project_builds
+from classes.PblRecordManager import PblRecordManager
+from classes.ObjectLoader import ObjectLoader
+from classes.StringStorage import StringStorage
+from dumpMWB import get_protocol_layer_data_list, get_protocol_pool_ids
+
+
+# Import the `__all__` list from the "__init__.py" module of the "object_loaders" package as the list of supported Objects to unpack
+from object_loaders import __all__ as supported_object_types
+
+
+# PBL is needed for parsing .key files, which will be done by the PblRecordManager class
+# The file "pbl.dll" should be in the working directory, in the "bin" folder
+# Each worker process imports this module again, so it gets its own instance
+pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
+pbl_record_manager = PblRecordManager(pbl_dll_path)
+
+
+# StringStorage of the Project currently checked by a worker process, as (project_folder_path, string_storage)
+worker_string_storage = (None, None)
+
+
+# Get the StringStorage of a Project in a worker process
+### project_folder_path = Project path (folder with .db and .key files)
+def get_worker_string_storage(project_folder_path):
+    global worker_string_storage
+    if worker_string_storage[0] != project_folder_path:
+        worker_string_storage = (project_folder_path, StringStorage(project_folder_path))
+    return worker_string_storage[1]
+
+
+# Get the DOP reference map of a "layer data" object, as name -> (PoolID, ObjectID)
+# References without PoolID are resolved through it, like in ObjectLoader.resolve_DOP_reference
+### layer_data = loaded DB_LAYER_DATA object
+def get_layer_data_reference_map(layer_data):
+    reference_map = {}
+    for item in layer_data['dop_refs_map']:
+        reference_map.setdefault(item['map_key'], (item['reference']['pool_id'], item['reference']['object_id']))
+    return reference_map
+
+
+# Load all Objects of a Pool and get their references (run in a worker process)
+### project_folder_path = Project path (folder with .db and .key files)
+### PoolID              = name of the Pool
+# * returns a dictionary with the ObjectID hashes of all Objects in the Pool, the references of each Object,
+#   the reference maps and parent layers of each "layer data" object, and the Objects which failed to load
+def get_pool_references(project_folder_path, PoolID):
+    string_storage = get_worker_string_storage(project_folder_path)
+    object_loader = ObjectLoader(None, string_storage)
+    pool_info = {'keys': [], 'references': [], 'layer_data': [], 'failures': []}
+    
+    pbl_records = pbl_record_manager.get_all_records(project_folder_path, PoolID)
+    pool_info['keys'] = list(pbl_records)
+    
+    # Open the .db file once for all Objects
+    with open(os.path.join(project_folder_path, PoolID + '.db'), 'rb') as db_file:
+        for ObjectID_hash, pbl_data in pbl_records.items():
+            ObjectID = string_storage.get_ascii_string(ObjectID_hash)
+            
+            try:
+                object_data = ObjectLoader.get_object_data_from_opened_db_file(pbl_data, db_file)
+                
+                # Only attempt to parse known object types
+                object_type = enum_converters.object_types.get(struct.unpack('<H', object_data[:2])[0])
+                if object_type not in supported_object_types:
+                    continue
+                
+                # All references loaded along with the Object are recorded
+                common_loaders.start_recording_references()
+                obj = object_loader.load_object_by_object_data(object_data)
+                pool_info['references'].append((ObjectID, common_loaders.stop_recording_references()))
+                
+                # "Layer data" objects are needed for resolving references without PoolID
+                if object_type == 'DB_LAYER_DATA':
+                    pool_info['layer_data'].append((get_layer_data_reference_map(obj), obj['parent_layers_vector']))
+            except Exception as e:
+                common_loaders.stop_recording_references()
+                pool_info['failures'].append((ObjectID, '{}: {}'.format(type(e).__name__, e)))
+    
+    return pool_info
+
+
+# Check all references of a Project, displaying each dangling one
+### project_folder_path = Project path (folder with .db and .key files)
+### executor            = pool of worker processes
+# * returns the number of dangling references
+def check_project(project_folder_path, executor):
+    project_name = os.path.basename(os.path.abspath(project_folder_path))
+    string_storage = StringStorage(project_folder_path)
+    pool_ids = project_builds.get_pool_ids(project_folder_path)
+    
+    # The protocol "layer data" objects are searched last for references without PoolID, in the same order as by the dumpers
+    protocol_layer_data_list = get_protocol_layer_data_list(ObjectLoader(pbl_record_manager, string_storage), project_folder_path)
+    protocol_reference_maps = [get_layer_data_reference_map(x) for x in protocol_layer_data_list]
+    protocol_pool_ids = get_protocol_pool_ids(protocol_layer_data_list)
+    
+    # Load all Pools in parallel
+    # The keys of all Pools are collected along the way, so the targets of references never need to be loaded
+    pool_infos = {}
+    futures = {executor.submit(get_pool_references, project_folder_path, PoolID): PoolID for PoolID in pool_ids}
+    for future in concurrent.futures.as_completed(futures):
+        pool_infos[futures[future]] = future.result()
+    keys = {PoolID: set(pool_info['keys']) for PoolID, pool_info in pool_infos.items()}
+    
+    # Get the DOP reference maps of a Pool and of its parent layers, in order of relevance (like for the ECU-VARIANT, BASE-VARIANT, protocol)
+    # The protocol layers always come last, so they're skipped among the parent layers
+    layer_chains = {}
+    def get_layer_chain(PoolID):
+        if PoolID not in layer_chains:
+            layer_chain = []
+            chain_pool_ids = [PoolID]
+            index = 0
+            while index < len(chain_pool_ids):
+                for (reference_map, parent_layers) in pool_infos.get(chain_pool_ids[index], {'layer_data': []})['layer_data']:
+                    layer_chain.append(reference_map)
+                    chain_pool_ids += [x for x in parent_layers if x not in chain_pool_ids and x not in protocol_pool_ids]
+                index += 1
+            layer_chains[PoolID] = layer_chain + protocol_reference_maps
+        return layer_chains[PoolID]
+    
+    # Check whether the target of a reference exists
+    # * returns the reason why it's dangling, or None
+    def check_target(target_PoolID, target_ObjectID):
+        if target_PoolID not in keys:
+            return 'missing Pool'
+        if string_storage.get_ascii_hash(target_ObjectID) not in keys[target_PoolID]:
+            return 'missing Object'
+        return None
+    
+    dangling_count = 0
+    for PoolID in pool_ids:
+        pool_info = pool_infos[PoolID]
+        for (ObjectID, error) in pool_info['failures']:
+            print('{}/{} {}: failed to load: {}'.format(project_name, PoolID, ObjectID, error))
+        
+        for (ObjectID, references) in pool_info['references']:
+            for (target_PoolID, target_ObjectID) in references:
+                # Empty references are allowed
+                if target_ObjectID is None:
+                    continue
+                
+                # References without PoolID are resolved through the reference maps of the "layer data" objects
+                if target_PoolID is None:
+                    resolved_reference = None
+                    for reference_map in get_layer_chain(PoolID):
+                        if target_ObjectID in reference_map:
+                            resolved_reference = reference_map[target_ObjectID]
+                            break
+                    
+                    if resolved_reference is None:
+                        ObjectID_hash = string_storage.get_ascii_hash(target_ObjectID)
+                        candidate_pool_ids = [x for x in pool_ids if ObjectID_hash in keys[x]]
+                        reason = 'not in DOP reference maps (found in {} Pools: {})'.format(len(candidate_pool_ids), ', '.join(candidate_pool_ids))
+                    else:
+                        reason = check_target(*resolved_reference)
+                        if reason is not None:
+                            reason = 'resolved to {} {}: {}'.format(resolved_reference[0], resolved_reference[1], reason)
+                else:
+                    reason = check_target(target_PoolID, target_ObjectID)
+                
+                if reason is not None:
+                    print('{}/{} {} -> {} {}: {}'.format(project_name, PoolID, ObjectID, target_PoolID, target_ObjectID, reason))
+                    dangling_count += 1
+    
+    print('{}: {} dangling references'.format(project_name, dangling_count))
+    return dangling_count
+
+
+# Run the check, displaying the elapsed time even if an error occurs
+### project_folder_paths = list of Project paths (folders with .db and .key files)
+### jobs                 = number of worker processes (None = number of CPUs)
+def run_check(project_folder_paths, jobs):
+    # Get the starting timestamp
+    start_time = time.time()
+    
+    # Run the app
+    # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
+    dangling_count = None
+    try:
+        # The worker processes are shared by all projects
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            dangling_count = 0
+            for project_folder_path in project_folder_paths:
+                dangling_count += check_project(project_folder_path, executor)
+    except:
+        print('Error:\n{}'.format(traceback.format_exc()))
+    
+    # Get the elapsed time and split it into hours, minutes, seconds
+    elapsed_seconds = time.time() - start_time
+    (hours, remainder) = divmod(elapsed_seconds, 3600)
+    (minutes, seconds) = divmod(remainder, 60)
+    
+    # Display the time taken by the script to run
+    print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
+    
+    # Exit with an error if anything was found, so the script can be used as a health check
+    if dangling_count != 0:
+        sys.exit(1)
+
+
+def checkReferences_project(project_folder_path, jobs = None):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    run_check([project_folder_path], jobs)
+
+
+def checkReferences_projects(projects_folder_path, jobs = None):
+    if not os.path.isdir(projects_folder_path):
+        raise RuntimeError('Must provide folder to all projects')
+    
+    run_check(project_builds.get_project_folder_paths(projects_folder_path), jobs)
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find references to Objects which don\'t exist in MCD projects')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # All references of a project
+    parser_project = subparsers.add_parser('project', help='Check all references of a project')
+    parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_project.set_defaults(func=checkReferences_project)
+    
+    # All references of all projects
+    parser_all_projects = subparsers.add_parser('projects', help='Check all references of all projects')
+    parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
+    parser_all_projects.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_all_projects.set_defaults(func=checkReferences_projects)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)
@@ -0,0 +1,261 @@
+import os
+import sqlite3
+
+
+class DefinitionDatabase:
+    # Columns of a parameter row (see `flatten_structure`), without the structure
+    parameter_columns = ['position', 'parent_position', 'path', 'type', 'parameter_type', 'long_name', 'long_name_id', 'description', 'byte_position', 'bit_position', 'dop_type', 'diag_coded_type', 'coded_base_data_type', 'physical_base_data_type', 'bit_length', 'bit_mask', 'endianness', 'compu_category', 'compu_default_value', 'display_radix', 'unit', 'error']
+    
+    # Columns of a COMPU-SCALE row (see `flatten_structure`), without the structure
+    # The LIMITs are coded values (if the COMPU-SCALE has both coded and physical LIMITs, the physical ones are stored separately)
+    compu_scale_columns = ['position', 'scale_index', 'lower_limit', 'upper_limit', 'physical_lower_limit', 'physical_upper_limit', 'text', 'long_name_id', 'formula', 'compu_const']
+    
+    # Columns of a UNIT row, without its ID
+    unit_columns = ['long_name', 'long_name_id', 'description', 'display_name', 'factor_si_to_unit', 'offset_si_to_unit']
+    
+    
+    # Convert a value of a parsed object to a value which can be stored in SQLite
+    ### value = simple value (e.g. integer, string, bytearray)
+    @staticmethod
+    def to_column_value(value):
+        if value is None or type(value) in (int, float, str, bytes):
+            return value
+        if type(value) is bytearray:
+            return bytes(value)
+        return str(value)
+    
+    
+    # Get a LIMIT of a COMPU-SCALE, which is stored differently depending on the COMPU-METHOD's CATEGORY
+    ### compu_scale = parsed COMPU-SCALE
+    ### names       = names of the LIMIT, in order of preference (e.g. 'lower_limit', 'coded_lower_limit')
+    @staticmethod
+    def get_compu_scale_limit(compu_scale, names):
+        for name in names:
+            if name not in compu_scale:
+                continue
+            
+            # LIMITs with type (e.g. for LINEAR) are dictionaries
+            limit = compu_scale[name]
+            if type(limit) is dict:
+                return limit['value']
+            return limit
+        return None
+    
+    
+    # Flatten a parsed STRUCTURE into rows, one for each item (PARAM, STRUCTURE, FIELD, MUX, CASE, ...)
+    # Each row refers to its parent by position, and its path is made of the names of all items above it
+    # The DOP of a PARAM is stored in the PARAM's row, unless it's complex (e.g. STRUCTURE), in which case it's a child item
+    ### structure = parsed STRUCTURE (e.g. returned by get_mwb_structure)
+    # * returns (parameters, COMPU-SCALEs), as lists of tuples following `parameter_columns` and `compu_scale_columns`
+    # * the unit of a parameter is a tuple following `unit_columns` (or None)
+    @staticmethod
+    def flatten_structure(structure):
+        parameters = []
+        compu_scales = []
+        
+        # This function appends to the lists above, and calls itself for each child item
+        def add_item(item, parent_position, parent_path, item_type):
+            position = len(parameters)
+            row = dict.fromkeys(DefinitionDatabase.parameter_columns)
+            row['position'] = position
+            row['parent_position'] = parent_position
+            row['type'] = item_type
+            
+            # An error replaces the whole item (e.g. a DOP which couldn't be loaded)
+            if '#error' in item:
+                row['error'] = item['#error']
+            for column in ['parameter_type', 'long_name', 'long_name_id', 'description', 'byte_position', 'bit_position']:
+                row[column] = item.get(column)
+            
+            # The path is made of LONG-NAMEs, or of the item types if they have none
+            name = item.get('long_name') or item_type
+            row['path'] = name if parent_path is None else '{}/{}'.format(parent_path, name)
+            
+            # A simple DOP is stored in the PARAM's row, a complex one is added as a child item
+            # Simple DOPs which are items themselves (e.g. SWITCH-KEY) are stored in their own row
+            dop = item.get('dop')
+            simple_dop = item if item.get('type') in ('DOP', 'DTC') else None
+            children = []
+            if type(dop) is dict:
+                row['dop_type'] = dop.get('type')
+                if '#error' in dop:
+                    row['error'] = dop['#error']
+                elif dop.get('type') in ('DOP', 'DTC'):
+                    simple_dop = dop
+                else:
+                    children.append((dop, dop.get('type')))
+            
+            if simple_dop is not None:
+                row['dop_type'] = simple_dop.get('type')
+                for column in ['diag_coded_type', 'coded_base_data_type', 'physical_base_data_type', 'bit_length', 'bit_mask', 'endianness', 'compu_category', 'compu_default_value', 'display_radix']:
+                    row[column] = simple_dop.get(column)
+                if simple_dop.get('units') is not None:
+                    row['unit'] = tuple(DefinitionDatabase.to_column_value(simple_dop['units'][column]) for column in DefinitionDatabase.unit_columns)
+                
+                # TEXTTABLEs have a text for each COMPU-SCALE, the other CATEGORIES have LIMITs and a formula
+                # LINEAR has a single COMPU-SCALE, the other CATEGORIES have a list of them
+                simple_dop_compu_scales = simple_dop.get('compu_scales') or []
+                if type(simple_dop.get('compu_scale')) is dict:
+                    simple_dop_compu_scales = [simple_dop['compu_scale']]
+                if simple_dop.get('compu_category') == 'LINEAR' and len(simple_dop_compu_scales) == 0:
+                    raise RuntimeError('LINEAR DOP of {} has no COMPU-SCALE'.format(row['path']))
+                
+                for scale_index, compu_scale in enumerate(simple_dop_compu_scales):
+                    compu_scales.append(tuple(DefinitionDatabase.to_column_value(x) for x in (
+                        position,
+                        scale_index,
+                        DefinitionDatabase.get_compu_scale_limit(compu_scale, ['lower_limit', 'coded_lower_limit', 'limit']),
+                        DefinitionDatabase.get_compu_scale_limit(compu_scale, ['upper_limit', 'coded_upper_limit']),
+                        DefinitionDatabase.get_compu_scale_limit(compu_scale, ['physical_lower_limit']),
+                        DefinitionDatabase.get_compu_scale_limit(compu_scale, ['physical_upper_limit']),
+                        compu_scale.get('long_name'),
+                        compu_scale.get('long_name_id'),
+                        compu_scale.get('formula'),
+                        compu_scale.get('compu_const')
+                    )))
+            
+            # DOPs which describe how FIELDs and MUXes are interpreted
+            for (name, child_type) in [('switch_key', 'SWITCH-KEY'), ('determine_number_of_items', 'DETERMINE-NUMBER-OF-ITEMS')]:
+                if type(item.get(name)) is dict:
+                    children.append((item[name], child_type))
+            
+            # Items of STRUCTUREs, FIELDs and MUXes
+            for parameter in item.get('parameters') or []:
+                children.append((parameter, parameter.get('type')))
+            if type(item.get('structure')) is dict:
+                children.append((item['structure'], item['structure'].get('type')))
+            for case in item.get('cases') or []:
+                children.append((case, 'CASE'))
+            if type(item.get('default_case')) is dict:
+                children.append((item['default_case'], 'DEFAULT-CASE'))
+            
+            parameters.append(tuple(DefinitionDatabase.to_column_value(row[column]) if column != 'unit' else row[column] for column in DefinitionDatabase.parameter_columns))
+            for (child, child_type) in children:
+                add_item(child, position, row['path'], child_type)
+        
+        add_item(structure, None, None, structure.get('type'))
+        return (parameters, compu_scales)
+    
+    
+    # Constructor
+    # Each distinct STRUCTURE is only stored once (keyed by its hash), and each definition (DID of a variant) refers to it
+    ### database_file_path = path of the SQLite file (created if it doesn't exist)
+    def __init__(self, database_file_path):
+        database_folder_path = os.path.dirname(os.path.abspath(database_file_path))
+        if not os.path.isdir(database_folder_path):
+            os.makedirs(database_folder_path)
+        
+        self.__connection = sqlite3.connect(database_file_path)
+        self.__connection.executescript('''
+            CREATE TABLE IF NOT EXISTS structures (structure_id INTEGER PRIMARY KEY, hash TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS units (unit_id INTEGER PRIMARY KEY, long_name TEXT, long_name_id TEXT, description TEXT, display_name TEXT, factor_si_to_unit, offset_si_to_unit);
+            CREATE TABLE IF NOT EXISTS definitions (project TEXT NOT NULL, base_variant TEXT NOT NULL, variant TEXT NOT NULL, kind TEXT NOT NULL, did INTEGER NOT NULL, long_name TEXT, long_name_id TEXT, description TEXT, byte_position INTEGER, bit_position INTEGER, structure_id INTEGER REFERENCES structures, PRIMARY KEY (project, base_variant, variant, kind, did)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS parameters (structure_id INTEGER NOT NULL REFERENCES structures, position INTEGER NOT NULL, parent_position INTEGER, path TEXT, type TEXT, parameter_type TEXT, long_name TEXT, long_name_id TEXT, description TEXT, byte_position INTEGER, bit_position INTEGER, dop_type TEXT, diag_coded_type TEXT, coded_base_data_type TEXT, physical_base_data_type TEXT, bit_length INTEGER, bit_mask, endianness TEXT, compu_category TEXT, compu_default_value, display_radix INTEGER, unit_id INTEGER REFERENCES units, error TEXT, PRIMARY KEY (structure_id, position)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS compu_scales (structure_id INTEGER NOT NULL REFERENCES structures, position INTEGER NOT NULL, scale_index INTEGER NOT NULL, lower_limit, upper_limit, physical_lower_limit, physical_upper_limit, text TEXT, long_name_id TEXT, formula TEXT, compu_const, PRIMARY KEY (structure_id, position, scale_index)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS definitions_by_did ON definitions (kind, did);
+            CREATE INDEX IF NOT EXISTS definitions_by_variant ON definitions (variant, kind);
+            CREATE INDEX IF NOT EXISTS definitions_by_structure ON definitions (structure_id);
+            CREATE INDEX IF NOT EXISTS parameters_by_unit ON parameters (unit_id);
+            CREATE INDEX IF NOT EXISTS parameters_by_long_name ON parameters (long_name);
+            CREATE INDEX IF NOT EXISTS compu_scales_by_text ON compu_scales (text);
+            CREATE INDEX IF NOT EXISTS units_by_display_name ON units (display_name);
+        ''')
+        self.__connection.commit()
+        
+        # IDs of the stored STRUCTUREs and UNITs, so they're only looked up in memory
+        self.__load_ids()
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Load the IDs of all stored STRUCTUREs and UNITs
+    def __load_ids(self):
+        self.__structure_ids = {structure_hash: structure_id for (structure_id, structure_hash) in self.__connection.execute('SELECT structure_id, hash FROM structures')}
+        self.__unit_ids = {tuple(row[1:]): row[0] for row in self.__connection.execute('SELECT unit_id, {} FROM units'.format(', '.join(DefinitionDatabase.unit_columns)))}
+    
+    
+    # Get the ID of a UNIT, adding it if it's not stored yet
+    def __get_unit_id(self, unit):
+        if unit is None:
+            return None
+        if unit not in self.__unit_ids:
+            cursor = self.__connection.execute('INSERT INTO units ({}) VALUES ({})'.format(', '.join(DefinitionDatabase.unit_columns), ', '.join('?' * len(unit))), unit)
+            self.__unit_ids[unit] = cursor.lastrowid
+        return self.__unit_ids[unit]
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Remove all definitions of a Project (before it's added again)
+    # The STRUCTUREs are kept, since other Projects may use them too
+    ### project_name = name of the Project (folder)
+    def clear_project(self, project_name):
+        self.__connection.execute('DELETE FROM definitions WHERE project = ?', (project_name,))
+    
+    
+    # Check whether a STRUCTURE is already stored
+    ### structure_hash = hash of the parsed STRUCTURE (see object_hasher.get_object_hash)
+    def has_structure(self, structure_hash):
+        return structure_hash in self.__structure_ids
+    
+    
+    # Store a STRUCTURE (if it's not stored yet)
+    ### structure_hash = hash of the parsed STRUCTURE (see object_hasher.get_object_hash)
+    ### parameters     = list of parameter rows returned by `flatten_structure`
+    ### compu_scales   = list of COMPU-SCALE rows returned by `flatten_structure`
+    def add_structure(self, structure_hash, parameters, compu_scales):
+        if structure_hash in self.__structure_ids:
+            return
+        
+        structure_id = self.__connection.execute('INSERT INTO structures (hash) VALUES (?)', (structure_hash,)).lastrowid
+        self.__structure_ids[structure_hash] = structure_id
+        
+        # The UNIT (second to last column) is replaced by its ID
+        self.__connection.executemany('INSERT INTO parameters VALUES ({})'.format(', '.join('?' * (len(DefinitionDatabase.parameter_columns) + 1))), (
+            (structure_id,) + row[:-2] + (self.__get_unit_id(row[-2]), row[-1])
+            for row in parameters
+        ))
+        self.__connection.executemany('INSERT INTO compu_scales VALUES ({})'.format(', '.join('?' * (len(DefinitionDatabase.compu_scale_columns) + 1))), (
+            (structure_id,) + row
+            for row in compu_scales
+        ))
+    
+    
+    # Add the definitions of a BASE-VARIANT
+    # The STRUCTUREs they refer to must have been added before
+    ### project_name      = name of the Project (folder)
+    ### base_variant_name = name of the BASE-VARIANT
+    ### definitions       = list of (variant, kind, DID, LONG-NAME, LONG-NAME-ID, DESCRIPTION, BYTE-POSITION, BIT-POSITION, STRUCTURE hash or None) tuples
+    def add_definitions(self, project_name, base_variant_name, definitions):
+        self.__connection.executemany('INSERT OR REPLACE INTO definitions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+            (project_name, base_variant_name) + tuple(DefinitionDatabase.to_column_value(x) for x in row[:-1]) + (self.__structure_ids.get(row[-1]),)
+            for row in definitions
+        ))
+    
+    
+    # Save all added definitions to disk
+    def commit(self):
+        self.__connection.commit()
+    
+    
+    # Discard all definitions and STRUCTUREs added (or removed) since the last commit, e.g. when a Project failed part way
+    # The IDs kept in memory are loaded again, since the discarded STRUCTUREs and UNITs no longer exist
+    def rollback(self):
+        self.__connection.rollback()
+        self.__load_ids()
+    
+    
+    # Run a query (e.g. from the command line)
+    ### query = SQL query
+    # * returns (column names, rows)
+    def query(self, query):
+        cursor = self.__connection.execute(query)
+        return ([x[0] for x in cursor.description or []], cursor.fetchall())
+    
+    
+    # Save and close the database
+    def close(self):
+        self.__connection.commit()
+        self.__connection.close()
@@ -0,0 +1,72 @@
+import os
+import sqlite3
+
+
+class DidIndex:
+    # Constructor
+    # Each DID of the MWB table of each ECU-VARIANT (and BASE-VARIANT) is one row, with the hash of its parsed STRUCTURE
+    # The rows are indexed by DID and by hash, so finding all variants with a DID (or with the same STRUCTURE) is a single index search
+    ### index_file_path = path of the SQLite file (created if it doesn't exist)
+    def __init__(self, index_file_path):
+        index_folder_path = os.path.dirname(os.path.abspath(index_file_path))
+        if not os.path.isdir(index_folder_path):
+            os.makedirs(index_folder_path)
+        
+        self.__connection = sqlite3.connect(index_file_path)
+        
+        # The STRUCTURE hash is NULL if the DID has no table row, or its table row isn't a STRUCTURE
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS dids (project TEXT NOT NULL, base_variant TEXT NOT NULL, variant TEXT NOT NULL, did INTEGER NOT NULL, long_name TEXT, long_name_id TEXT, structure_hash TEXT, PRIMARY KEY (project, base_variant, variant, did)) WITHOUT ROWID')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS dids_by_did ON dids (did)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS dids_by_structure_hash ON dids (structure_hash)')
+        self.__connection.commit()
+    
+    
+    # Remove all variants of a Project (before it's added again)
+    ### project_name = name of the Project (folder)
+    def clear_project(self, project_name):
+        self.__connection.execute('DELETE FROM dids WHERE project = ?', (project_name,))
+    
+    
+    # Add the DIDs of a variant
+    ### project_name      = name of the Project (folder)
+    ### base_variant_name = name of the BASE-VARIANT
+    ### variant_name      = name of the ECU-VARIANT (or BASE-VARIANT)
+    ### dids              = list of (DID, LONG-NAME, LONG-NAME-ID, STRUCTURE hash) tuples
+    def add_variant(self, project_name, base_variant_name, variant_name, dids):
+        self.__connection.execute('DELETE FROM dids WHERE project = ? AND base_variant = ? AND variant = ?', (project_name, base_variant_name, variant_name))
+        self.__connection.executemany('INSERT INTO dids VALUES (?, ?, ?, ?, ?, ?, ?)', ((project_name, base_variant_name, variant_name) + row for row in dids))
+    
+    
+    # Find all variants which define a DID
+    ### did          = DID (integer)
+    ### project_name = only search this Project (None = all Projects)
+    # * returns a list of (Project, BASE-VARIANT, variant, DID, LONG-NAME, LONG-NAME-ID, STRUCTURE hash) tuples
+    def find_did(self, did, project_name = None):
+        if project_name is None:
+            cursor = self.__connection.execute('SELECT * FROM dids WHERE did = ? ORDER BY project, base_variant, variant', (did,))
+        else:
+            cursor = self.__connection.execute('SELECT * FROM dids WHERE did = ? AND project = ? ORDER BY base_variant, variant', (did, project_name))
+        return cursor.fetchall()
+    
+    
+    # Find all DIDs (of all variants) with the same STRUCTURE
+    ### structure_hash = hash of the parsed STRUCTURE (see object_hasher.get_object_hash)
+    # * returns a list of (Project, BASE-VARIANT, variant, DID, LONG-NAME, LONG-NAME-ID, STRUCTURE hash) tuples
+    def find_structure(self, structure_hash):
+        return self.__connection.execute('SELECT * FROM dids WHERE structure_hash = ? ORDER BY project, base_variant, variant, did', (structure_hash,)).fetchall()
+    
+    
+    # Save all added variants to disk
+    def commit(self):
+        self.__connection.commit()
+    
+    
+    # Discard all variants added (or removed) since the last commit, e.g. when a Project failed part way
+    def rollback(self):
+        self.__connection.rollback()
+    
+    
+    # Save and close the index
+    def close(self):
+        self.__connection.commit()
+        self.__connection.close()
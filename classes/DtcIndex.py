@@ -0,0 +1,93 @@
+import os
+import sqlite3
+
+
+class DtcIndex:
+    # Columns of a DTC row, after the Project, BASE-VARIANT and variant
+    dtc_columns = ['dtc_dop', 'trouble_code', 'display_trouble_code', 'level', 'description', 'long_name_id', 'translated_description']
+    
+    
+    # Constructor
+    # Each DTC of each DTC DOP of each ECU-VARIANT (and BASE-VARIANT) is one row, indexed by trouble code
+    # The descriptions are also kept in a full-text index (FTS5), which is updated along with the rows by triggers
+    ### index_file_path = path of the SQLite file (created if it doesn't exist)
+    def __init__(self, index_file_path):
+        index_folder_path = os.path.dirname(os.path.abspath(index_file_path))
+        if not os.path.isdir(index_folder_path):
+            os.makedirs(index_folder_path)
+        
+        self.__connection = sqlite3.connect(index_file_path)
+        self.__connection.executescript('''
+            CREATE TABLE IF NOT EXISTS dtcs (dtc_id INTEGER PRIMARY KEY, project TEXT NOT NULL, base_variant TEXT NOT NULL, variant TEXT NOT NULL, dtc_dop TEXT NOT NULL, trouble_code INTEGER NOT NULL, display_trouble_code TEXT, level INTEGER, description TEXT, long_name_id TEXT, translated_description TEXT, UNIQUE (project, base_variant, variant, dtc_dop, trouble_code));
+            CREATE INDEX IF NOT EXISTS dtcs_by_trouble_code ON dtcs (trouble_code);
+            CREATE INDEX IF NOT EXISTS dtcs_by_display_trouble_code ON dtcs (display_trouble_code);
+            CREATE VIRTUAL TABLE IF NOT EXISTS dtc_texts USING fts5 (display_trouble_code, description, translated_description, content='dtcs', content_rowid='dtc_id');
+            CREATE TRIGGER IF NOT EXISTS dtcs_insert AFTER INSERT ON dtcs BEGIN
+                INSERT INTO dtc_texts (rowid, display_trouble_code, description, translated_description) VALUES (new.dtc_id, new.display_trouble_code, new.description, new.translated_description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS dtcs_delete AFTER DELETE ON dtcs BEGIN
+                INSERT INTO dtc_texts (dtc_texts, rowid, display_trouble_code, description, translated_description) VALUES ('delete', old.dtc_id, old.display_trouble_code, old.description, old.translated_description);
+            END;
+        ''')
+        self.__connection.commit()
+    
+    
+    # Remove all variants of a Project (before it's added again)
+    ### project_name = name of the Project (folder)
+    def clear_project(self, project_name):
+        self.__connection.execute('DELETE FROM dtcs WHERE project = ?', (project_name,))
+    
+    
+    # Add the DTCs of a variant, replacing its previous ones
+    ### project_name      = name of the Project (folder)
+    ### base_variant_name = name of the BASE-VARIANT
+    ### variant_name      = name of the ECU-VARIANT (or BASE-VARIANT)
+    ### dtcs              = list of tuples following `dtc_columns`
+    def add_variant(self, project_name, base_variant_name, variant_name, dtcs):
+        self.__connection.execute('DELETE FROM dtcs WHERE project = ? AND base_variant = ? AND variant = ?', (project_name, base_variant_name, variant_name))
+        self.__connection.executemany('INSERT INTO dtcs (project, base_variant, variant, {}) VALUES ({})'.format(', '.join(DtcIndex.dtc_columns), ', '.join('?' * (len(DtcIndex.dtc_columns) + 3))), (
+            (project_name, base_variant_name, variant_name) + row
+            for row in dtcs
+        ))
+    
+    
+    # Find all variants which define a trouble code
+    ### trouble_code = trouble code (integer)
+    ### project_name = only search this Project (None = all Projects)
+    # * returns a list of (Project, BASE-VARIANT, variant, DTC DOP, trouble code, display trouble code, level, description, LONG-NAME-ID, translated description) tuples
+    def find_trouble_code(self, trouble_code, project_name = None):
+        columns = 'project, base_variant, variant, {}'.format(', '.join(DtcIndex.dtc_columns))
+        if project_name is None:
+            cursor = self.__connection.execute('SELECT {} FROM dtcs WHERE trouble_code = ? ORDER BY project, base_variant, variant'.format(columns), (trouble_code,))
+        else:
+            cursor = self.__connection.execute('SELECT {} FROM dtcs WHERE trouble_code = ? AND project = ? ORDER BY base_variant, variant'.format(columns), (trouble_code, project_name))
+        return cursor.fetchall()
+    
+    
+    # Find all DTCs whose texts match a full-text query
+    ### text_query   = FTS5 query (e.g. 'throttle AND sensor', 'lambda*')
+    ### project_name = only search this Project (None = all Projects)
+    # * returns a list of tuples like `find_trouble_code`, best matches first
+    def search_text(self, text_query, project_name = None):
+        columns = ', '.join('dtcs.' + x for x in ['project', 'base_variant', 'variant'] + DtcIndex.dtc_columns)
+        if project_name is None:
+            cursor = self.__connection.execute('SELECT {} FROM dtc_texts JOIN dtcs ON dtcs.dtc_id = dtc_texts.rowid WHERE dtc_texts MATCH ? ORDER BY dtc_texts.rank'.format(columns), (text_query,))
+        else:
+            cursor = self.__connection.execute('SELECT {} FROM dtc_texts JOIN dtcs ON dtcs.dtc_id = dtc_texts.rowid WHERE dtc_texts MATCH ? AND dtcs.project = ? ORDER BY dtc_texts.rank'.format(columns), (text_query, project_name))
+        return cursor.fetchall()
+    
+    
+    # Save all added variants to disk
+    def commit(self):
+        self.__connection.commit()
+    
+    
+    # Discard all variants added (or removed) since the last commit, e.g. when a Project failed part way
+    def rollback(self):
+        self.__connection.rollback()
+    
+    
+    # Save and close the index
+    def close(self):
+        self.__connection.commit()
+        self.__connection.close()
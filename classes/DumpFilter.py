@@ -0,0 +1,117 @@
+import fnmatch
+import hashlib
+
+from common_utils import enum_converters
+
+
+class DumpFilter:
+    # Names (argparse destinations) of the arguments added by `add_arguments`
+    argument_names = ('include_categories', 'exclude_categories', 'include_pools', 'exclude_pools', 'include_types', 'exclude_types')
+    
+    
+    # Add the command-line arguments for selecting what to dump to an argparse parser (or subparser)
+    ### parser = argparse.ArgumentParser instance
+    @staticmethod
+    def add_arguments(parser):
+        parser.add_argument('--include-category', dest='include_categories', action='append', default=None, metavar='CATEGORY', help='Only dump Pools of this category, by extension (e.g. bv) or name (e.g. "Base Variant"), can be given multiple times')
+        parser.add_argument('--exclude-category', dest='exclude_categories', action='append', default=None, metavar='CATEGORY', help='Don\'t dump Pools of this category, can be given multiple times')
+        parser.add_argument('--include-pool', dest='include_pools', action='append', default=None, metavar='GLOB', help='Only dump Pools whose PoolID matches this pattern (e.g. "*@PR_UDS*"), can be given multiple times')
+        parser.add_argument('--exclude-pool', dest='exclude_pools', action='append', default=None, metavar='GLOB', help='Don\'t dump Pools whose PoolID matches this pattern, can be given multiple times')
+        parser.add_argument('--include-type', dest='include_types', action='append', default=None, metavar='OBJECT_TYPE', help='Only dump Objects of this type (e.g. MCD_DB_PARAMETER), can be given multiple times')
+        parser.add_argument('--exclude-type', dest='exclude_types', action='append', default=None, metavar='OBJECT_TYPE', help='Don\'t dump Objects of this type, can be given multiple times')
+    
+    
+    # Create an instance from parsed command-line arguments (see `add_arguments`)
+    ### args = argparse.Namespace
+    # * returns None if no filter was given, so everything is dumped like before
+    @staticmethod
+    def from_arguments(args):
+        arguments = {x: getattr(args, x) for x in DumpFilter.argument_names}
+        if all(x is None for x in arguments.values()):
+            return None
+        return DumpFilter(**arguments)
+    
+    
+    # Constructor
+    # Each argument is a list, None = no filter
+    # Something is dumped if it matches one of the included values (if any), and none of the excluded ones
+    ### include_categories = Pool categories to dump, by extension (e.g. 'bv') or name (see enum_converters.get_db_file_type)
+    ### exclude_categories = Pool categories not to dump
+    ### include_pools      = glob patterns of PoolIDs to dump (e.g. '*@PR_UDS*')
+    ### exclude_pools      = glob patterns of PoolIDs not to dump
+    ### include_types      = object types to dump (e.g. 'MCD_DB_PARAMETER')
+    ### exclude_types      = object types not to dump
+    def __init__(self, include_categories = None, exclude_categories = None, include_pools = None, exclude_pools = None, include_types = None, exclude_types = None):
+        # Object types are compared by enum, so they can be checked from the Object header alone
+        self.__include_type_enums = self.__get_type_enums(include_types)
+        self.__exclude_type_enums = self.__get_type_enums(exclude_types)
+        
+        # Categories are compared case-insensitively, since they're often typed as extensions
+        self.__include_categories = None if include_categories is None else [x.casefold() for x in include_categories]
+        self.__exclude_categories = None if exclude_categories is None else [x.casefold() for x in exclude_categories]
+        self.__include_pools = include_pools
+        self.__exclude_pools = exclude_pools
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Convert a list of object type names to a set of enums
+    def __get_type_enums(self, object_types):
+        if object_types is None:
+            return None
+        type_enums = set()
+        for object_type in object_types:
+            matching_type_enums = [enum for enum, name in enum_converters.object_types.items() if name == object_type]
+            if len(matching_type_enums) == 0:
+                raise RuntimeError('Unknown object type: {}'.format(object_type))
+            type_enums.update(matching_type_enums)
+        return type_enums
+    
+    
+    # Check whether a Pool is in a category from a list
+    def __matches_category(self, PoolID, categories):
+        extension = PoolID.rsplit('.', 1)[-1].casefold()
+        category = enum_converters.get_db_file_type(PoolID).casefold() if '.' in PoolID else None
+        return extension in categories or category in categories
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Check whether a Pool should be dumped
+    ### PoolID = name of the Pool
+    def includes_pool(self, PoolID):
+        if self.__include_categories is not None and not self.__matches_category(PoolID, self.__include_categories):
+            return False
+        if self.__exclude_categories is not None and self.__matches_category(PoolID, self.__exclude_categories):
+            return False
+        if self.__include_pools is not None and not any(fnmatch.fnmatchcase(PoolID, x) for x in self.__include_pools):
+            return False
+        if self.__exclude_pools is not None and any(fnmatch.fnmatchcase(PoolID, x) for x in self.__exclude_pools):
+            return False
+        return True
+    
+    
+    # Check whether Objects are filtered by type, in which case the Pool files are incomplete
+    def filters_object_types(self):
+        return self.__include_type_enums is not None or self.__exclude_type_enums is not None
+    
+    
+    # Get the suffix of the Pool files, so Pool files with only some object types never take the place of complete ones
+    # Each selection of object types gets its own suffix (e.g. '.types-1a2b3c4d'), no suffix = all object types
+    def get_output_suffix(self):
+        if not self.filters_object_types():
+            return ''
+        selection = repr((sorted(self.__include_type_enums or []), sorted(self.__exclude_type_enums or []), self.__include_type_enums is None))
+        return '.types-' + hashlib.sha1(selection.encode('utf-8')).hexdigest()[:8]
+    
+    
+    # Check whether an Object should be dumped
+    ### object_type_enum = type enum from the Object header (see PblRecordManager.get_object_type_enum_from_compressed_data)
+    def includes_object_type(self, object_type_enum):
+        if self.__include_type_enums is not None and object_type_enum not in self.__include_type_enums:
+            return False
+        if self.__exclude_type_enums is not None and object_type_enum in self.__exclude_type_enums:
+            return False
+        return True
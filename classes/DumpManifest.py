@@ -0,0 +1,234 @@
+import ast
+import hashlib
+import json
+import os
+
+
+class DumpManifest:
+    # Name of the manifest file, written in the main output folder
+    manifest_file_name = 'dump_manifest.jsonl'
+    
+    # Files of the strings database, which are needed for every Object (names are resolved through them)
+    string_file_names = ['AStringData.data', 'AStringData.idx', 'UStringData.data', 'UStringData.idx']
+    
+    # Scripts which write outputs recorded in a manifest (or cached with the tool version, like parseMWB)
+    # The tool version only covers them and the modules they import, so editing an unrelated script or class doesn't redo every output
+    dumper_module_names = ['dumpAdaptations', 'dumpAllProjects', 'dumpCoding', 'dumpDefinitions', 'dumpDTC', 'dumpECUVariantPatterns', 'dumpFreezeFrames', 'dumpMWB', 'dumpProject', 'parseMWB']
+    
+    # Version of the tool, computed once (see get_tool_version)
+    tool_version = None
+    
+    
+    # Get the path of a module of the tool (None if it's not part of the tool, e.g. a standard module)
+    ### tool_folder_path = folder containing the scripts
+    ### module_name      = full name of the module (e.g. 'classes.DbStream')
+    @staticmethod
+    def get_module_file_path(tool_folder_path, module_name):
+        module_path = os.path.join(tool_folder_path, *module_name.split('.'))
+        for file_path in [module_path + '.py', os.path.join(module_path, '__init__.py')]:
+            if os.path.isfile(file_path):
+                return file_path
+        return None
+    
+    
+    # Get the paths of the source files of some modules, and of all modules of the tool they import (directly or not)
+    # The imports are read from the sources, so the result doesn't depend on which script is running
+    ### tool_folder_path = folder containing the scripts
+    ### module_names     = full names of the modules
+    @staticmethod
+    def get_source_file_paths(tool_folder_path, module_names):
+        source_file_paths = set()
+        pending_module_names = list(module_names)
+        while len(pending_module_names) != 0:
+            file_path = DumpManifest.get_module_file_path(tool_folder_path, pending_module_names.pop())
+            if file_path is None or file_path in source_file_paths:
+                continue
+            source_file_paths.add(file_path)
+            
+            with open(file_path, 'r', encoding='utf-8') as source_file:
+                tree = ast.parse(source_file.read(), file_path)
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    pending_module_names.extend(x.name for x in node.names)
+                elif isinstance(node, ast.ImportFrom) and node.module is not None:
+                    # The imported names may be modules of a package (e.g. `from classes import DbObject`)
+                    pending_module_names.append(node.module)
+                    pending_module_names.extend('{}.{}'.format(node.module, x.name) for x in node.names if x.name != '*')
+                
+                # A package imports the modules listed in its `__all__` with `import *` (e.g. all object loaders)
+                elif isinstance(node, ast.Assign) and file_path.endswith('__init__.py') and any(isinstance(x, ast.Name) and x.id == '__all__' for x in node.targets):
+                    package_name = os.path.relpath(os.path.dirname(file_path), tool_folder_path).replace(os.sep, '.')
+                    pending_module_names.extend('{}.{}'.format(package_name, x) for x in ast.literal_eval(node.value))
+        
+        return sorted(source_file_paths)
+    
+    
+    # Get the version of the tool, as a hash of the source files which affect the outputs (see `dumper_module_names`)
+    # Any change in a loader or dumper will change it, so all outputs get redone
+    @staticmethod
+    def get_tool_version():
+        if DumpManifest.tool_version is not None:
+            return DumpManifest.tool_version
+        
+        tool_folder_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        
+        tool_hash = hashlib.blake2b(digest_size=16)
+        for file_path in DumpManifest.get_source_file_paths(tool_folder_path, DumpManifest.dumper_module_names):
+            tool_hash.update(os.path.relpath(file_path, tool_folder_path).replace(os.sep, '/').encode('utf-8'))
+            with open(file_path, 'rb') as source_file:
+                tool_hash.update(source_file.read())
+        
+        DumpManifest.tool_version = tool_hash.hexdigest()
+        return DumpManifest.tool_version
+    
+    
+    # Get the paths of all input files an output depends on
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### pool_ids            = PoolIDs of all Pools the output was made from
+    @staticmethod
+    def get_input_file_paths(project_folder_path, pool_ids):
+        # Absolute paths are recorded, so the manifest stays valid when running from another working directory
+        project_folder_path = os.path.abspath(project_folder_path)
+        input_file_paths = []
+        
+        # The strings database may be stored uncompressed or as gzip
+        for string_file_name in DumpManifest.string_file_names:
+            for file_name in [string_file_name, string_file_name + '.gz']:
+                file_path = os.path.join(project_folder_path, file_name)
+                if os.path.isfile(file_path):
+                    input_file_paths.append(file_path)
+        
+        # Each Pool is a pair of .db and .key files
+        for pool_id in sorted(pool_ids):
+            input_file_paths.append(os.path.join(project_folder_path, pool_id + '.db'))
+            input_file_paths.append(os.path.join(project_folder_path, pool_id + '.key'))
+        
+        return input_file_paths
+    
+    
+    # Constructor
+    ### output_folder_path = main output folder, all output files are recorded relative to it
+    def __init__(self, output_folder_path):
+        if not os.path.isdir(output_folder_path):
+            os.makedirs(output_folder_path)
+        
+        self.__output_folder_path = output_folder_path
+        self.__manifest_file_path = os.path.join(output_folder_path, DumpManifest.manifest_file_name)
+        self.__tool_version = DumpManifest.get_tool_version()
+        
+        # Records of all output files, keyed by their path relative to the output folder
+        self.__entries = {}
+        
+        # Fingerprints of input files, as (size, mtime, hash)
+        # Known ones are taken from the existing manifest, current ones are computed during this run
+        self.__known_fingerprints = {}
+        self.__current_fingerprints = {}
+        
+        # The manifest is append-only, so later lines replace earlier ones for the same output
+        if os.path.isfile(self.__manifest_file_path):
+            with open(self.__manifest_file_path, 'r', encoding='utf-8') as manifest_file:
+                for line in manifest_file:
+                    # A crash may leave the last line incomplete, just ignore it
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.__entries[entry['output']] = entry
+            
+            for entry in self.__entries.values():
+                for input_file_path, fingerprint in entry['inputs'].items():
+                    self.__known_fingerprints[input_file_path] = tuple(fingerprint)
+            
+            # Rewrite the manifest without the replaced lines, so it doesn't keep growing
+            temp_manifest_file_path = self.__manifest_file_path + '.tmp'
+            with open(temp_manifest_file_path, 'w', encoding='utf-8') as manifest_file:
+                for entry in self.__entries.values():
+                    manifest_file.write(json.dumps(entry) + '\n')
+            os.replace(temp_manifest_file_path, self.__manifest_file_path)
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Get the key under which an output file is recorded
+    def __get_output_key(self, output_file_path):
+        return os.path.relpath(output_file_path, self.__output_folder_path).replace('\\', '/')
+    
+    
+    # Get the fingerprint of an input file (None if it doesn't exist)
+    # * the file is only hashed if its size or modification time differ from the known fingerprint (at most once per run)
+    def __get_fingerprint(self, input_file_path):
+        if input_file_path in self.__current_fingerprints:
+            return self.__current_fingerprints[input_file_path]
+        
+        if not os.path.isfile(input_file_path):
+            fingerprint = None
+        else:
+            file_stat = os.stat(input_file_path)
+            known_fingerprint = self.__known_fingerprints.get(input_file_path)
+            if known_fingerprint is not None and known_fingerprint[0] == file_stat.st_size and known_fingerprint[1] == file_stat.st_mtime_ns:
+                fingerprint = known_fingerprint
+            else:
+                file_hash = hashlib.blake2b(digest_size=16)
+                with open(input_file_path, 'rb') as input_file:
+                    while True:
+                        chunk = input_file.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        file_hash.update(chunk)
+                fingerprint = (file_stat.st_size, file_stat.st_mtime_ns, file_hash.hexdigest())
+        
+        self.__current_fingerprints[input_file_path] = fingerprint
+        return fingerprint
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Check whether an output file exists and was made by this tool version, with the same options, from the current input files
+    ### output_file_path = path of the output file (as written to disk)
+    ### options          = names of the options which change the output's content (None = no options)
+    def is_up_to_date(self, output_file_path, options = None):
+        entry = self.__entries.get(self.__get_output_key(output_file_path))
+        if entry is None or entry['tool_version'] != self.__tool_version:
+            return False
+        
+        # Entries written before options were recorded were made without any
+        if entry.get('options', []) != sorted(options or []):
+            return False
+        
+        # A missing or replaced output file must be redone
+        if not os.path.isfile(output_file_path) or os.path.getsize(output_file_path) != entry['output_size']:
+            return False
+        
+        # Only the size and hash matter, the modification time can change when files are copied
+        for input_file_path, recorded_fingerprint in entry['inputs'].items():
+            fingerprint = self.__get_fingerprint(input_file_path)
+            if fingerprint is None or fingerprint[0] != recorded_fingerprint[0] or fingerprint[2] != recorded_fingerprint[2]:
+                return False
+        
+        return True
+    
+    
+    # Record a (completely written) output file, the options it was made with and the input files it was made from
+    ### output_file_path = path of the output file (as written to disk)
+    ### input_file_paths = list of paths of input files
+    ### options          = names of the options which change the output's content (None = no options)
+    def record(self, output_file_path, input_file_paths, options = None):
+        entry = {
+            'output': self.__get_output_key(output_file_path),
+            'output_size': os.path.getsize(output_file_path),
+            'tool_version': self.__tool_version,
+            'options': sorted(options or []),
+            'inputs': {}
+        }
+        for input_file_path in input_file_paths:
+            fingerprint = self.__get_fingerprint(input_file_path)
+            if fingerprint is not None:
+                entry['inputs'][input_file_path] = fingerprint
+        
+        self.__entries[entry['output']] = entry
+        
+        # Append the entry right away, so the work is not lost if the run is interrupted
+        with open(self.__manifest_file_path, 'a', encoding='utf-8') as manifest_file:
+            manifest_file.write(json.dumps(entry) + '\n')
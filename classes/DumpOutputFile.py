@@ -0,0 +1,242 @@
+import gzip
+import io
+import json
+import lzma
+import os
+import time
+
+from classes.DumpManifest import DumpManifest
+
+
+class DumpOutputFile:
+    # Extension of the file which is written until the output is complete, then renamed to the output file
+    part_extension = '.part'
+    
+    # Extension of the checkpoint journal, kept next to the partial file
+    journal_extension = '.journal'
+    
+    # Minimum number of seconds between two checkpoints
+    # Each checkpoint ends the current compressed stream and syncs the file to disk, so it shouldn't happen too often
+    checkpoint_interval = 30
+    
+    
+    # Constructor
+    ### output_file_path  = path of the output file (as written to disk, with the compression extension)
+    ### compression       = compression method ('gzip', 'xz' or None)
+    ### compression_level = level passed to the compressor (None = compressor default)
+    ### buffer_size       = size of the write buffer placed in front of the (compressed) file
+    ### input_file_paths  = list of paths of input files, used for checking whether a checkpoint is still valid
+    ###### None = don't keep checkpoints, always start from the beginning
+    def __init__(self, output_file_path, compression, compression_level, buffer_size, input_file_paths = None):
+        self.__output_file_path = output_file_path
+        self.__part_file_path = output_file_path + DumpOutputFile.part_extension
+        self.__journal_file_path = output_file_path + DumpOutputFile.journal_extension
+        self.__compression = compression
+        self.__compression_level = compression_level
+        self.__buffer_size = buffer_size
+        self.__journal_file = None
+        
+        # Functions called before the written text is made permanent (at each checkpoint and when closing)
+        self.__checkpoint_callbacks = []
+        
+        # Number of Objects completely written to the file, and the key of the last one
+        self.completed_objects = 0
+        self.last_completed_object = None
+        
+        # Resume from the last checkpoint if possible
+        offset = 0
+        if input_file_paths is not None:
+            # The checkpoints are only valid if the inputs, settings and tool are the same as when they were written
+            journal_header = {
+                'compression': compression,
+                'compression_level': compression_level,
+                'tool_version': DumpManifest.get_tool_version(),
+                'inputs': {}
+            }
+            for input_file_path in input_file_paths:
+                if os.path.isfile(input_file_path):
+                    input_file_stat = os.stat(input_file_path)
+                    journal_header['inputs'][input_file_path] = [input_file_stat.st_size, input_file_stat.st_mtime_ns]
+            
+            checkpoint = self.__read_last_checkpoint(journal_header)
+            if checkpoint is not None:
+                self.completed_objects = checkpoint['completed_objects']
+                self.last_completed_object = checkpoint['last_completed_object']
+                offset = checkpoint['offset']
+            
+            # Start a new journal if not resuming, otherwise keep appending to the existing one
+            if offset == 0:
+                self.__journal_file = open(self.__journal_file_path, 'w', encoding='utf-8')
+                self.__write_journal_line(journal_header)
+            else:
+                self.__journal_file = open(self.__journal_file_path, 'a', encoding='utf-8')
+        
+        # Open the partial file, dropping anything written after the last checkpoint
+        if offset == 0:
+            self.__raw_file = open(self.__part_file_path, 'wb', buffering=0)
+        else:
+            self.__raw_file = open(self.__part_file_path, 'r+b', buffering=0)
+            self.__raw_file.truncate(offset)
+            self.__raw_file.seek(offset)
+        
+        self.__open_text_file()
+        self.__last_checkpoint_time = time.time()
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Get the last valid checkpoint from the journal (None if there is none, or if the journal doesn't match the current run)
+    def __read_last_checkpoint(self, journal_header):
+        if not os.path.isfile(self.__journal_file_path) or not os.path.isfile(self.__part_file_path):
+            return None
+        
+        checkpoint = None
+        with open(self.__journal_file_path, 'r', encoding='utf-8') as journal_file:
+            for line_index, line in enumerate(journal_file):
+                # A crash may leave the last line incomplete, just ignore it
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                
+                # The first line describes the run which wrote the checkpoints
+                if line_index == 0:
+                    if entry != journal_header:
+                        return None
+                else:
+                    checkpoint = entry
+        
+        # The partial file must still contain everything up to the checkpoint
+        if checkpoint is not None and os.path.getsize(self.__part_file_path) < checkpoint['offset']:
+            return None
+        return checkpoint
+    
+    
+    # Append a line to the journal and make sure it reaches the disk
+    def __write_journal_line(self, entry):
+        self.__journal_file.write(json.dumps(entry) + '\n')
+        self.__journal_file.flush()
+        os.fsync(self.__journal_file.fileno())
+    
+    
+    # Open a new compressed stream on top of the partial file, and the text layer on top of it
+    # Compressed streams can be concatenated (gzip members, xz streams), which is what allows appending after a checkpoint
+    def __open_text_file(self):
+        match self.__compression:
+            case None:
+                self.__binary_file = self.__raw_file
+            case 'gzip':
+                # The header timestamp is zeroed, so dumps of the same data are byte-identical
+                self.__binary_file = gzip.GzipFile(fileobj=self.__raw_file, mode='wb', compresslevel=9 if self.__compression_level is None else self.__compression_level, mtime=0)
+            case 'xz':
+                self.__binary_file = lzma.LZMAFile(self.__raw_file, 'wb', preset=self.__compression_level)
+            case _:
+                raise RuntimeError('Unknown compression method: {}'.format(self.__compression))
+        
+        # Buffer the (compressed) file, then add the text layer on top
+        # Line endings are translated like for a file opened with `open(path, 'w')`
+        self.__text_file = io.TextIOWrapper(io.BufferedWriter(self.__binary_file, self.__buffer_size), encoding='utf-8')
+    
+    
+    # Flush everything written so far and end the compressed stream, leaving the partial file open
+    def __close_text_file(self):
+        # Detaching flushes the text layer and the buffer, without closing what's below them
+        self.__text_file.detach().detach()
+        
+        # The compressors don't own the partial file, so closing them only ends the compressed stream
+        if self.__binary_file is not self.__raw_file:
+            self.__binary_file.close()
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Write text to the file
+    ### text = string to write
+    def write(self, text):
+        return self.__text_file.write(text)
+    
+    
+    # Add a function to be called before each checkpoint and before the output file is completed
+    # This allows saving data which the written text depends on, so it's never missing when resuming
+    ### callback = function without parameters
+    def add_checkpoint_callback(self, callback):
+        self.__checkpoint_callbacks.append(callback)
+    
+    
+    # Mark everything written so far as the header of the file
+    # Only indexed outputs need to know where the header ends (see ShardedDumpFile), nothing to do here
+    def complete_header(self):
+        pass
+    
+    
+    # Mark an Object as completely written
+    # If enough time passed since the last checkpoint, everything written so far is saved to disk and recorded in the journal
+    ### object_key = key identifying the Object (must be JSON-serializable), checked when resuming
+    ### ObjectID   = name of the Object (only used by indexed outputs, see ShardedDumpFile)
+    def complete_object(self, object_key, ObjectID = None):
+        self.completed_objects += 1
+        self.last_completed_object = object_key
+        
+        if self.__journal_file is None or time.time() - self.__last_checkpoint_time < DumpOutputFile.checkpoint_interval:
+            return
+        
+        for callback in self.__checkpoint_callbacks:
+            callback()
+        
+        # End the compressed stream, so the file is valid up to the current offset
+        self.__close_text_file()
+        os.fsync(self.__raw_file.fileno())
+        
+        # Record the checkpoint, then continue in a new compressed stream
+        self.__write_journal_line({
+            'completed_objects': self.completed_objects,
+            'last_completed_object': self.last_completed_object,
+            'offset': self.__raw_file.tell()
+        })
+        self.__open_text_file()
+        self.__last_checkpoint_time = time.time()
+    
+    
+    # Finish the output file and rename it from the partial file to its real name
+    def close(self):
+        for callback in self.__checkpoint_callbacks:
+            callback()
+        
+        self.__close_text_file()
+        os.fsync(self.__raw_file.fileno())
+        self.__raw_file.close()
+        
+        # The rename is atomic, so the output file either doesn't exist or is complete
+        os.replace(self.__part_file_path, self.__output_file_path)
+        
+        # The checkpoints are no longer needed
+        if self.__journal_file is not None:
+            self.__journal_file.close()
+            os.remove(self.__journal_file_path)
+    
+    
+    # Close the partial file without finishing it, keeping the checkpoints for the next run
+    def abort(self):
+        # Whatever was written after the last checkpoint will be dropped when resuming, so it doesn't need to be flushed properly
+        try:
+            self.__close_text_file()
+        finally:
+            self.__raw_file.close()
+            if self.__journal_file is not None:
+                self.__journal_file.close()
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    # Only finish the output file if no exception occurred while writing it
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
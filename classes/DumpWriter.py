@@ -0,0 +1,112 @@
+import gzip
+import lzma
+import os
+
+from classes.DumpManifest import DumpManifest
+from classes.DumpOutputFile import DumpOutputFile
+
+
+class DumpWriter:
+    # Compression methods which can be used for output files, with the extension appended to each file's name
+    compression_extensions = {
+        'gzip': '.gz',
+        'xz': '.xz'
+    }
+    
+    # Size of the write buffer placed in front of the (compressed) file
+    # Dumps are written one short line at a time, so a large buffer saves a lot of calls into the compressor and the OS
+    buffer_size = 4 * 1024 * 1024
+    
+    # Names (argparse destinations) of the arguments added by `add_arguments`
+    argument_names = ('compression', 'compression_level', 'manifest')
+    
+    
+    # Add the command-line arguments for output files to an argparse parser (or subparser)
+    ### parser = argparse.ArgumentParser instance
+    @staticmethod
+    def add_arguments(parser):
+        parser.add_argument('--compress', dest='compression', choices=list(DumpWriter.compression_extensions), default=None, help='Write output files through a streaming compressor')
+        parser.add_argument('--compress-level', dest='compression_level', type=int, choices=range(0, 10), default=None, metavar='[0-9]', help='Compression level (gzip: 0-9, default 9; xz: preset 0-9, default 6)')
+        parser.add_argument('--no-manifest', dest='manifest', action='store_false', help='Do not keep a manifest of input fingerprints (outputs are then only skipped if they exist)')
+    
+    
+    # Create an instance from parsed command-line arguments (see `add_arguments`)
+    ### args = argparse.Namespace, must also contain `output_folder_path`
+    @staticmethod
+    def from_arguments(args):
+        manifest = DumpManifest(args.output_folder_path) if args.manifest else None
+        return DumpWriter(args.compression, args.compression_level, manifest)
+    
+    
+    # Constructor
+    ### compression       = compression method, key of `compression_extensions` (None = write plain text files)
+    ### compression_level = level passed to the compressor (None = compressor default)
+    ### manifest          = DumpManifest instance recording the inputs of each output (None = no manifest)
+    def __init__(self, compression = None, compression_level = None, manifest = None):
+        if compression is not None and compression not in DumpWriter.compression_extensions:
+            raise RuntimeError('Unknown compression method: {}'.format(compression))
+        
+        self.compression = compression
+        self.compression_level = compression_level
+        self.manifest = manifest
+    
+    
+    # Get the path an output file will actually be written to (with the compression extension, if any)
+    ### output_file_path = path of the output file, as named by the dumper (e.g. ".../MWB_EV_xyz.c")
+    def get_output_file_path(self, output_file_path):
+        if self.compression is None:
+            return output_file_path
+        return output_file_path + DumpWriter.compression_extensions[self.compression]
+    
+    
+    # Check whether an output file was already written by a previous run
+    # With a manifest, the file must also have been made by this tool version, with the same options, from the current input files
+    ### output_file_path = path of the output file, as named by the dumper
+    ### options          = names of the options which change the output's content (None = no options)
+    def is_done(self, output_file_path, options = None):
+        if self.manifest is not None:
+            return self.manifest.is_up_to_date(self.get_output_file_path(output_file_path), options)
+        return os.path.isfile(self.get_output_file_path(output_file_path))
+    
+    
+    # Record the inputs of a completely written output file in the manifest (if there is one)
+    ### output_file_path    = path of the output file, as named by the dumper
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### pool_ids            = PoolIDs of all Pools the output was made from
+    ### options             = names of the options which change the output's content (None = no options)
+    def record(self, output_file_path, project_folder_path, pool_ids, options = None):
+        if self.manifest is not None:
+            self.manifest.record(self.get_output_file_path(output_file_path), DumpManifest.get_input_file_paths(project_folder_path, pool_ids), options)
+    
+    
+    # Open an output file for writing text (UTF-8), going through the compressor if one is configured
+    # The text is written to a partial file, which only gets the output file's name once it's complete
+    ### output_file_path = path of the output file, as named by the dumper
+    # * the returned file object must be closed (use it in a `with` statement)
+    def open(self, output_file_path):
+        return DumpOutputFile(self.get_output_file_path(output_file_path), self.compression, self.compression_level, DumpWriter.buffer_size)
+    
+    
+    # Same as `open`, but the output file can be resumed after an interruption, from the last checkpoint
+    # Each Object must be marked with `complete_object` after it's written, and the first `completed_objects` Objects must be skipped
+    ### output_file_path    = path of the output file, as named by the dumper
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### pool_ids            = PoolIDs of all Pools the output is made from (a checkpoint is dropped if one of them changed)
+    def open_resumable(self, output_file_path, project_folder_path, pool_ids):
+        return DumpOutputFile(self.get_output_file_path(output_file_path), self.compression, self.compression_level, DumpWriter.buffer_size, DumpManifest.get_input_file_paths(project_folder_path, pool_ids))
+    
+    
+    # Open a complete output file for reading text (UTF-8), going through the decompressor if one is configured
+    ### output_file_path = path of the output file, as named by the dumper
+    # * the returned file object must be closed (use it in a `with` statement)
+    def open_for_reading(self, output_file_path):
+        file_path = self.get_output_file_path(output_file_path)
+        
+        # Files resumed from a checkpoint contain several compressed streams, which are read one after the other
+        match self.compression:
+            case None:
+                return open(file_path, 'r', encoding='utf-8')
+            case 'gzip':
+                return gzip.open(file_path, 'rt', encoding='utf-8')
+            case 'xz':
+                return lzma.open(file_path, 'rt', encoding='utf-8')
@@ -0,0 +1,113 @@
+import json
+import os
+import traceback
+
+
+class FailureReport:
+    # Name of the report file, written in the main output folder
+    report_file_name = 'failure_report.json'
+    
+    
+    # Get the line written to a dump in place of an Object which failed to load
+    # It is replaced with the Object's dump when the failure is retried successfully
+    ### ObjectID = name of the Object
+    @staticmethod
+    def get_placeholder(ObjectID):
+        return '\'{}\' FAILED (see {})'.format(ObjectID, FailureReport.report_file_name)
+    
+    
+    # Constructor
+    ### output_folder_path = main output folder, where the report is written
+    def __init__(self, output_folder_path):
+        if not os.path.isdir(output_folder_path):
+            os.makedirs(output_folder_path)
+        
+        self.__report_file_path = os.path.join(output_folder_path, FailureReport.report_file_name)
+        
+        # Keep the failures from previous runs, so they can be retried
+        self.__failures = []
+        if os.path.isfile(self.__report_file_path):
+            with open(self.__report_file_path, 'r', encoding='utf-8') as report_file:
+                self.__failures = json.load(report_file)
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Write the report to disk (replacing the previous one atomically)
+    def __save(self):
+        temp_report_file_path = self.__report_file_path + '.tmp'
+        with open(temp_report_file_path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.__failures, report_file, indent=4)
+        os.replace(temp_report_file_path, self.__report_file_path)
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Record an Object which failed to load
+    # The report is saved right away, so failures are not lost if the run is interrupted
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### PoolID              = name of the Pool containing the Object
+    ### ObjectID            = name of the Object
+    ### object_type_enum    = type enum from the first 2 bytes of the Object's data (None if the data couldn't be read)
+    ### byte_offset         = position of the Object's compressed data in the .db file
+    ### exception           = exception raised while loading the Object
+    def add(self, project_folder_path, PoolID, ObjectID, object_type_enum, byte_offset, exception):
+        project_folder_path = os.path.abspath(project_folder_path)
+        
+        # An Object only has one entry, the latest failure replaces any previous one
+        self.__failures = [x for x in self.__failures if (x['project_folder_path'], x['pool_id'], x['object_id']) != (project_folder_path, PoolID, ObjectID)]
+        self.__failures.append({
+            'project': os.path.basename(project_folder_path),
+            'project_folder_path': project_folder_path,
+            'pool_id': PoolID,
+            'object_id': ObjectID,
+            'object_type_enum': object_type_enum,
+            'byte_offset': byte_offset,
+            'exception': '{}: {}'.format(type(exception).__name__, exception),
+            'traceback': ''.join(traceback.format_exception(exception))
+        })
+        self.__save()
+    
+    
+    # Remove an Object's failure (after it was retried successfully)
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### PoolID              = name of the Pool containing the Object
+    ### ObjectID            = name of the Object
+    def remove(self, project_folder_path, PoolID, ObjectID):
+        project_folder_path = os.path.abspath(project_folder_path)
+        self.__failures = [x for x in self.__failures if (x['project_folder_path'], x['pool_id'], x['object_id']) != (project_folder_path, PoolID, ObjectID)]
+        self.__save()
+    
+    
+    # Remove all failures of a Pool (when it is dumped again from the beginning)
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### PoolID              = name of the Pool
+    def clear_pool(self, project_folder_path, PoolID):
+        project_folder_path = os.path.abspath(project_folder_path)
+        failure_count = len(self.__failures)
+        self.__failures = [x for x in self.__failures if (x['project_folder_path'], x['pool_id']) != (project_folder_path, PoolID)]
+        if len(self.__failures) != failure_count:
+            self.__save()
+    
+    
+    # Get the paths of all Projects which have failures
+    def get_project_folder_paths(self):
+        return sorted(set(x['project_folder_path'] for x in self.__failures))
+    
+    
+    # Get the failures of a Project, grouped by PoolID
+    ### project_folder_path = Project path (folder with .db and .key files)
+    def get_failures_by_pool(self, project_folder_path):
+        project_folder_path = os.path.abspath(project_folder_path)
+        failures_by_pool = {}
+        for failure in self.__failures:
+            if failure['project_folder_path'] == project_folder_path:
+                failures_by_pool.setdefault(failure['pool_id'], []).append(failure)
+        return failures_by_pool
+    
+    
+    # Get the number of recorded failures
+    def get_failure_count(self):
+        return len(self.__failures)
@@ -0,0 +1,39 @@
+class LayerDataIndex:
+    # Constructor
+    # The maps of a "layer data" object are lists of {'map_key': ..., 'reference': ...} entries, which would have to be searched one by one
+    # Each map is turned into a dictionary keyed by 'map_key' the first time it's used
+    ### layer_data = loaded "layer data" object (DB_LAYER_DATA)
+    def __init__(self, layer_data):
+        self.layer_data = layer_data
+        self.__maps = {}
+    
+    
+    # Get the entries of a map as a dictionary keyed by 'map_key'
+    # If a key appears more than once, the first entry is used, like when searching the list
+    ### map_name = name of the map in the "layer data" object (e.g. 'diag_com_refs', 'dop_refs_map', 'table_refs_map')
+    def get_map(self, map_name):
+        if map_name not in self.__maps:
+            entries = {}
+            for entry in self.layer_data[map_name]:
+                entries.setdefault(entry['map_key'], entry)
+            self.__maps[map_name] = entries
+        return self.__maps[map_name]
+    
+    
+    # Get the entry of a map with the given key
+    ### map_name = name of the map in the "layer data" object
+    ### map_key  = key of the entry (e.g. 'DiagnServi_ReadDataByIdentMeasuValue')
+    # * returns None if there is no such entry
+    def get_entry(self, map_name, map_key):
+        return self.get_map(map_name).get(map_key)
+    
+    
+    # Get the reference of the entry of a map with the given key
+    ### map_name = name of the map in the "layer data" object
+    ### map_key  = key of the entry
+    # * returns None if there is no such entry
+    def get_reference(self, map_name, map_key):
+        entry = self.get_entry(map_name, map_key)
+        if entry is None:
+            return None
+        return entry['reference']
@@ -0,0 +1,122 @@
+import json
+import os
+import pickle
+import sqlite3
+import zlib
+
+from classes.DumpManifest import DumpManifest
+
+
+class MwbModelCache:
+    # Constructor
+    # The parsed MWB table of each ECU-VARIANT is kept on disk, one row per DID, so decoding a DID only needs to load that row
+    # Each ECU-VARIANT is recorded with the tool version and the size and modification time of all input files it was made from
+    # Unlike DumpManifest, the input files are not hashed, since that alone would take longer than parsing the MWB table again
+    ### cache_file_path = path of the SQLite file (created if it doesn't exist)
+    def __init__(self, cache_file_path):
+        cache_folder_path = os.path.dirname(os.path.abspath(cache_file_path))
+        if not os.path.isdir(cache_folder_path):
+            os.makedirs(cache_folder_path)
+        
+        self.__tool_version = DumpManifest.get_tool_version()
+        
+        self.__connection = sqlite3.connect(cache_file_path)
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS variants (project TEXT NOT NULL, base_variant TEXT NOT NULL, ecu_variant TEXT NOT NULL, tool_version TEXT NOT NULL, inputs TEXT NOT NULL, PRIMARY KEY (project, base_variant, ecu_variant)) WITHOUT ROWID')
+        
+        # The table row parameter is stored as compressed pickle, since it's only read back by this tool
+        # It's NULL if the DID has no table row (see get_mwb_name_and_table_row_parameter_by_did)
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS mwbs (project TEXT NOT NULL, base_variant TEXT NOT NULL, ecu_variant TEXT NOT NULL, did INTEGER NOT NULL, long_name TEXT, long_name_id TEXT, table_row_parameter BLOB, PRIMARY KEY (project, base_variant, ecu_variant, did)) WITHOUT ROWID')
+        self.__connection.commit()
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Get the key under which an ECU-VARIANT is recorded
+    def __get_key(self, project_folder_path, base_variant_PoolID, ecu_variant_name):
+        return (os.path.abspath(project_folder_path), base_variant_PoolID, ecu_variant_name)
+    
+    
+    # Get the size and modification time of an input file (None if it doesn't exist)
+    @staticmethod
+    def __get_input_file_stat(input_file_path):
+        if not os.path.isfile(input_file_path):
+            return None
+        file_stat = os.stat(input_file_path)
+        return [file_stat.st_size, file_stat.st_mtime_ns]
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Check whether the MWBs of an ECU-VARIANT were stored by this tool version, from the current input files
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### base_variant_PoolID = name of the BASE-VARIANT Pool (.bv.db file, without extension)
+    ### ecu_variant_name    = name of the ECU-VARIANT
+    def is_valid(self, project_folder_path, base_variant_PoolID, ecu_variant_name):
+        row = self.__connection.execute('SELECT tool_version, inputs FROM variants WHERE project = ? AND base_variant = ? AND ecu_variant = ?', self.__get_key(project_folder_path, base_variant_PoolID, ecu_variant_name)).fetchone()
+        if row is None or row[0] != self.__tool_version:
+            return False
+        
+        for input_file_path, recorded_stat in json.loads(row[1]).items():
+            if MwbModelCache.__get_input_file_stat(input_file_path) != recorded_stat:
+                return False
+        
+        return True
+    
+    
+    # Store the MWBs of an ECU-VARIANT, replacing the previous ones
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### base_variant_PoolID = name of the BASE-VARIANT Pool (.bv.db file, without extension)
+    ### ecu_variant_name    = name of the ECU-VARIANT
+    ### pool_ids            = PoolIDs of all Pools the MWBs were made from
+    ### mwb_rows            = dictionary of DID -> (LONG-NAME, LONG-NAME-ID, table row parameter or None)
+    def store(self, project_folder_path, base_variant_PoolID, ecu_variant_name, pool_ids, mwb_rows):
+        key = self.__get_key(project_folder_path, base_variant_PoolID, ecu_variant_name)
+        
+        inputs = {}
+        for input_file_path in DumpManifest.get_input_file_paths(project_folder_path, pool_ids):
+            input_file_stat = MwbModelCache.__get_input_file_stat(input_file_path)
+            if input_file_stat is not None:
+                inputs[input_file_path] = input_file_stat
+        
+        self.__connection.execute('DELETE FROM mwbs WHERE project = ? AND base_variant = ? AND ecu_variant = ?', key)
+        self.__connection.executemany('INSERT INTO mwbs VALUES (?, ?, ?, ?, ?, ?, ?)', (
+            key + (did, long_name, long_name_id, None if table_row_parameter is None else zlib.compress(pickle.dumps(table_row_parameter, pickle.HIGHEST_PROTOCOL)))
+            for did, (long_name, long_name_id, table_row_parameter) in mwb_rows.items()
+        ))
+        
+        # The ECU-VARIANT is only recorded with its MWBs, in the same transaction
+        self.__connection.execute('INSERT OR REPLACE INTO variants VALUES (?, ?, ?, ?, ?)', key + (self.__tool_version, json.dumps(inputs)))
+        self.__connection.commit()
+    
+    
+    # Get the MWB of a DID
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### base_variant_PoolID = name of the BASE-VARIANT Pool (.bv.db file, without extension)
+    ### ecu_variant_name    = name of the ECU-VARIANT
+    ### did                 = DID (integer)
+    # * returns (LONG-NAME, LONG-NAME-ID, table row parameter or None), or None if the ECU-VARIANT has no such DID
+    def get_mwb(self, project_folder_path, base_variant_PoolID, ecu_variant_name, did):
+        row = self.__connection.execute('SELECT long_name, long_name_id, table_row_parameter FROM mwbs WHERE project = ? AND base_variant = ? AND ecu_variant = ? AND did = ?', self.__get_key(project_folder_path, base_variant_PoolID, ecu_variant_name) + (did,)).fetchone()
+        if row is None:
+            return None
+        
+        (long_name, long_name_id, table_row_parameter) = row
+        if table_row_parameter is not None:
+            table_row_parameter = pickle.loads(zlib.decompress(table_row_parameter))
+        return (long_name, long_name_id, table_row_parameter)
+    
+    
+    # Get all DIDs of an ECU-VARIANT
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### base_variant_PoolID = name of the BASE-VARIANT Pool (.bv.db file, without extension)
+    ### ecu_variant_name    = name of the ECU-VARIANT
+    def get_dids(self, project_folder_path, base_variant_PoolID, ecu_variant_name):
+        cursor = self.__connection.execute('SELECT did FROM mwbs WHERE project = ? AND base_variant = ? AND ecu_variant = ? ORDER BY did', self.__get_key(project_folder_path, base_variant_PoolID, ecu_variant_name))
+        return [row[0] for row in cursor]
+    
+    
+    # Close the cache
+    def close(self):
+        self.__connection.close()
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+
+
+class ObjectCatalog:
+    # Columns of the catalog, one row for each Object of each Pool of each Project
+    columns = [
+        'project',              # name of the Project (folder)
+        'pool_id',              # name of the Pool (.db/.key file pair, without extension)
+        'category',             # type of the Pool, from its extension (see enum_converters.get_db_file_type)
+        'object_id',            # name of the Object
+        'object_id_hash',       # hash of the Object's name (key of the PBL record)
+        'data_hash',            # hash of the Object's compressed data (see ObjectStore.get_data_hash)
+        'object_type_enum',     # type enum from the first 2 bytes of the Object's data
+        'object_type',          # name of the type enum (None if unknown)
+        'file_offset',          # position of the Object's compressed data in the .db file
+        'compressed_size',      # size of the Object's compressed data
+        'decompressed_size'     # size of the Object's data
+    ]
+    
+    
+    # Constructor
+    ### catalog_file_path = path of the SQLite file (created if it doesn't exist)
+    def __init__(self, catalog_file_path):
+        catalog_folder_path = os.path.dirname(os.path.abspath(catalog_file_path))
+        if not os.path.isdir(catalog_folder_path):
+            os.makedirs(catalog_folder_path)
+        
+        self.__connection = sqlite3.connect(catalog_file_path)
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS objects (project TEXT NOT NULL, pool_id TEXT NOT NULL, category TEXT NOT NULL, object_id TEXT, object_id_hash INTEGER NOT NULL, data_hash BLOB NOT NULL, object_type_enum INTEGER, object_type TEXT, file_offset INTEGER NOT NULL, compressed_size INTEGER NOT NULL, decompressed_size INTEGER NOT NULL)')
+        
+        # Indexes for the most common lookups
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS objects_by_pool ON objects (project, pool_id)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS objects_by_object_id ON objects (object_id)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS objects_by_object_type ON objects (object_type, project)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS objects_by_data_hash ON objects (data_hash)')
+        self.__connection.commit()
+    
+    
+    # Remove all Objects of a Project (before it's added again)
+    ### project_name = name of the Project
+    def clear_project(self, project_name):
+        self.__connection.execute('DELETE FROM objects WHERE project = ?', (project_name,))
+    
+    
+    # Add the Objects of a Pool
+    ### rows = list of tuples with values for all columns (in the order of `columns`)
+    def add_objects(self, rows):
+        self.__connection.executemany('INSERT INTO objects VALUES ({})'.format(', '.join('?' * len(ObjectCatalog.columns))), rows)
+    
+    
+    # Run a query on the catalog
+    ### query      = SQL query (the table is named "objects")
+    ### parameters = values for the placeholders in the query
+    # * returns a list of dictionaries, keyed by column name
+    def query(self, query, parameters = ()):
+        cursor = self.__connection.execute(query, parameters)
+        column_names = [x[0] for x in cursor.description]
+        return [dict(zip(column_names, row)) for row in cursor]
+    
+    
+    # Find where an Object is stored
+    ### object_id    = name of the Object
+    ### project_name = name of the Project (None = all Projects)
+    def find_object(self, object_id, project_name = None):
+        if project_name is None:
+            return self.query('SELECT * FROM objects WHERE object_id = ?', (object_id,))
+        return self.query('SELECT * FROM objects WHERE object_id = ? AND project = ?', (object_id, project_name))
+    
+    
+    # Get the names of the Projects in the catalog
+    def get_project_names(self):
+        return [x['project'] for x in self.query('SELECT DISTINCT project FROM objects ORDER BY project')]
+    
+    
+    # Save all added Objects to disk
+    def commit(self):
+        self.__connection.commit()
+    
+    
+    # Discard all Objects added (or removed) since the last commit, e.g. when a Project failed part way
+    def rollback(self):
+        self.__connection.rollback()
+    
+    
+    # Save and close the catalog
+    def close(self):
+        self.__connection.commit()
+        self.__connection.close()
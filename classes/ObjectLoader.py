@@ -1,10 +1,17 @@
 import os
+from collections import OrderedDict
 
 from classes.PblRecordManager import PblRecordManager
+from classes.LayerDataIndex import LayerDataIndex
 from classes import DbObject
 
 
 class ObjectLoader:
+    # Number of layer chains, and of "layer data" objects, whose indexes and DOP lookups are kept (the least recently used are dropped)
+    # The dumpers go through the ECU-VARIANTs one by one, so only the most recent ones are needed
+    dop_cache_size = 32
+    
+    
     # Split a database reference object into a tuple containing the PoolID and ObjectID which it refers to
     ### reference = dictionary containing keys 'pool_id' and 'object_id'
     @staticmethod
@@ -26,6 +33,24 @@ class ObjectLoader:
         return PblRecordManager.get_object_data(db_file, file_position, compressed_size, decompressed_size)
     
     
+    # Read the Object's compressed data (zlib stream) using the provided PBL record data and an already opened .db file
+    ### pbl_data = bytearray representing the PBL record data for the desired Object
+    ### db_file  = appropriate .db file (representing the desired Pool), opened in 'rb' mode
+    @staticmethod
+    def get_compressed_object_data_from_opened_db_file(pbl_data, db_file):
+        (file_position, compressed_size, decompressed_size) = PblRecordManager.parse_pbl_data(pbl_data)
+        return PblRecordManager.get_compressed_object_data(db_file, file_position, compressed_size)
+    
+    
+    # Decompress the Object's data read with `get_compressed_object_data_from_opened_db_file`
+    ### pbl_data        = bytearray representing the PBL record data for the desired Object
+    ### compressed_data = zlib stream read from the .db file
+    @staticmethod
+    def decompress_object_data(pbl_data, compressed_data):
+        (file_position, compressed_size, decompressed_size) = PblRecordManager.parse_pbl_data(pbl_data)
+        return PblRecordManager.decompress_object_data(compressed_data, decompressed_size)
+    
+    
     # Open the appropriate .db file and load the Object's data using the provided PBL record data
     ### pbl_data          = bytearray representing the PBL record data for the desired Object
     ### input_folder_path = path to Project folder, containing .db files
@@ -49,8 +74,93 @@ class ObjectLoader:
         # PBL records will be stored per instance, for each loaded Pool
         self.__loaded_pbl_records = {}
         
-        # Same for DOP references
-        self.__dop_cache = {}
+        # Same for DOP references without PoolID, resolved to (PoolID, ObjectID)
+        # They're stored per layer chain, identified by the `id` of each "layer data" object in it, as (layer chain, {ObjectID: reference})
+        # The objects are kept along with the resolved references, so their `id` can't be reused by other objects
+        self.__dop_cache = OrderedDict()
+        
+        # Index of each "layer data" object, keyed by `id` (the index keeps the object, so its `id` can't be reused)
+        self.__layer_data_indexes = OrderedDict()
+        
+        # Loaded Objects of the types chosen with `cache_objects`, keyed by (PoolID, ObjectID)
+        self.__cached_object_types = set()
+        self.__object_cache = {}
+        
+        # PoolIDs of all Pools which Objects were loaded from, since the last reset
+        # This is used to know which input files an output was made from
+        self.__accessed_pool_ids = set()
+        
+        # Used for finding Objects which are referenced without PoolID, but are missing from the layer data maps
+        self.__object_locator = None
+    
+    
+    # Get the DOP references already resolved for a layer chain, as a dictionary keyed by ObjectID
+    ### layer_data_objects = list of "layer data" objects
+    def __get_resolved_dop_references(self, layer_data_objects):
+        layer_chain_key = tuple(id(x) for x in layer_data_objects)
+        if layer_chain_key in self.__dop_cache:
+            self.__dop_cache.move_to_end(layer_chain_key)
+        else:
+            self.__dop_cache[layer_chain_key] = (list(layer_data_objects), {})
+            if len(self.__dop_cache) > ObjectLoader.dop_cache_size:
+                self.__dop_cache.popitem(last=False)
+        return self.__dop_cache[layer_chain_key][1]
+    
+    
+    # Get the index of a "layer data" object, for looking up the entries of its maps by key
+    # The index is only built once for the most recently used objects, so it can be requested again instead of being passed around
+    ### layer_data_object = "layer data" object
+    def get_layer_data_index(self, layer_data_object):
+        if id(layer_data_object) in self.__layer_data_indexes:
+            self.__layer_data_indexes.move_to_end(id(layer_data_object))
+        else:
+            self.__layer_data_indexes[id(layer_data_object)] = LayerDataIndex(layer_data_object)
+            if len(self.__layer_data_indexes) > ObjectLoader.dop_cache_size:
+                self.__layer_data_indexes.popitem(last=False)
+        return self.__layer_data_indexes[id(layer_data_object)]
+    
+    
+    # Allow references without PoolID to be resolved by searching all Pools of the Project, if they are not in the layer data maps
+    # The MCD Kernel fails to load such references, so this is only done if requested
+    ### object_locator = instance of ObjectLocator class, for the current Project (None = disable)
+    def set_object_locator(self, object_locator):
+        self.__object_locator = object_locator
+    
+    
+    # Get the names of the loading options which change the loaded Objects, to be recorded with the outputs made from them
+    # Outputs made with other options (e.g. with placeholders for DOPs which couldn't be located) are then redone
+    def get_output_options(self):
+        if self.__object_locator is not None:
+            return ['locate-dops']
+        return []
+    
+    
+    # Keep the loaded Objects of some types, so loading them again returns the same object instead of decoding it again
+    # This is meant for Objects which are loaded by several dumpers (e.g. "layer data"), the returned objects must not be modified
+    ### object_types = list of object types (e.g. 'DB_LAYER_DATA')
+    def cache_objects(self, object_types):
+        self.__cached_object_types.update(object_types)
+    
+    
+    # Forget the Objects kept because of `cache_objects` (e.g. once a BASE-VARIANT is done)
+    def clear_object_cache(self):
+        self.__object_cache = {}
+    
+    
+    # Forget which Pools were accessed until now
+    def reset_accessed_pool_ids(self):
+        self.__accessed_pool_ids = set()
+    
+    
+    # Get the PoolIDs of all Pools which Objects were loaded from (by ID or reference) since the last reset
+    def get_accessed_pool_ids(self):
+        return set(self.__accessed_pool_ids)
+    
+    
+    # Count Pools as accessed without loading anything from them (e.g. when a result made from their Objects is reused)
+    ### pool_ids = PoolIDs of the Pools
+    def add_accessed_pool_ids(self, pool_ids):
+        self.__accessed_pool_ids.update(pool_ids)
     
     
     # Load an Object from its bytearray of data
@@ -92,12 +202,20 @@ class ObjectLoader:
         if PoolID not in self.__loaded_pbl_records:
             self.__loaded_pbl_records[PoolID] = self.__pbl_record_manager.get_all_records(input_folder_path, PoolID)
         
+        self.__accessed_pool_ids.add(PoolID)
+        
+        if (PoolID, ObjectID) in self.__object_cache:
+            return self.__object_cache[(PoolID, ObjectID)]
+        
         # Convert the given ObjectID string to its hash, which will be used as a key for the PBL record
         ObjectID_hash = self.__string_storage.get_ascii_hash(ObjectID)
         
         # Get the PBL record data belonging to the requested Object, and load it
         pbl_data = self.__loaded_pbl_records[PoolID][ObjectID_hash]
-        return self.load_object_by_pbl_data(pbl_data, input_folder_path, PoolID)
+        obj = self.load_object_by_pbl_data(pbl_data, input_folder_path, PoolID)
+        if type(obj) is dict and obj['#OBJECT_TYPE'] in self.__cached_object_types:
+            self.__object_cache[(PoolID, ObjectID)] = obj
+        return obj
     
     
     # Load an Object by a reference
@@ -111,13 +229,57 @@ class ObjectLoader:
         return self.load_object_by_id(input_folder_path, PoolID, ObjectID)
     
     
-    # Load a DOP reference which may be missing the PoolID (file name)
+    # Load many Objects by their references at once (e.g. all rows of a table)
+    # Each .db file is only opened once, and the Objects are read in order of their position in it
     ### input_folder_path = path to Project folder, containing .db files
-    ### layer_data_objects  = list or "layer data" objects
-    ### reference           = reference of the DOP to load
+    ### references        = list of dictionaries containing keys 'pool_id' and 'object_id'
     ### * PblRecordManager instance needed in constructor
     ### * StringStorage instance needed in constructor
-    def load_DOP_by_reference_without_PoolID(self, input_folder_path, layer_data_objects, reference):
+    # * returns a list of the loaded Objects, in the same order as the references
+    def load_objects_by_references(self, input_folder_path, references):
+        if self.__pbl_record_manager is None:
+            raise RuntimeError('Cannot use method with invalid PblRecordManager')
+        if self.__string_storage is None:
+            raise RuntimeError('Cannot use method with invalid StringStorage')
+        
+        objects = [None] * len(references)
+        
+        # Group the references by Pool, keeping the index of each one, so the Objects can be returned in order
+        pool_references = {}
+        for (index, reference) in enumerate(references):
+            (PoolID, ObjectID) = ObjectLoader.decode_object_reference(reference)
+            if (PoolID, ObjectID) in self.__object_cache:
+                objects[index] = self.__object_cache[(PoolID, ObjectID)]
+                self.__accessed_pool_ids.add(PoolID)
+            else:
+                pool_references.setdefault(PoolID, []).append((index, ObjectID))
+        
+        for (PoolID, indexed_object_ids) in pool_references.items():
+            # If the PBL records for the requested Pool do not exist, load them
+            if PoolID not in self.__loaded_pbl_records:
+                self.__loaded_pbl_records[PoolID] = self.__pbl_record_manager.get_all_records(input_folder_path, PoolID)
+            self.__accessed_pool_ids.add(PoolID)
+            
+            # Get the PBL record data of each Object, and sort them by their position in the .db file
+            pbl_data_list = [(index, ObjectID, self.__loaded_pbl_records[PoolID][self.__string_storage.get_ascii_hash(ObjectID)]) for (index, ObjectID) in indexed_object_ids]
+            pbl_data_list.sort(key=lambda x: PblRecordManager.parse_pbl_data(x[2])[0])
+            
+            with open(os.path.join(input_folder_path, PoolID + '.db'), 'rb') as db_file:
+                for (index, ObjectID, pbl_data) in pbl_data_list:
+                    obj = self.load_object_by_object_data(ObjectLoader.get_object_data_from_opened_db_file(pbl_data, db_file))
+                    if type(obj) is dict and obj['#OBJECT_TYPE'] in self.__cached_object_types:
+                        self.__object_cache[(PoolID, ObjectID)] = obj
+                    objects[index] = obj
+        
+        return objects
+    
+    
+    # Resolve a DOP reference which may be missing the PoolID (file name), without loading the DOP
+    ### layer_data_objects = list or "layer data" objects
+    ### reference          = reference of the DOP
+    ### * StringStorage instance needed in constructor (only if the DOP has to be located in the whole Project)
+    # * returns (PoolID, ObjectID)
+    def resolve_DOP_reference(self, layer_data_objects, reference):
         # Some parameters will not have a PoolID in the DOP reference
         # In this case, the provided ObjectID will be searched in the DOP reference map of the ECU-VARIANT's layer data
         # If it's not there, it will be searched in the DOP reference map of the BASE-VARIANT's layer data
@@ -128,29 +290,44 @@ class ObjectLoader:
         
         # If the PoolID is provided, use the reference directly
         if PoolID is not None:
-            # Load the DOP by the provided reference
-            return self.load_object_by_id(input_folder_path, PoolID, ObjectID)
+            return (PoolID, ObjectID)
                         
         # Otherwise, search in the map(s)
         else:
-            # If the DOP exists in the cache, load it directly
-            dop_cache = self.__dop_cache
-            if ObjectID in dop_cache:
-                return self.load_object_by_id(input_folder_path, dop_cache[ObjectID], ObjectID)
+            # If the DOP was already resolved for the same layers, use the same reference
+            resolved_dop_references = self.__get_resolved_dop_references(layer_data_objects)
+            if ObjectID in resolved_dop_references:
+                return resolved_dop_references[ObjectID]
             
-            # Search for the item in the map which has the needed ObjectID as the key
+            # Search for the needed ObjectID in the map of each layer, in order
             dop_reference = None
             for layer_data_object in layer_data_objects:
-                for dop_reference_map_item in layer_data_object['dop_refs_map']:
-                    if dop_reference_map_item['map_key'] == ObjectID:
-                        dop_reference = dop_reference_map_item['reference']
-                        break
+                dop_reference = self.get_layer_data_index(layer_data_object).get_reference('dop_refs_map', ObjectID)
                 if dop_reference is not None:
                     break
             
-            # It must have been found here
+            # It must have been found here, unless it can be located in the whole Project
             if dop_reference is None:
-                raise RuntimeError('Could not find DOP reference: {}'.format(ObjectID))
+                if self.__object_locator is None:
+                    raise RuntimeError('Could not find DOP reference: {}'.format(ObjectID))
+                
+                # The Object is only loaded if it exists in a single Pool, otherwise it's unclear which one was meant
+                pool_ids = self.__object_locator.get_pool_ids(self.__string_storage.get_ascii_hash(ObjectID))
+                if len(pool_ids) != 1:
+                    raise RuntimeError('Could not find DOP reference: {} (found in {} Pools: {})'.format(ObjectID, len(pool_ids), ', '.join(pool_ids)))
+                dop_reference = {'pool_id': pool_ids[0], 'object_id': ObjectID}
             
-            # Load the DOP by the reference that was found
-            return self.load_object_by_reference(input_folder_path, dop_reference)
+            resolved_dop_references[ObjectID] = ObjectLoader.decode_object_reference(dop_reference)
+            return resolved_dop_references[ObjectID]
+    
+    
+    # Load a DOP reference which may be missing the PoolID (file name)
+    ### input_folder_path  = path to Project folder, containing .db files
+    ### layer_data_objects = list or "layer data" objects
+    ### reference          = reference of the DOP to load
+    ### * PblRecordManager instance needed in constructor
+    ### * StringStorage instance needed in constructor
+    def load_DOP_by_reference_without_PoolID(self, input_folder_path, layer_data_objects, reference):
+        # Load the DOP by the reference that was found
+        (PoolID, ObjectID) = self.resolve_DOP_reference(layer_data_objects, reference)
+        return self.load_object_by_id(input_folder_path, PoolID, ObjectID)
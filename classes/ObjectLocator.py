@@ -0,0 +1,73 @@
+import json
+import os
+
+
+class ObjectLocator:
+    # Name of the cache file, written in the given cache folder
+    cache_file_name = 'object_locator.json'
+    
+    
+    # Constructor
+    # The index is only built (or loaded from the cache) the first time it's needed
+    ### pbl_record_manager  = instance of PblRecordManager class
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### cache_folder_path   = folder where the index is cached between runs (None = don't cache)
+    def __init__(self, pbl_record_manager, project_folder_path, cache_folder_path = None):
+        self.__pbl_record_manager = pbl_record_manager
+        self.__project_folder_path = project_folder_path
+        self.__cache_file_path = None if cache_folder_path is None else os.path.join(cache_folder_path, ObjectLocator.cache_file_name)
+        
+        # PoolIDs of all Pools containing each ObjectID hash
+        self.__pool_ids = None
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Get the size and modification time of each .key file in the Project, keyed by PoolID
+    def __get_key_file_stats(self):
+        key_file_stats = {}
+        for current_filename in sorted(os.listdir(self.__project_folder_path)):
+            (PoolID, extension) = os.path.splitext(current_filename)
+            key_file_path = os.path.join(self.__project_folder_path, current_filename)
+            if extension == '.key' and os.path.isfile(key_file_path):
+                key_file_stat = os.stat(key_file_path)
+                key_file_stats[PoolID] = [key_file_stat.st_size, key_file_stat.st_mtime_ns]
+        return key_file_stats
+    
+    
+    # Load the index from the cache, or build it from all .key files of the Project
+    def __load_index(self):
+        key_file_stats = self.__get_key_file_stats()
+        
+        # The cache is only valid if none of the .key files changed
+        if self.__cache_file_path is not None and os.path.isfile(self.__cache_file_path):
+            with open(self.__cache_file_path, 'r', encoding='utf-8') as cache_file:
+                cache = json.load(cache_file)
+            if cache['key_files'] == key_file_stats:
+                # JSON only allows string keys
+                self.__pool_ids = {int(ObjectID_hash): pool_ids for ObjectID_hash, pool_ids in cache['pool_ids'].items()}
+                return
+        
+        # Each .key file has a record for each Object in the Pool, keyed by the hash of its ObjectID
+        self.__pool_ids = {}
+        for PoolID in key_file_stats:
+            for ObjectID_hash in self.__pbl_record_manager.get_all_records(self.__project_folder_path, PoolID):
+                self.__pool_ids.setdefault(ObjectID_hash, []).append(PoolID)
+        
+        if self.__cache_file_path is not None:
+            temp_cache_file_path = self.__cache_file_path + '.tmp'
+            with open(temp_cache_file_path, 'w', encoding='utf-8') as cache_file:
+                json.dump({'key_files': key_file_stats, 'pool_ids': self.__pool_ids}, cache_file)
+            os.replace(temp_cache_file_path, self.__cache_file_path)
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Get the PoolIDs of all Pools in the Project which contain an Object
+    ### ObjectID_hash = hash of the Object's name (see StringStorage.get_ascii_hash)
+    def get_pool_ids(self, ObjectID_hash):
+        if self.__pool_ids is None:
+            self.__load_index()
+        return list(self.__pool_ids.get(ObjectID_hash, []))
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+
+
+class ObjectStore:
+    # Name of the store file, written in the main output folder
+    store_file_name = 'object_store.sqlite'
+    
+    
+    # Get the hash of an Object's compressed data, as read from the .db file
+    ### compressed_data = zlib stream of the Object
+    @staticmethod
+    def get_data_hash(compressed_data):
+        return hashlib.blake2b(compressed_data, digest_size=16).digest()
+    
+    
+    # Get the line written to a dump in place of an Object which is in the store
+    ### ObjectID     = name of the Object
+    ### content_hash = key of the Object's dump in the store (hex string)
+    @staticmethod
+    def get_reference(ObjectID, content_hash):
+        return '\'{}\' -> {}'.format(ObjectID, content_hash)
+    
+    
+    # Constructor
+    ### output_folder_path = main output folder, where the store is written
+    def __init__(self, output_folder_path):
+        if not os.path.isdir(output_folder_path):
+            os.makedirs(output_folder_path)
+        
+        self.__connection = sqlite3.connect(os.path.join(output_folder_path, ObjectStore.store_file_name))
+        
+        # The strings read while loading the Object with the given compressed data
+        # Identical data always reads the same string hashes, but they may resolve to different strings in another Project
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS data_strings (data_hash BLOB PRIMARY KEY, strings TEXT NOT NULL)')
+        
+        # The dumps of all distinct Objects (zlib-compressed UTF-8 text), keyed by the hash of their compressed data and resolved strings
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS objects (content_hash BLOB PRIMARY KEY, object_type TEXT NOT NULL, dump BLOB NOT NULL)')
+        self.__connection.commit()
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Get the key of an Object's dump, from the hash of its compressed data and the strings it uses
+    def __get_content_hash(self, data_hash, string_references, string_storage):
+        resolved_strings = []
+        for (string_type, string_hash) in string_references:
+            if string_type == 'A':
+                resolved_strings.append(string_storage.get_ascii_string(string_hash))
+            else:
+                resolved_strings.append(string_storage.get_unicode_string(string_hash))
+        return hashlib.blake2b(data_hash + json.dumps(resolved_strings).encode('utf-8'), digest_size=16).digest()
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Find an Object in the store without loading it
+    ### data_hash      = hash of the Object's compressed data (see get_data_hash)
+    ### string_storage = instance of StringStorage, loaded from the Object's Project
+    # * returns the content hash (hex string) if the Object's dump is in the store, otherwise None
+    def find(self, data_hash, string_storage):
+        row = self.__connection.execute('SELECT strings FROM data_strings WHERE data_hash = ?', (data_hash,)).fetchone()
+        if row is None:
+            return None
+        
+        # The strings are resolved in the current Project, which may give a different dump than the one from another Project
+        content_hash = self.__get_content_hash(data_hash, json.loads(row[0]), string_storage)
+        if self.__connection.execute('SELECT 1 FROM objects WHERE content_hash = ?', (content_hash,)).fetchone() is None:
+            return None
+        return content_hash.hex()
+    
+    
+    # Add a loaded Object's dump to the store (if it isn't there already)
+    ### data_hash         = hash of the Object's compressed data (see get_data_hash)
+    ### string_references = strings read while loading the Object (see StringStorage.stop_recording_strings)
+    ### string_storage    = instance of StringStorage, loaded from the Object's Project
+    ### object_type       = type of the Object
+    ### dump              = text of the Object's dump
+    # * returns the content hash (hex string)
+    def add(self, data_hash, string_references, string_storage, object_type, dump):
+        self.__connection.execute('INSERT OR REPLACE INTO data_strings VALUES (?, ?)', (data_hash, json.dumps(string_references)))
+        
+        content_hash = self.__get_content_hash(data_hash, string_references, string_storage)
+        self.__connection.execute('INSERT OR IGNORE INTO objects VALUES (?, ?, ?)', (content_hash, object_type, zlib.compress(dump.encode('utf-8'))))
+        return content_hash.hex()
+    
+    
+    # Get the dump of an Object from the store
+    ### content_hash = key of the Object's dump (hex string, as written in the Pool files)
+    def get_dump(self, content_hash):
+        row = self.__connection.execute('SELECT dump FROM objects WHERE content_hash = ?', (bytes.fromhex(content_hash),)).fetchone()
+        if row is None:
+            raise RuntimeError('Object not found in store: {}'.format(content_hash))
+        return zlib.decompress(row[0]).decode('utf-8')
+    
+    
+    # Save all added Objects to disk
+    # * this must be done before an output file which references them is checkpointed or completed
+    def commit(self):
+        self.__connection.commit()
+    
+    
+    # Save and close the store
+    def close(self):
+        self.__connection.commit()
+        self.__connection.close()
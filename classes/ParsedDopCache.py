@@ -0,0 +1,143 @@
+from common_utils import object_hasher
+
+
+class ParsedDopCache:
+    # Constructor
+    # Parsed DOPs are kept by (PoolID, ObjectID), so a DOP referenced by many parameters (or ECU-VARIANTs) is only parsed once
+    # The same parsed object is returned each time, so it must not be modified by the caller
+    # A DOP may reference other DOPs without PoolID, which are resolved through the "layer data" objects of the variant being parsed
+    # The resolved names are recorded with each result, which is only reused for layers which resolve them the same way
+    # They are only checked once for each list of layers, so a repeated reference doesn't cost more than a lookup
+    ### verify = whether to keep the hash of each result and check it each time it's returned, so a modification raises an error (slow, for debugging)
+    def __init__(self, verify = False):
+        self.__verify = verify
+        
+        # Project the cached DOPs were parsed from (the cache is emptied when it changes)
+        self.__project_folder_path = None
+        
+        # Parsed DOPs, keyed by (PoolID, ObjectID), as a list of (resolved names, accessed PoolIDs, parsed DOP, hash of parsed DOP, keys of matching layer lists) tuples
+        # The resolved names are a dictionary of ObjectID -> (PoolID, ObjectID), or None if it couldn't be resolved
+        # The hash is only computed when verifying
+        self.__entries = {}
+        
+        # Lists of "layer data" objects keyed by the ids of their objects, which are kept so the ids can't be reused
+        self.__layer_lists = {}
+        
+        # Resolved names of the DOPs currently being parsed (the innermost one is last), as lists of dictionaries merged when it's done
+        self.__open_entries = []
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Empty the cache if a different Project is being parsed
+    def __select_project(self, project_folder_path):
+        if self.__project_folder_path != project_folder_path:
+            self.__project_folder_path = project_folder_path
+            self.__entries = {}
+            self.__layer_lists = {}
+    
+    
+    # Get the key of a list of "layer data" objects
+    def __get_layer_list_key(self, layer_data_objects):
+        layer_list_key = tuple(id(x) for x in layer_data_objects)
+        if layer_list_key not in self.__layer_lists:
+            self.__layer_lists[layer_list_key] = list(layer_data_objects)
+        return layer_list_key
+    
+    
+    # Resolve a reference without PoolID, or return None if it can't be resolved
+    def __try_resolve(self, object_loader, layer_data_objects, ObjectID):
+        try:
+            return object_loader.resolve_DOP_reference(layer_data_objects, {'pool_id': None, 'object_id': ObjectID})
+        except RuntimeError:
+            return None
+    
+    
+    # Add resolved names to the DOP currently being parsed, since its result depends on them too
+    # The dictionary is only merged once the DOP is parsed, so it must not be modified afterwards
+    def __record_resolved_names(self, resolved_names):
+        if len(self.__open_entries) != 0 and len(resolved_names) != 0:
+            self.__open_entries[-1].append(resolved_names)
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Resolve a DOP reference which may be missing the PoolID (see ObjectLoader.resolve_DOP_reference)
+    # References without PoolID are recorded, so the DOP being parsed is only reused for layers which resolve them the same way
+    ### object_loader      = instance of ObjectLoader
+    ### layer_data_objects = list or "layer data" objects
+    ### reference          = reference of the DOP
+    # * returns (PoolID, ObjectID)
+    def resolve_reference(self, object_loader, layer_data_objects, reference):
+        if reference['pool_id'] is not None:
+            return (reference['pool_id'], reference['object_id'])
+        
+        # A failed resolution is recorded too, since it's part of the result (e.g. an error message)
+        resolved_reference = self.__try_resolve(object_loader, layer_data_objects, reference['object_id'])
+        self.__record_resolved_names({reference['object_id']: resolved_reference})
+        if resolved_reference is None:
+            return object_loader.resolve_DOP_reference(layer_data_objects, reference)
+        return resolved_reference
+    
+    
+    # Get a DOP which was already parsed
+    ### object_loader       = instance of ObjectLoader
+    ### layer_data_objects  = list or "layer data" objects, used for checking the references without PoolID
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### PoolID              = name of the DOP's Pool
+    ### ObjectID            = name of the DOP
+    # * returns None if the DOP wasn't parsed yet for layers which resolve its references the same way
+    def get(self, object_loader, layer_data_objects, project_folder_path, PoolID, ObjectID):
+        self.__select_project(project_folder_path)
+        
+        layer_list_key = self.__get_layer_list_key(layer_data_objects)
+        for (resolved_names, pool_ids, parsed_dop, parsed_dop_hash, layer_list_keys) in self.__entries.get((PoolID, ObjectID), []):
+            # The names are only resolved the first time the result is requested for these layers
+            if layer_list_key not in layer_list_keys:
+                if not all(self.__try_resolve(object_loader, layer_data_objects, name) == resolved_reference for name, resolved_reference in resolved_names.items()):
+                    continue
+                layer_list_keys.add(layer_list_key)
+            
+            # The result is shared by all references to the DOP, so it must still be the same as when it was parsed
+            if self.__verify and object_hasher.get_object_hash(parsed_dop) != parsed_dop_hash:
+                raise RuntimeError('Parsed DOP {} ({}) was modified after it was cached'.format(ObjectID, PoolID))
+            
+            # The Pools used for the result are still needed for the output, even if nothing is loaded from them
+            object_loader.add_accessed_pool_ids(pool_ids)
+            self.__record_resolved_names(resolved_names)
+            return parsed_dop
+        
+        return None
+    
+    
+    # Parse a DOP and keep the result
+    # If an exception occurs while parsing, nothing is kept
+    ### object_loader       = instance of ObjectLoader
+    ### layer_data_objects  = list or "layer data" objects, which the DOP is parsed for
+    ### project_folder_path = Project path (folder with .db and .key files)
+    ### PoolID              = name of the DOP's Pool
+    ### ObjectID            = name of the DOP
+    ### parse_function      = function without parameters, which parses the (already loaded) DOP and returns the result
+    def parse(self, object_loader, layer_data_objects, project_folder_path, PoolID, ObjectID, parse_function):
+        self.__select_project(project_folder_path)
+        
+        # The Pools accessed while parsing are tracked separately, then added back to the ones accessed before
+        previous_pool_ids = object_loader.get_accessed_pool_ids()
+        object_loader.reset_accessed_pool_ids()
+        self.__open_entries.append([])
+        try:
+            parsed_dop = parse_function()
+        finally:
+            resolved_names = {}
+            for names in self.__open_entries.pop():
+                resolved_names.update(names)
+            pool_ids = object_loader.get_accessed_pool_ids() | {PoolID}
+            object_loader.add_accessed_pool_ids(previous_pool_ids)
+        
+        # The enclosing DOP depends on the same references
+        self.__record_resolved_names(resolved_names)
+        parsed_dop_hash = object_hasher.get_object_hash(parsed_dop) if self.__verify else None
+        self.__entries.setdefault((PoolID, ObjectID), []).append((resolved_names, pool_ids, parsed_dop, parsed_dop_hash, {self.__get_layer_list_key(layer_data_objects)}))
+        return parsed_dop
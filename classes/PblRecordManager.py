@@ -85,19 +85,24 @@ class PblRecordManager:
         return (file_position, compressed_size, decompressed_size)
     
     
-    # Retrieve the data bytes of an Object from a Pool (.db file)
-    ### db_file                = appropriate .db file (representing the desired Pool), opened in 'rb' mode
-    ### db_file_position       = first field decoded from the PBL record data
-    ### compressed_data_size   = second field decoded from the PBL record data
-    ### decompressed_data_size = third field decoded from the PBL record data
+    # Read the compressed data bytes of an Object from a Pool (.db file)
+    ### db_file              = appropriate .db file (representing the desired Pool), opened in 'rb' mode
+    ### db_file_position     = first field decoded from the PBL record data
+    ### compressed_data_size = second field decoded from the PBL record data
     @staticmethod
-    def get_object_data(db_file, db_file_position, compressed_data_size, decompressed_data_size):
+    def get_compressed_object_data(db_file, db_file_position, compressed_data_size):
         # Go to the indicated position in the file
         db_file.seek(db_file_position)
         
         # Read the specified amount of bytes (zlib stream)
-        compressed_data = db_file.read(compressed_data_size)
-        
+        return db_file.read(compressed_data_size)
+    
+    
+    # Decompress the compressed data bytes of an Object
+    ### compressed_data        = zlib stream read from the .db file
+    ### decompressed_data_size = third field decoded from the PBL record data
+    @staticmethod
+    def decompress_object_data(compressed_data, decompressed_data_size):
         # Decompress the zlib stream
         decompressed_data = bytearray(zlib.decompress(compressed_data))
         
@@ -107,3 +112,25 @@ class PblRecordManager:
         
         # Return the Object's data bytes as a bytearray
         return decompressed_data
+    
+    
+    # Get the type enum of an Object from its compressed data, without decompressing all of it
+    ### compressed_data = zlib stream read from the .db file
+    @staticmethod
+    def get_object_type_enum_from_compressed_data(compressed_data):
+        # The first 2 bytes of an Object's data are an enum which represents the Object's type, so only they are inflated
+        header = zlib.decompressobj().decompress(compressed_data, 2)
+        if len(header) != 2:
+            raise RuntimeError('get_object_type_enum_from_compressed_data: Object data too short ({} bytes)'.format(len(header)))
+        return struct.unpack('<H', header)[0]
+    
+    
+    # Retrieve the data bytes of an Object from a Pool (.db file)
+    ### db_file                = appropriate .db file (representing the desired Pool), opened in 'rb' mode
+    ### db_file_position       = first field decoded from the PBL record data
+    ### compressed_data_size   = second field decoded from the PBL record data
+    ### decompressed_data_size = third field decoded from the PBL record data
+    @staticmethod
+    def get_object_data(db_file, db_file_position, compressed_data_size, decompressed_data_size):
+        compressed_data = PblRecordManager.get_compressed_object_data(db_file, db_file_position, compressed_data_size)
+        return PblRecordManager.decompress_object_data(compressed_data, decompressed_data_size)
@@ -0,0 +1,199 @@
+import json
+import os
+import struct
+import sys
+from array import array
+
+
+class ReferenceGraph:
+    # Identifier at the start of a saved graph file
+    file_magic = b'RGRAPH01'
+    
+    
+    # Build the adjacency arrays of a set of edges
+    # All edges of a node are stored consecutively in `neighbors`, from `offsets[node]` to `offsets[node + 1]`
+    ### from_nodes = array of edge start nodes
+    ### to_nodes   = array of edge end nodes
+    ### node_count = number of nodes
+    @staticmethod
+    def build_adjacency(from_nodes, to_nodes, node_count):
+        offsets = array('I', bytes(4 * (node_count + 1)))
+        for from_node in from_nodes:
+            offsets[from_node + 1] += 1
+        for node in range(node_count):
+            offsets[node + 1] += offsets[node]
+        
+        positions = array('I', offsets[:-1])
+        neighbors = array('I', bytes(4 * len(from_nodes)))
+        for from_node, to_node in zip(from_nodes, to_nodes):
+            neighbors[positions[from_node]] = to_node
+            positions[from_node] += 1
+        
+        return (offsets, neighbors)
+    
+    
+    # Load a graph saved with `save`
+    ### graph_file_path = path of the graph file
+    @staticmethod
+    def load(graph_file_path):
+        graph = ReferenceGraph()
+        with open(graph_file_path, 'rb') as graph_file:
+            if graph_file.read(len(ReferenceGraph.file_magic)) != ReferenceGraph.file_magic:
+                raise RuntimeError('Not a reference graph file: {}'.format(graph_file_path))
+            
+            # The header contains the nodes and the sizes of the arrays which follow it
+            header_size = struct.unpack('<I', graph_file.read(4))[0]
+            header = json.loads(graph_file.read(header_size).decode('utf-8'))
+            for (PoolID, ObjectID) in header['nodes']:
+                graph.get_node((PoolID, ObjectID))
+            
+            arrays = []
+            for array_length in header['array_lengths']:
+                loaded_array = array('I')
+                loaded_array.frombytes(graph_file.read(4 * array_length))
+                if len(loaded_array) != array_length:
+                    raise RuntimeError('Reference graph file is truncated: {}'.format(graph_file_path))
+                if sys.byteorder == 'big':
+                    loaded_array.byteswap()
+                arrays.append(loaded_array)
+        
+        # The edges are only rebuilt from the arrays if more are added
+        (graph.__forward_offsets, graph.__forward_neighbors, graph.__reverse_offsets, graph.__reverse_neighbors) = arrays
+        graph.__from_nodes = None
+        graph.__to_nodes = None
+        return graph
+    
+    
+    # Constructor (empty graph)
+    def __init__(self):
+        # Each node is an Object, identified by a (PoolID, ObjectID) tuple
+        # The PoolID is None for references which couldn't be resolved to a Pool
+        self.__nodes = []
+        self.__node_indexes = {}
+        
+        # Edges, from the referencing Object to the referenced Object (None = only stored in the adjacency arrays)
+        self.__from_nodes = array('I')
+        self.__to_nodes = array('I')
+        
+        # Adjacency arrays, built from the edges when needed (None = must be rebuilt)
+        self.__forward_offsets = None
+        self.__forward_neighbors = None
+        self.__reverse_offsets = None
+        self.__reverse_neighbors = None
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Get the edges back from the adjacency arrays of a loaded graph, so the graph can be changed
+    def __load_edges(self):
+        if self.__from_nodes is not None:
+            return
+        self.__from_nodes = array('I')
+        self.__to_nodes = array('I')
+        for node in range(len(self.__forward_offsets) - 1):
+            for neighbor in self.__forward_neighbors[self.__forward_offsets[node] : self.__forward_offsets[node + 1]]:
+                self.__from_nodes.append(node)
+                self.__to_nodes.append(neighbor)
+    
+    
+    # Build the adjacency arrays if edges were added since they were last built
+    def __update_adjacency(self):
+        if self.__forward_offsets is not None:
+            return
+        (self.__forward_offsets, self.__forward_neighbors) = ReferenceGraph.build_adjacency(self.__from_nodes, self.__to_nodes, len(self.__nodes))
+        (self.__reverse_offsets, self.__reverse_neighbors) = ReferenceGraph.build_adjacency(self.__to_nodes, self.__from_nodes, len(self.__nodes))
+    
+    
+    # Get the neighbors of an Object from a set of adjacency arrays
+    def __get_neighbors(self, offsets, neighbors, PoolID, ObjectID):
+        node = self.__node_indexes.get((PoolID, ObjectID))
+        if node is None:
+            return []
+        return [self.__nodes[x] for x in neighbors[offsets[node] : offsets[node + 1]]]
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Get the index of an Object's node, adding it if it's not in the graph
+    ### node = (PoolID, ObjectID) tuple
+    def get_node(self, node):
+        node_index = self.__node_indexes.get(node)
+        if node_index is None:
+            self.__load_edges()
+            node_index = len(self.__nodes)
+            self.__nodes.append(node)
+            self.__node_indexes[node] = node_index
+            self.__forward_offsets = None
+        return node_index
+    
+    
+    # Add the references of an Object
+    ### PoolID     = name of the Pool containing the Object
+    ### ObjectID   = name of the Object
+    ### references = list of (PoolID, ObjectID) tuples of the referenced Objects (see common_loaders.stop_recording_references)
+    def add_references(self, PoolID, ObjectID, references):
+        self.__load_edges()
+        from_node = self.get_node((PoolID, ObjectID))
+        for reference in references:
+            self.__from_nodes.append(from_node)
+            self.__to_nodes.append(self.get_node(tuple(reference)))
+        self.__forward_offsets = None
+    
+    
+    # Get the Objects referenced by an Object, as (PoolID, ObjectID) tuples
+    ### PoolID   = name of the Pool containing the Object
+    ### ObjectID = name of the Object
+    def get_references(self, PoolID, ObjectID):
+        self.__update_adjacency()
+        return self.__get_neighbors(self.__forward_offsets, self.__forward_neighbors, PoolID, ObjectID)
+    
+    
+    # Get the Objects which reference an Object, as (PoolID, ObjectID) tuples
+    ### PoolID    = name of the Pool containing the Object
+    ### ObjectID  = name of the Object
+    ### recursive = whether to also include the Objects which reference those, and so on (all Objects affected by a change)
+    def get_referencing_objects(self, PoolID, ObjectID, recursive = False):
+        self.__update_adjacency()
+        referencing_objects = self.__get_neighbors(self.__reverse_offsets, self.__reverse_neighbors, PoolID, ObjectID)
+        if not recursive:
+            return referencing_objects
+        
+        # Breadth-first search, each Object is only listed once
+        found_objects = set(referencing_objects)
+        index = 0
+        while index < len(referencing_objects):
+            for referencing_object in self.__get_neighbors(self.__reverse_offsets, self.__reverse_neighbors, *referencing_objects[index]):
+                if referencing_object not in found_objects:
+                    found_objects.add(referencing_object)
+                    referencing_objects.append(referencing_object)
+            index += 1
+        return referencing_objects
+    
+    
+    # Get the number of Objects and references in the graph
+    def get_size(self):
+        self.__update_adjacency()
+        return (len(self.__nodes), len(self.__forward_neighbors))
+    
+    
+    # Save the graph to a file, with the adjacency arrays in both directions
+    ### graph_file_path = path of the graph file
+    def save(self, graph_file_path):
+        self.__update_adjacency()
+        arrays = [self.__forward_offsets, self.__forward_neighbors, self.__reverse_offsets, self.__reverse_neighbors]
+        header = json.dumps({'nodes': self.__nodes, 'array_lengths': [len(x) for x in arrays]}).encode('utf-8')
+        
+        # The file is replaced atomically, so an interrupted save doesn't leave a broken graph
+        temp_graph_file_path = graph_file_path + '.tmp'
+        with open(temp_graph_file_path, 'wb') as graph_file:
+            graph_file.write(ReferenceGraph.file_magic)
+            graph_file.write(struct.pack('<I', len(header)))
+            graph_file.write(header)
+            for saved_array in arrays:
+                if sys.byteorder == 'big':
+                    saved_array = array('I', saved_array)
+                    saved_array.byteswap()
+                graph_file.write(saved_array.tobytes())
+        os.replace(temp_graph_file_path, graph_file_path)
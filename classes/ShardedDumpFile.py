@@ -0,0 +1,186 @@
+import json
+import os
+
+
+class ShardedDumpFile:
+    # Extension of the index, appended to the name of the output file (e.g. ".../PoolID.c.idx")
+    index_extension = '.idx'
+    
+    # Extension of the shards and the index while they're written, they're renamed once the output is complete
+    part_extension = '.part'
+    
+    
+    # Get the path of a shard, the shards are numbered from 0 (e.g. ".../PoolID.c.000")
+    ### output_file_path = path of the output file, as named by the dumper
+    ### shard_number     = number of the shard
+    @staticmethod
+    def get_shard_file_path(output_file_path, shard_number):
+        return '{}.{:03}'.format(output_file_path, shard_number)
+    
+    
+    # Get the path of the index of an output file
+    ### output_file_path = path of the output file, as named by the dumper
+    @staticmethod
+    def get_index_file_path(output_file_path):
+        return output_file_path + ShardedDumpFile.index_extension
+    
+    
+    # Remove the index and the shards of an output, e.g. when it's replaced by a single file
+    # The index is removed first, so the output is never taken as complete without all its shards
+    ### output_file_path = path of the output file, as named by the dumper
+    @staticmethod
+    def remove(output_file_path):
+        index_file_path = ShardedDumpFile.get_index_file_path(output_file_path)
+        if os.path.isfile(index_file_path):
+            os.remove(index_file_path)
+        
+        shard_number = 0
+        while os.path.isfile(ShardedDumpFile.get_shard_file_path(output_file_path, shard_number)):
+            os.remove(ShardedDumpFile.get_shard_file_path(output_file_path, shard_number))
+            shard_number += 1
+    
+    
+    # Constructor
+    # Instead of one file, the text is written to shards of a limited size, and the position of each Object is recorded in an index
+    # Each Object's text is kept in a single shard, so a shard is only larger than the limit if a single Object is
+    ### output_file_path = path of the output file, as named by the dumper (the shards and the index are named after it)
+    ### shard_size       = maximum size of a shard in bytes
+    def __init__(self, output_file_path, shard_size):
+        self.__output_file_path = output_file_path
+        self.__shard_size = shard_size
+        
+        # Functions called before the output is completed
+        self.__checkpoint_callbacks = []
+        
+        # Text written since the last completed Object (or the header)
+        self.__pending_text = []
+        
+        # Current shard, and the (shard number, offset, length) of the header and of each Object, keyed by ObjectID
+        self.__shard_file = None
+        self.__shard_count = 0
+        self.__header = None
+        self.__objects = {}
+        
+        # Same as for DumpOutputFile, but an indexed output can't be resumed, so they're only counted
+        self.completed_objects = 0
+        self.last_completed_object = None
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Write the pending text to the current shard (or a new one if it doesn't fit)
+    # * returns the (shard number, offset, length) of the written text
+    def __write_pending_text(self):
+        # Line endings are translated like for a file opened with `open(path, 'w')`
+        data = ''.join(self.__pending_text).replace('\n', os.linesep).encode('utf-8')
+        self.__pending_text = []
+        
+        if self.__shard_file is None or (self.__shard_file.tell() != 0 and self.__shard_file.tell() + len(data) > self.__shard_size):
+            if self.__shard_file is not None:
+                self.__shard_file.close()
+            self.__shard_file = open(ShardedDumpFile.get_shard_file_path(self.__output_file_path, self.__shard_count) + ShardedDumpFile.part_extension, 'wb')
+            self.__shard_count += 1
+        
+        location = [self.__shard_count - 1, self.__shard_file.tell(), len(data)]
+        self.__shard_file.write(data)
+        return location
+    
+    
+    # Remove the partial shards
+    def __remove_parts(self):
+        for shard_number in range(self.__shard_count):
+            shard_part_file_path = ShardedDumpFile.get_shard_file_path(self.__output_file_path, shard_number) + ShardedDumpFile.part_extension
+            if os.path.isfile(shard_part_file_path):
+                os.remove(shard_part_file_path)
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Write text to the output
+    ### text = string to write
+    def write(self, text):
+        self.__pending_text.append(text)
+        return len(text)
+    
+    
+    # Add a function to be called before the output is completed
+    ### callback = function without parameters
+    def add_checkpoint_callback(self, callback):
+        self.__checkpoint_callbacks.append(callback)
+    
+    
+    # Mark everything written so far as the header of the output (e.g. the Pool's type)
+    def complete_header(self):
+        self.__header = self.__write_pending_text()
+    
+    
+    # Mark an Object as completely written, everything written since the previous one is its text
+    ### object_key = key identifying the Object (see DumpOutputFile.complete_object)
+    ### ObjectID   = name of the Object, used as its key in the index
+    def complete_object(self, object_key, ObjectID = None):
+        self.__objects[ObjectID] = self.__write_pending_text()
+        self.completed_objects += 1
+        self.last_completed_object = object_key
+    
+    
+    # Finish the output, renaming the shards to their real names and writing the index
+    def close(self):
+        for callback in self.__checkpoint_callbacks:
+            callback()
+        
+        # Anything written after the last Object is kept too, so no text is lost
+        trailer = None
+        if len(self.__pending_text) != 0:
+            trailer = self.__write_pending_text()
+        if self.__shard_file is not None:
+            self.__shard_file.close()
+            self.__shard_file = None
+        
+        # The index of a previous output is removed first, so it never points into the new shards
+        index_file_path = ShardedDumpFile.get_index_file_path(self.__output_file_path)
+        if os.path.isfile(index_file_path):
+            os.remove(index_file_path)
+        
+        for shard_number in range(self.__shard_count):
+            shard_file_path = ShardedDumpFile.get_shard_file_path(self.__output_file_path, shard_number)
+            os.replace(shard_file_path + ShardedDumpFile.part_extension, shard_file_path)
+        
+        # Shards left from a previous (larger) output are removed
+        shard_number = self.__shard_count
+        while os.path.isfile(ShardedDumpFile.get_shard_file_path(self.__output_file_path, shard_number)):
+            os.remove(ShardedDumpFile.get_shard_file_path(self.__output_file_path, shard_number))
+            shard_number += 1
+        
+        # The index is written last and renamed atomically, so the output is either complete or has no index
+        with open(index_file_path + ShardedDumpFile.part_extension, 'w', encoding='utf-8') as index_file:
+            json.dump({
+                'shard_size': self.__shard_size,
+                'shard_count': self.__shard_count,
+                'header': self.__header,
+                'objects': self.__objects,
+                'trailer': trailer
+            }, index_file)
+        os.replace(index_file_path + ShardedDumpFile.part_extension, index_file_path)
+    
+    
+    # Close the output without finishing it, removing what was written
+    def abort(self):
+        if self.__shard_file is not None:
+            self.__shard_file.close()
+            self.__shard_file = None
+        self.__remove_parts()
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    # Only finish the output if no exception occurred while writing it
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -0,0 +1,107 @@
+import json
+import os
+
+from classes.ShardedDumpFile import ShardedDumpFile
+
+
+class ShardedDumpReader:
+    # Check whether an output was written as shards with an index (see ShardedDumpFile)
+    ### output_file_path = path of the output file, as named by the dumper (e.g. ".../PoolID.c")
+    @staticmethod
+    def exists(output_file_path):
+        return os.path.isfile(ShardedDumpFile.get_index_file_path(output_file_path))
+    
+    
+    # Constructor
+    # Only the index is loaded, the text of each Object is read from its shard when requested
+    ### output_file_path = path of the output file, as named by the dumper (e.g. ".../PoolID.c")
+    def __init__(self, output_file_path):
+        self.__output_file_path = output_file_path
+        with open(ShardedDumpFile.get_index_file_path(output_file_path), 'r', encoding='utf-8') as index_file:
+            index = json.load(index_file)
+        
+        self.shard_size = index['shard_size']
+        self.__header = index['header']
+        self.__objects = index['objects']
+        self.__trailer = index['trailer']
+        
+        # Shards are opened when they're first needed, and kept open
+        self.__shard_files = {}
+    
+    
+    # PRIVATE METHODS
+    
+    
+    # Read text from a shard
+    def __read(self, location):
+        if location is None:
+            return ''
+        (shard_number, offset, length) = location
+        
+        shard_file = self.__shard_files.get(shard_number)
+        if shard_file is None:
+            shard_file = open(ShardedDumpFile.get_shard_file_path(self.__output_file_path, shard_number), 'rb')
+            self.__shard_files[shard_number] = shard_file
+        
+        # A single seek and read, no matter how large the Pool is
+        shard_file.seek(offset)
+        data = shard_file.read(length)
+        if len(data) != length:
+            raise RuntimeError('Shard {} of {} is truncated'.format(shard_number, self.__output_file_path))
+        
+        # Line endings are translated like for a file opened with `open(path, 'r')`
+        return data.decode('utf-8').replace('\r\n', '\n')
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Get the names of all Objects in the output, in the order they were written
+    def get_object_ids(self):
+        return list(self.__objects)
+    
+    
+    # Check whether an Object is in the output
+    ### ObjectID = name of the Object
+    def contains(self, ObjectID):
+        return ObjectID in self.__objects
+    
+    
+    # Get the text of the header (e.g. the Pool's type)
+    def get_header(self):
+        return self.__read(self.__header)
+    
+    
+    # Get the text of an Object, exactly as it was written to the output
+    ### ObjectID = name of the Object
+    def get_object(self, ObjectID):
+        if ObjectID not in self.__objects:
+            raise RuntimeError('Object {} is not in {}'.format(ObjectID, self.__output_file_path))
+        return self.__read(self.__objects[ObjectID])
+    
+    
+    # Get the text of all Objects, as (ObjectID, text) tuples in the order they were written
+    def get_objects(self):
+        for ObjectID in self.__objects:
+            yield (ObjectID, self.__read(self.__objects[ObjectID]))
+    
+    
+    # Get the text written after the last Object (usually empty)
+    def get_trailer(self):
+        return self.__read(self.__trailer)
+    
+    
+    # Close the opened shards
+    def close(self):
+        for shard_file in self.__shard_files.values():
+            shard_file.close()
+        self.__shard_files = {}
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,186 @@
+import json
+import os
+import struct
+import sys
+from array import array
+
+from classes.ReferenceGraph import ReferenceGraph
+
+
+class StringIndex:
+    # Identifier at the start of a saved index file
+    file_magic = b'STRIDX01'
+    
+    
+    # Get the trigrams of a string, for case-insensitive search
+    ### string = text whose trigrams to get
+    @staticmethod
+    def get_trigrams(string):
+        string = string.casefold()
+        return set(string[i : i + 3] for i in range(len(string) - 2))
+    
+    
+    # Load an index saved with `save`
+    ### index_file_path = path of the index file
+    @staticmethod
+    def load(index_file_path):
+        string_index = StringIndex()
+        with open(index_file_path, 'rb') as index_file:
+            if index_file.read(len(StringIndex.file_magic)) != StringIndex.file_magic:
+                raise RuntimeError('Not a string index file: {}'.format(index_file_path))
+            
+            # The header contains the strings, Objects, trigrams and the sizes of the arrays which follow it
+            header_size = struct.unpack('<I', index_file.read(4))[0]
+            header = json.loads(index_file.read(header_size).decode('utf-8'))
+            string_index.source_files = header['source_files']
+            string_index.__strings = [tuple(x) for x in header['strings']]
+            string_index.__objects = [tuple(x) for x in header['objects']]
+            string_index.__trigrams = {trigram: index for index, trigram in enumerate(header['trigrams'])}
+            
+            arrays = []
+            for array_length in header['array_lengths']:
+                loaded_array = array('I')
+                loaded_array.frombytes(index_file.read(4 * array_length))
+                if len(loaded_array) != array_length:
+                    raise RuntimeError('String index file is truncated: {}'.format(index_file_path))
+                if sys.byteorder == 'big':
+                    loaded_array.byteswap()
+                arrays.append(loaded_array)
+        
+        (string_index.__trigram_offsets, string_index.__trigram_strings, string_index.__usage_offsets, string_index.__usage_objects) = arrays
+        return string_index
+    
+    
+    # Constructor (empty index)
+    def __init__(self):
+        # Stats of the files the index was built from (see `build`), for checking whether a cached index is still valid
+        self.source_files = None
+        
+        # Each string is identified by a (type, hash, text) tuple, where the type is 'A' for ASCII and 'U' for Unicode
+        self.__strings = []
+        
+        # Each Object using the strings is identified by a (PoolID, ObjectID) tuple
+        self.__objects = []
+        
+        # Trigrams, keyed by text, and the sorted indexes of the strings containing each one (see ReferenceGraph.build_adjacency)
+        self.__trigrams = {}
+        self.__trigram_offsets = array('I', [0])
+        self.__trigram_strings = array('I')
+        
+        # Indexes of the Objects using each string
+        self.__usage_offsets = array('I', bytes(4))
+        self.__usage_objects = array('I')
+    
+    
+    # PUBLIC METHODS
+    
+    
+    # Build the index
+    ### string_storage = instance of StringStorage, loaded from the Project
+    ### string_usage   = list of (PoolID, ObjectID, string references) tuples, for each Object (see StringStorage.stop_recording_strings)
+    ### source_files   = stats of the files the index is built from, stored with the index
+    def build(self, string_storage, string_usage, source_files = None):
+        self.source_files = source_files
+        self.__strings = [('A', string_hash, string) for string_hash, string in sorted(string_storage.get_ascii_strings().items())]
+        self.__strings += [('U', string_hash, string) for string_hash, string in sorted(string_storage.get_unicode_strings().items())]
+        
+        # Each trigram is an edge from the trigram to the string, so the strings of a trigram are stored consecutively and in order
+        self.__trigrams = {}
+        (from_trigrams, to_strings) = (array('I'), array('I'))
+        for string_index, (string_type, string_hash, string) in enumerate(self.__strings):
+            for trigram in StringIndex.get_trigrams(string):
+                from_trigrams.append(self.__trigrams.setdefault(trigram, len(self.__trigrams)))
+                to_strings.append(string_index)
+        (self.__trigram_offsets, self.__trigram_strings) = ReferenceGraph.build_adjacency(from_trigrams, to_strings, len(self.__trigrams))
+        
+        # Same for the Objects using each string
+        string_indexes = {(string_type, string_hash): index for index, (string_type, string_hash, string) in enumerate(self.__strings)}
+        self.__objects = []
+        (from_strings, to_objects) = (array('I'), array('I'))
+        for (PoolID, ObjectID, string_references) in string_usage:
+            object_index = len(self.__objects)
+            self.__objects.append((PoolID, ObjectID))
+            for string_reference in string_references:
+                string_index = string_indexes.get(tuple(string_reference))
+                if string_index is not None:
+                    from_strings.append(string_index)
+                    to_objects.append(object_index)
+        (self.__usage_offsets, self.__usage_objects) = ReferenceGraph.build_adjacency(from_strings, to_objects, len(self.__strings))
+    
+    
+    # Find the strings containing a text (case-insensitive)
+    ### text = text to search for
+    # * returns a list of (type, hash, string) tuples, in the order of the string databases
+    def search(self, text):
+        text = text.casefold()
+        
+        # Only the strings containing all trigrams of the text can contain it
+        # Texts too short to have trigrams are searched in all strings
+        trigrams = StringIndex.get_trigrams(text)
+        if len(trigrams) == 0:
+            candidates = range(len(self.__strings))
+        else:
+            postings = []
+            for trigram in trigrams:
+                trigram_index = self.__trigrams.get(trigram)
+                if trigram_index is None:
+                    return []
+                postings.append(self.__trigram_strings[self.__trigram_offsets[trigram_index] : self.__trigram_offsets[trigram_index + 1]])
+            
+            # Intersect starting with the rarest trigram, so the candidate set stays small
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+            candidates = sorted(candidates)
+        
+        return [self.__strings[x] for x in candidates if text in self.__strings[x][2].casefold()]
+    
+    
+    # Get the Objects which use a string, as (PoolID, ObjectID) tuples
+    ### string_type = 'A' for ASCII, 'U' for Unicode
+    ### string_hash = hash of the string
+    def get_objects(self, string_type, string_hash):
+        # The strings are sorted by type, then by hash
+        low = 0
+        high = len(self.__strings)
+        while low < high:
+            middle = (low + high) // 2
+            if self.__strings[middle][:2] < (string_type, string_hash):
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self.__strings) or self.__strings[low][:2] != (string_type, string_hash):
+            return []
+        return [self.__objects[x] for x in self.__usage_objects[self.__usage_offsets[low] : self.__usage_offsets[low + 1]]]
+    
+    
+    # Get the number of strings, trigrams and Objects in the index
+    def get_size(self):
+        return (len(self.__strings), len(self.__trigrams), len(self.__objects))
+    
+    
+    # Save the index to a file
+    ### index_file_path = path of the index file
+    def save(self, index_file_path):
+        arrays = [self.__trigram_offsets, self.__trigram_strings, self.__usage_offsets, self.__usage_objects]
+        header = json.dumps({
+            'source_files': self.source_files,
+            'strings': self.__strings,
+            'objects': self.__objects,
+            'trigrams': sorted(self.__trigrams, key=self.__trigrams.get),
+            'array_lengths': [len(x) for x in arrays]
+        }).encode('utf-8')
+        
+        # The file is replaced atomically, so an interrupted save doesn't leave a broken index
+        temp_index_file_path = index_file_path + '.tmp'
+        with open(temp_index_file_path, 'wb') as index_file:
+            index_file.write(StringIndex.file_magic)
+            index_file.write(struct.pack('<I', len(header)))
+            index_file.write(header)
+            for saved_array in arrays:
+                if sys.byteorder == 'big':
+                    saved_array = array('I', saved_array)
+                    saved_array.byteswap()
+                index_file.write(saved_array.tobytes())
+        os.replace(temp_index_file_path, index_file_path)
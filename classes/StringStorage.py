@@ -53,6 +53,9 @@ class StringStorage:
         # Parse the files' data as text databases (ASCII and Unicode) and store them in private members
         self.__ascii_tdb_dict = self.__read_tdb(self.__ascii_data_file_contents, self.__ascii_index_file_contents, 'A')
         self.__unicode_tdb_dict = self.__read_tdb(self.__unicode_data_file_contents, self.__unicode_index_file_contents, 'U')
+        
+        # Strings retrieved by hash while recording (None = not recording)
+        self.__recorded_strings = None
     
     
     # Converter to string (returns text databases sizes, ASCII and Unicode, as formatted string)
@@ -234,6 +237,8 @@ class StringStorage:
     ### string_hash = hash of the desired ASCII string
     def get_ascii_string(self, string_hash):
         string_hash = int(string_hash)
+        if self.__recorded_strings is not None:
+            self.__recorded_strings.append(('A', string_hash))
         if string_hash in self.__ascii_tdb_dict:
             return self.__ascii_tdb_dict[string_hash]
         return None
@@ -243,6 +248,8 @@ class StringStorage:
     ### string_hash = hash of the desired Unicode string
     def get_unicode_string(self, string_hash):
         string_hash = int(string_hash)
+        if self.__recorded_strings is not None:
+            self.__recorded_strings.append(('U', string_hash))
         if string_hash in self.__unicode_tdb_dict:
             return self.__unicode_tdb_dict[string_hash]
         return None
@@ -258,6 +265,31 @@ class StringStorage:
         return self.get_unicode_string(string_hash)
     
     
+    # Get all ASCII strings, keyed by hash (e.g. for searching them)
+    def get_ascii_strings(self):
+        return dict(self.__ascii_tdb_dict)
+    
+    
+    # Get all Unicode strings, keyed by hash (e.g. for searching them)
+    def get_unicode_strings(self):
+        return dict(self.__unicode_tdb_dict)
+    
+    
+    # Start recording which strings are retrieved by hash (e.g. while loading an Object)
+    def start_recording_strings(self):
+        self.__recorded_strings = []
+    
+    
+    # Stop recording, and get the list of retrieved strings as (type, hash) tuples, in order and without duplicates
+    # * the type is 'A' for ASCII and 'U' for Unicode
+    def stop_recording_strings(self):
+        if self.__recorded_strings is None:
+            return None
+        recorded_strings = list(dict.fromkeys(self.__recorded_strings))
+        self.__recorded_strings = None
+        return recorded_strings
+    
+    
     # Get the hash of an ASCII string
     ### string = ASCII string whose hash to compute
     def get_ascii_hash(self, string):
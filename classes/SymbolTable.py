@@ -0,0 +1,151 @@
+import os
+import sqlite3
+
+
+class SymbolTable:
+    # Kinds of symbols, with the map of the "layer data" object (DB_LAYER_DATA) which defines them
+    kinds = {
+        'dop': 'dop_refs_map',
+        'table': 'table_refs_map',
+        'request': 'request_refs_map',
+        'diag_com': 'diag_com_refs',
+        'global_negative_response': 'global_negative_response_refs_map',
+        'functional_class': 'functional_class_refs_map',
+        'unit': 'unit_refs_map',
+        'unit_group': 'unit_group_refs_map'
+    }
+    
+    # Maps of the "layer data" object with the names a layer doesn't inherit from its parents, for each kind of symbol
+    # Each entry is keyed by the parent layer, and lists the names of the symbols which are not inherited from it
+    # The other not-inherited maps of the layer data are not decoded yet ('unk_map1', 'unk_map2'), so they can't be applied
+    not_inherited_maps = {
+        'dop': 'not_inherited_dops_map',
+        'global_negative_response': 'not_inherited_glob_neg_responses_map'
+    }
+    
+    
+    # Flatten the layers of a variant into one table with every symbol visible from it
+    # The layers are searched in order, like when resolving a reference without PoolID, so the first definition of a name is used
+    # Names which a layer doesn't inherit from a parent layer (by layer ID or PoolID) are hidden in that parent and in its own parents
+    ### layer_data_objects = list of "layer data" objects, from the most specific (e.g. ECU-VARIANT, BASE-VARIANT, protocols)
+    ### pool_ids           = list of the PoolIDs the "layer data" objects were loaded from, in the same order
+    # * returns a dictionary keyed by kind, with dictionaries of name -> (PoolID, ObjectID, layer ID of the defining layer)
+    @staticmethod
+    def flatten_layers(layer_data_objects, pool_ids):
+        symbols = {kind: {} for kind in SymbolTable.kinds}
+        
+        # Names hidden in each layer, keyed by the layer's index
+        hidden_names = {kind: [set() for x in layer_data_objects] for kind in SymbolTable.kinds}
+        
+        # Get the indexes of a layer after a given one, and of all its parents (which are after it too)
+        def get_parent_layer_indexes(first_index, key):
+            layer_indexes = [x for x in range(first_index, len(layer_data_objects)) if key in (layer_data_objects[x]['layer_id'], pool_ids[x])]
+            for layer_index in layer_indexes:
+                for parent_PoolID in layer_data_objects[layer_index]['parent_layers_vector']:
+                    layer_indexes += [x for x in range(first_index, len(layer_data_objects)) if pool_ids[x] == parent_PoolID and x not in layer_indexes]
+            return layer_indexes
+        
+        for layer_index, layer_data in enumerate(layer_data_objects):
+            for kind, map_name in SymbolTable.kinds.items():
+                for entry in layer_data[map_name]:
+                    name = entry['map_key']
+                    if name in symbols[kind] or name in hidden_names[kind][layer_index]:
+                        continue
+                    
+                    # DIAG-COMM references are wrapped in a DbDiagComObjectReference
+                    reference = entry['reference'].get('attrib_obj_ref', entry['reference'])
+                    symbols[kind][name] = (reference['pool_id'], reference['object_id'], layer_data['layer_id'])
+            
+            for kind, map_name in SymbolTable.not_inherited_maps.items():
+                for entry in layer_data[map_name]:
+                    for parent_layer_index in get_parent_layer_indexes(layer_index + 1, entry['map_key']):
+                        hidden_names[kind][parent_layer_index].update(entry['strings'])
+        
+        return symbols
+    
+    
+    # Constructor
+    ### symbol_table_file_path = path of the SQLite file (created if it doesn't exist)
+    def __init__(self, symbol_table_file_path):
+        symbol_table_folder_path = os.path.dirname(os.path.abspath(symbol_table_file_path))
+        if not os.path.isdir(symbol_table_folder_path):
+            os.makedirs(symbol_table_folder_path)
+        
+        self.__connection = sqlite3.connect(symbol_table_file_path)
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS variants (variant TEXT PRIMARY KEY, base_variant TEXT NOT NULL)')
+        
+        # Keyed by what is looked up, so resolving a name is a single index search
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS symbols (variant TEXT NOT NULL, kind TEXT NOT NULL, name TEXT NOT NULL, pool_id TEXT, object_id TEXT NOT NULL, layer_id TEXT NOT NULL, PRIMARY KEY (variant, kind, name)) WITHOUT ROWID')
+        self.__connection.commit()
+    
+    
+    # Remove all variants (before the Project is added again)
+    def clear(self):
+        self.__connection.execute('DELETE FROM symbols')
+        self.__connection.execute('DELETE FROM variants')
+    
+    
+    # Add the symbols of a variant, replacing it if it was already added
+    ### variant_name      = name of the ECU-VARIANT (or BASE-VARIANT)
+    ### base_variant_name = name of the BASE-VARIANT it belongs to
+    ### symbols           = dictionary returned by `flatten_layers`
+    def add_variant(self, variant_name, base_variant_name, symbols):
+        self.__connection.execute('DELETE FROM symbols WHERE variant = ?', (variant_name,))
+        self.__connection.execute('INSERT OR REPLACE INTO variants VALUES (?, ?)', (variant_name, base_variant_name))
+        self.__connection.executemany('INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)', (
+            (variant_name, kind, name, PoolID, ObjectID, layer_id)
+            for kind, kind_symbols in symbols.items()
+            for name, (PoolID, ObjectID, layer_id) in kind_symbols.items()
+        ))
+    
+    
+    # Resolve a name visible from a variant
+    ### variant_name = name of the ECU-VARIANT (or BASE-VARIANT)
+    ### kind         = kind of symbol (see `kinds`)
+    ### name         = name of the symbol (e.g. the ObjectID of a reference without PoolID)
+    # * returns (PoolID, ObjectID), or None if the name isn't visible from the variant
+    def resolve(self, variant_name, kind, name):
+        row = self.__connection.execute('SELECT pool_id, object_id FROM symbols WHERE variant = ? AND kind = ? AND name = ?', (variant_name, kind, name)).fetchone()
+        if row is None:
+            return None
+        return (row[0], row[1])
+    
+    
+    # Get all symbols of a kind visible from a variant
+    ### variant_name = name of the ECU-VARIANT (or BASE-VARIANT)
+    ### kind         = kind of symbol (see `kinds`)
+    # * returns a dictionary of name -> (PoolID, ObjectID)
+    def get_symbols(self, variant_name, kind):
+        cursor = self.__connection.execute('SELECT name, pool_id, object_id FROM symbols WHERE variant = ? AND kind = ?', (variant_name, kind))
+        return {name: (PoolID, ObjectID) for (name, PoolID, ObjectID) in cursor}
+    
+    
+    # Get the names of all variants in the table
+    def get_variant_names(self):
+        return [row[0] for row in self.__connection.execute('SELECT variant FROM variants ORDER BY variant')]
+    
+    
+    # Get the name of the BASE-VARIANT a variant belongs to
+    ### variant_name = name of the ECU-VARIANT (or BASE-VARIANT)
+    # * returns None if the variant isn't in the table
+    def get_base_variant_name(self, variant_name):
+        row = self.__connection.execute('SELECT base_variant FROM variants WHERE variant = ?', (variant_name,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+    
+    
+    # Save all added variants to disk
+    def commit(self):
+        self.__connection.commit()
+    
+    
+    # Discard all variants added (or removed) since the last commit, e.g. when a Project failed part way
+    def rollback(self):
+        self.__connection.rollback()
+    
+    
+    # Save and close the table
+    def close(self):
+        self.__connection.commit()
+        self.__connection.close()
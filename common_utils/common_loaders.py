@@ -2,6 +2,35 @@ import struct
 from common_utils import enum_converters
 
 
+# References loaded while recording, as (PoolID, ObjectID) tuples (None = not recording)
+recorded_references = None
+
+
+# Start recording all references which are loaded (e.g. while loading an Object)
+def start_recording_references():
+    global recorded_references
+    recorded_references = []
+
+
+# Stop recording, and get the list of loaded references as (PoolID, ObjectID) tuples, in order and without duplicates
+# * the PoolID is None for references which don't specify it
+def stop_recording_references():
+    global recorded_references
+    if recorded_references is None:
+        return None
+    references = list(dict.fromkeys(recorded_references))
+    recorded_references = None
+    return references
+
+
+# Record a loaded reference, if recording
+# Loaders which read references themselves (instead of using `load_reference`) must also call this
+### reference = loaded reference (with 'object_id' and 'pool_id')
+def record_reference(reference):
+    if recorded_references is not None:
+        recorded_references.append((reference['pool_id'], reference['object_id']))
+
+
 # "Standard" loader for DbObjectReference
 def load_reference(stream, third_string = True, string_vector = False):
     obj = {}
@@ -17,6 +46,8 @@ def load_reference(stream, third_string = True, string_vector = False):
         for i in range(counter):
             obj['strings'].append(stream.loadAsciiString()[0])
     
+    record_reference(obj)
+    
     return obj
 
 
@@ -117,6 +148,8 @@ def loadDbAttributedObjectReference(stream, dummy = 0):
     for i in range(counter):
         obj['strings'].append(stream.loadAsciiString()[0])
     
+    record_reference(obj)
+    
     return obj
 
 
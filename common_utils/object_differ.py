@@ -0,0 +1,75 @@
+# Placeholder for a value which only exists in one of the compared objects
+missing = object()
+
+
+# Get the items of a dictionary or list, with the path of each one
+### obj  = dictionary or list
+### path = path of the object
+def get_items(obj, path):
+    if type(obj) is dict:
+        return [('{}.{}'.format(path, key) if path != '' else str(key), key, obj[key]) for key in obj]
+    return [('{}[{}]'.format(path, index), index, item) for index, item in enumerate(obj)]
+
+
+# Compare two loaded objects recursively, down to their simple values
+### old_obj = object from the old Project (or `missing`)
+### new_obj = object from the new Project (or `missing`)
+### path    = path of the compared objects (e.g. 'parameters[2].dop')
+# * returns a list of (path, old value, new value) tuples, one for each simple value which differs
+def get_differences(old_obj, new_obj, path = ''):
+    old_is_container = type(old_obj) in (dict, list)
+    new_is_container = type(new_obj) in (dict, list)
+    
+    # Simple values (or values of different kinds) are compared directly
+    if not old_is_container and not new_is_container:
+        if type(old_obj) is not type(new_obj) or old_obj != new_obj:
+            return [(path, old_obj, new_obj)]
+        return []
+    if old_is_container and new_is_container and type(old_obj) is not type(new_obj):
+        return [(path, old_obj, new_obj)]
+    
+    # A container which only exists on one side is reported value by value
+    if not old_is_container and old_obj is not missing:
+        return [(path, old_obj, missing)] + get_differences(missing, new_obj, path)
+    if not new_is_container and new_obj is not missing:
+        return get_differences(old_obj, missing, path) + [(path, missing, new_obj)]
+    
+    old_items = {} if old_obj is missing else {key: (item_path, item) for (item_path, key, item) in get_items(old_obj, path)}
+    new_items = {} if new_obj is missing else {key: (item_path, item) for (item_path, key, item) in get_items(new_obj, path)}
+    
+    # Items are matched by key (dictionaries) or by position (lists), in the order of the old object, then the new one
+    differences = []
+    for key, (item_path, old_item) in old_items.items():
+        new_item = new_items[key][1] if key in new_items else missing
+        differences += get_differences(old_item, new_item, item_path)
+    for key, (item_path, new_item) in new_items.items():
+        if key not in old_items:
+            differences += get_differences(missing, new_item, item_path)
+    
+    # Empty containers still count as a difference if the other side doesn't have them
+    if len(differences) == 0 and (old_obj is missing) != (new_obj is missing):
+        differences.append((path, old_obj, new_obj))
+    return differences
+
+
+# Format a value from a difference
+### value = simple value (or `missing`)
+def format_value(value):
+    if value is missing:
+        return '(missing)'
+    if type(value) is int and value >= 0:
+        return '0x{:X}'.format(value)
+    if isinstance(value, str):
+        return '\'{}\''.format(value)
+    if type(value) is dict:
+        return '{}'
+    if type(value) is list:
+        return '()'
+    return str(value)
+
+
+# Format a difference as a line of text
+### difference = (path, old value, new value) tuple, from `get_differences`
+def format_difference(difference):
+    (path, old_value, new_value) = difference
+    return '{}: {} -> {}'.format(path if path != '' else '(root)', format_value(old_value), format_value(new_value))
@@ -0,0 +1,35 @@
+import hashlib
+
+
+# Feed an object recursively into a hash
+### obj         = object to hash
+### object_hash = hashlib object
+def update_object_hash(obj, object_hash):
+    # Dictionaries, in their own order (the same order in which they are printed)
+    if type(obj) is dict:
+        object_hash.update(b'{')
+        for key in obj:
+            update_object_hash(key, object_hash)
+            update_object_hash(obj[key], object_hash)
+        object_hash.update(b'}')
+    
+    # Lists
+    elif type(obj) is list:
+        object_hash.update(b'[')
+        for item in obj:
+            update_object_hash(item, object_hash)
+        object_hash.update(b']')
+    
+    # Simple objects (including tuples), with their type, so 1, 1.0 and '1' are different
+    else:
+        object_hash.update('{}:{!r};'.format(type(obj).__name__, obj).encode('utf-8'))
+
+
+# Get a hash of a loaded or parsed object, equal for objects with equal contents
+# Two objects with the same hash are printed the same way by `object_printer.print_object()`
+### obj = object to hash
+# * returns the hash as a string of 32 HEX digits
+def get_object_hash(obj):
+    object_hash = hashlib.blake2b(digest_size=16)
+    update_object_hash(obj, object_hash)
+    return object_hash.hexdigest()
@@ -0,0 +1,69 @@
+import concurrent.futures
+import os
+import time
+import traceback
+
+from common_utils import enum_converters
+
+
+# Get the PoolIDs of the Pools of a Project, sorted by name
+# The PoolID simply refers to the file's name (without extension)
+### project_folder_path = Project path (folder with .db and .key files)
+### db_file_type        = only get Pools of this type (e.g. 'Base Variant', see enum_converters.get_db_file_type), None = all Pools
+def get_pool_ids(project_folder_path, db_file_type = None):
+    pool_ids = []
+    for current_filename in sorted(os.listdir(project_folder_path)):
+        (PoolID, extension) = os.path.splitext(current_filename)
+        if extension != '.db' or not os.path.isfile(os.path.join(project_folder_path, current_filename)):
+            continue
+        if db_file_type is None or enum_converters.get_db_file_type(PoolID) == db_file_type:
+            pool_ids.append(PoolID)
+    return pool_ids
+
+
+# Get the Projects in a folder, which are the folders containing string databases
+### projects_folder_path = folder containing the Project folders
+def get_project_folder_paths(projects_folder_path):
+    project_folder_paths = []
+    for project_name in sorted(os.listdir(projects_folder_path)):
+        project_path = os.path.join(projects_folder_path, project_name)
+        if os.path.isdir(project_path) and any(os.path.isfile(os.path.join(project_path, x)) for x in ['AStringData.data', 'AStringData.data.gz']):
+            project_folder_paths.append(project_path)
+    return project_folder_paths
+
+
+# Build each Project into a database with a shared pool of worker processes, displaying the elapsed time even if an error occurs
+# Each Project is saved all at once, so the database never contains only part of it
+# The database is committed after each Project, and if one fails, it's rolled back (keeping that Project's previous contents) and the build stops
+### projects      = list of Projects, passed to `build_project` (e.g. Project paths)
+### build_project = function called with (Project, executor), which replaces the Project in the database without committing it
+### database      = object with `commit`, `rollback` and `close` methods (e.g. ObjectCatalog), closed at the end
+######              None = each Project has its own database, which `build_project` saves on its own
+### jobs          = number of worker processes (None = number of CPUs)
+def run_project_builds(projects, build_project, database, jobs = None):
+    # Get the starting timestamp
+    start_time = time.time()
+    
+    # Run the app
+    # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
+    try:
+        # The worker processes are shared by all projects
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            for project in projects:
+                build_project(project, executor)
+                if database is not None:
+                    database.commit()
+    except:
+        if database is not None:
+            database.rollback()
+        print('Error:\n{}'.format(traceback.format_exc()))
+    if database is not None:
+        database.close()
+    
+    # Get the elapsed time and split it into hours, minutes, seconds
+    elapsed_seconds = time.time() - start_time
+    (hours, remainder) = divmod(elapsed_seconds, 3600)
+    (minutes, seconds) = divmod(remainder, 60)
+    
+    # Display the time taken by the script to run
+    print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
@@ -0,0 +1,338 @@
+import argparse
+import concurrent.futures
+import os
+import struct
+import time
+import traceback
+
+from common_utils import enum_converters, object_differ, object_printer, project_builds
+from classes.PblRecordManager import PblRecordManager
+from classes.ObjectLoader import ObjectLoader
+from classes.StringStorage import StringStorage
+
+
+# Import the `__all__` list from the "__init__.py" module of the "object_loaders" package as the list of supported Objects to unpack
+from object_loaders import __all__ as supported_object_types
+
+
+# PBL is needed for parsing .key files, which will be done by the PblRecordManager class
+# The file "pbl.dll" should be in the working directory, in the "bin" folder
+# Each worker process imports this module again, so it gets its own instance
+pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
+pbl_record_manager = PblRecordManager(pbl_dll_path)
+
+
+# Categories of the Objects which are summarized at the end of the report, by object type
+# The other object types are only listed with the changes of their fields
+summary_categories = {
+    'MCD_DB_ECU_BASE_VARIANT': 'BASE-VARIANTs',
+    'MCD_DB_ECU_VARIANT': 'ECU-VARIANTs',
+    'MCD_DB_TABLE_PARAMETER': 'DIDs (table rows)',
+    'MCD_DB_DIAG_TROUBLE_CODE': 'DTCs',
+    'DB_DOP_BASE': 'DOPs',
+    'DB_DOP_DTC': 'DOPs',
+    'DB_DOP_SIMPLE_BASE': 'DOPs',
+    'DB_DOP_STRUCT': 'DOPs',
+    'MCD_DB_PARAMETER_STRUCTURE': 'DOPs'
+}
+
+
+# StringStorages of the old and new Project, loaded once in each worker process
+worker_string_storages = None
+
+# Hashes of the old Project's strings which resolve differently in the new Project, as (ASCII hashes, Unicode hashes)
+worker_changed_string_hashes = None
+
+
+# Load the strings databases in a worker process, and find the strings which changed between them
+### old_project_folder_path = old Project path (folder with .db and .key files)
+### new_project_folder_path = new Project path (folder with .db and .key files)
+def init_worker(old_project_folder_path, new_project_folder_path):
+    global worker_string_storages, worker_changed_string_hashes
+    worker_string_storages = (StringStorage(old_project_folder_path), StringStorage(new_project_folder_path))
+    
+    # Strings which were only added to the new Project can't be used by identical data, so they don't matter
+    (old_string_storage, new_string_storage) = worker_string_storages
+    new_ascii_strings = new_string_storage.get_ascii_strings()
+    new_unicode_strings = new_string_storage.get_unicode_strings()
+    worker_changed_string_hashes = (
+        set(string_hash for string_hash, string in old_string_storage.get_ascii_strings().items() if new_ascii_strings.get(string_hash) != string),
+        set(string_hash for string_hash, string in old_string_storage.get_unicode_strings().items() if new_unicode_strings.get(string_hash) != string)
+    )
+
+
+# Load an Object from its data
+# * returns the Object's type and the loaded Object (None if the type is not supported)
+def load_object(object_loader, object_data):
+    object_type = enum_converters.object_types.get(struct.unpack('<H', object_data[:2])[0])
+    if object_type not in supported_object_types:
+        return (object_type, None)
+    return (object_type, object_loader.load_object_by_object_data(object_data))
+
+
+# Get the name of an Object in the summary of the report
+# DIDs and DTCs are named by their code, the other Objects by their ObjectID
+### ObjectID    = name of the Object
+### object_type = type of the Object
+### obj         = loaded Object
+def get_summary_name(ObjectID, object_type, obj):
+    if object_type == 'MCD_DB_TABLE_PARAMETER':
+        return '{} ({})'.format(obj['key'], ObjectID)
+    if object_type == 'MCD_DB_DIAG_TROUBLE_CODE':
+        return '{} ({})'.format(obj['trouble_code_text'], ObjectID)
+    return ObjectID
+
+
+# Get the summary entry of an Object which was only found in one of the Projects, if it's in a summarized category
+# Only its type is read, unless it's named by its code (DIDs and DTCs)
+### object_loader = instance of ObjectLoader, with the StringStorage of the Object's Project
+### db_file       = opened .db file of the Object's Pool
+### ObjectID      = name of the Object
+### pbl_data      = PBL record of the Object
+# * returns (category, name), or None
+def get_added_or_removed_summary_entry(object_loader, db_file, ObjectID, pbl_data):
+    compressed_data = ObjectLoader.get_compressed_object_data_from_opened_db_file(pbl_data, db_file)
+    object_type = enum_converters.object_types.get(PblRecordManager.get_object_type_enum_from_compressed_data(compressed_data))
+    if object_type not in summary_categories:
+        return None
+    obj = None
+    if object_type in ('MCD_DB_TABLE_PARAMETER', 'MCD_DB_DIAG_TROUBLE_CODE'):
+        obj = object_loader.load_object_by_object_data(ObjectLoader.decompress_object_data(pbl_data, compressed_data))
+    return (summary_categories[object_type], get_summary_name(ObjectID, object_type, obj))
+
+
+# Compare a Pool which exists in both Projects (run in a worker process)
+# The Objects are matched by ObjectID, and only the ones whose compressed data differs are loaded and compared field by field
+# Identical data is unchanged if the strings it uses resolve the same way in both Projects, which is checked without loading it if no string changed
+### old_project_folder_path = old Project path (folder with .db and .key files)
+### new_project_folder_path = new Project path (folder with .db and .key files)
+### PoolID                  = name of the Pool
+# * returns a dictionary with the ObjectIDs of the added and removed Objects, the changes of each changed Object, the number of unchanged Objects,
+#   the number of compared Objects which had to be loaded, and the summary entries as (category, '+'/'-'/'~', name) tuples
+def diff_pool(old_project_folder_path, new_project_folder_path, PoolID):
+    (old_string_storage, new_string_storage) = worker_string_storages
+    (changed_ascii_hashes, changed_unicode_hashes) = worker_changed_string_hashes
+    old_object_loader = ObjectLoader(None, old_string_storage)
+    new_object_loader = ObjectLoader(None, new_string_storage)
+    
+    pool_diff = {'added': [], 'removed': [], 'changed': [], 'unchanged': 0, 'loaded': 0, 'summary': []}
+    
+    # The keys of the records are the hashes of the ObjectIDs, which can differ between Projects (the string databases resolve collisions differently)
+    # So each Project's hashes are resolved to ObjectIDs with its own string database
+    old_pbl_records = {old_string_storage.get_ascii_string(ObjectID_hash): pbl_data for ObjectID_hash, pbl_data in pbl_record_manager.get_all_records(old_project_folder_path, PoolID).items()}
+    new_pbl_records = {new_string_storage.get_ascii_string(ObjectID_hash): pbl_data for ObjectID_hash, pbl_data in pbl_record_manager.get_all_records(new_project_folder_path, PoolID).items()}
+    
+    with open(os.path.join(old_project_folder_path, PoolID + '.db'), 'rb') as old_db_file, open(os.path.join(new_project_folder_path, PoolID + '.db'), 'rb') as new_db_file:
+        # Objects which only exist in one of the Projects
+        for (pbl_records, other_pbl_records, object_loader, db_file, key, sign) in [(new_pbl_records, old_pbl_records, new_object_loader, new_db_file, 'added', '+'), (old_pbl_records, new_pbl_records, old_object_loader, old_db_file, 'removed', '-')]:
+            for ObjectID, pbl_data in pbl_records.items():
+                if ObjectID in other_pbl_records:
+                    continue
+                pool_diff[key].append(ObjectID)
+                
+                # The summary is only informative, so an Object which can't be read is just left out of it
+                try:
+                    summary_entry = get_added_or_removed_summary_entry(object_loader, db_file, ObjectID, pbl_data)
+                except Exception:
+                    summary_entry = None
+                if summary_entry is not None:
+                    pool_diff['summary'].append((summary_entry[0], sign, summary_entry[1]))
+        
+        for ObjectID, new_pbl_data in new_pbl_records.items():
+            if ObjectID not in old_pbl_records:
+                continue
+            old_pbl_data = old_pbl_records[ObjectID]
+            
+            try:
+                # The sizes in the PBL records are compared first, since the data can only be identical if they're equal
+                old_compressed_data = None
+                if PblRecordManager.parse_pbl_data(old_pbl_data)[1:] == PblRecordManager.parse_pbl_data(new_pbl_data)[1:]:
+                    old_compressed_data = ObjectLoader.get_compressed_object_data_from_opened_db_file(old_pbl_data, old_db_file)
+                    new_compressed_data = ObjectLoader.get_compressed_object_data_from_opened_db_file(new_pbl_data, new_db_file)
+                    if old_compressed_data == new_compressed_data:
+                        # Identical data reads the same string hashes, so it's unchanged if none of them resolves differently
+                        if len(changed_ascii_hashes) == 0 and len(changed_unicode_hashes) == 0:
+                            pool_diff['unchanged'] += 1
+                            continue
+                        
+                        # Otherwise, only the old version is loaded, to find which strings it uses
+                        old_string_storage.start_recording_strings()
+                        try:
+                            load_object(old_object_loader, ObjectLoader.decompress_object_data(old_pbl_data, old_compressed_data))
+                        finally:
+                            string_references = old_string_storage.stop_recording_strings()
+                        if not any(string_hash in (changed_ascii_hashes if string_type == 'A' else changed_unicode_hashes) for (string_type, string_hash) in string_references):
+                            pool_diff['unchanged'] += 1
+                            continue
+                
+                # Load both versions and compare their fields (with the strings resolved in each Project)
+                pool_diff['loaded'] += 1
+                old_object_data = ObjectLoader.get_object_data_from_opened_db_file(old_pbl_data, old_db_file)
+                new_object_data = ObjectLoader.get_object_data_from_opened_db_file(new_pbl_data, new_db_file)
+                (old_object_type, old_object) = load_object(old_object_loader, old_object_data)
+                (new_object_type, new_object) = load_object(new_object_loader, new_object_data)
+                if old_object_type != new_object_type:
+                    changes = ['type: {} -> {}'.format(old_object_type, new_object_type)]
+                elif new_object is None:
+                    # Objects of unsupported types can't be loaded, so only their data can be compared
+                    if old_object_data == new_object_data:
+                        pool_diff['unchanged'] += 1
+                        continue
+                    changes = ['data changed (unsupported type)']
+                else:
+                    changes = [object_differ.format_difference(x) for x in object_differ.get_differences(old_object, new_object)]
+                    
+                    # The data may only differ in bytes which are not kept by the loader
+                    if len(changes) == 0:
+                        pool_diff['unchanged'] += 1
+                        continue
+                    
+                    if new_object_type in summary_categories:
+                        pool_diff['summary'].append((summary_categories[new_object_type], '~', get_summary_name(ObjectID, new_object_type, new_object)))
+            except Exception as e:
+                (new_object_type, changes) = (None, ['failed to load: {}: {}'.format(type(e).__name__, e)])
+            
+            pool_diff['changed'].append((ObjectID, new_object_type, changes))
+    
+    return pool_diff
+
+
+# Compare two versions of a Project, writing the differences to a report file
+### old_project_folder_path = old Project path (folder with .db and .key files)
+### new_project_folder_path = new Project path (folder with .db and .key files)
+### report_file             = opened report file
+### jobs                    = number of worker processes (None = number of CPUs)
+### indentation_level       = indentation of the report lines
+def diff_project(old_project_folder_path, new_project_folder_path, report_file, jobs = None, indentation_level = 0):
+    old_pool_ids = set(project_builds.get_pool_ids(old_project_folder_path))
+    new_pool_ids = set(project_builds.get_pool_ids(new_project_folder_path))
+    
+    # Pools which only exist in one of the Projects
+    for PoolID in sorted(new_pool_ids - old_pool_ids):
+        object_printer.print_indented(indentation_level, '+ {} ({})'.format(PoolID, enum_converters.get_db_file_type(PoolID)), report_file)
+    for PoolID in sorted(old_pool_ids - new_pool_ids):
+        object_printer.print_indented(indentation_level, '- {} ({})'.format(PoolID, enum_converters.get_db_file_type(PoolID)), report_file)
+    
+    # Pools which exist in both are compared in parallel, and reported in order
+    common_pool_ids = sorted(old_pool_ids & new_pool_ids)
+    counts = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0, 'loaded': 0}
+    summary = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(old_project_folder_path, new_project_folder_path)) as executor:
+        for PoolID, pool_diff in zip(common_pool_ids, executor.map(diff_pool, [old_project_folder_path] * len(common_pool_ids), [new_project_folder_path] * len(common_pool_ids), common_pool_ids)):
+            counts['added'] += len(pool_diff['added'])
+            counts['removed'] += len(pool_diff['removed'])
+            counts['changed'] += len(pool_diff['changed'])
+            counts['unchanged'] += pool_diff['unchanged']
+            counts['loaded'] += pool_diff['loaded']
+            for (category, sign, name) in pool_diff['summary']:
+                summary.setdefault(category, []).append((sign, name, PoolID))
+            
+            if len(pool_diff['added']) == 0 and len(pool_diff['removed']) == 0 and len(pool_diff['changed']) == 0:
+                continue
+            
+            object_printer.print_indented(indentation_level, '~ {} ({})'.format(PoolID, enum_converters.get_db_file_type(PoolID)), report_file)
+            for ObjectID in pool_diff['added']:
+                object_printer.print_indented(indentation_level + 1, '+ {}'.format(ObjectID), report_file)
+            for ObjectID in pool_diff['removed']:
+                object_printer.print_indented(indentation_level + 1, '- {}'.format(ObjectID), report_file)
+            for (ObjectID, object_type, changes) in pool_diff['changed']:
+                object_printer.print_indented(indentation_level + 1, '~ {} ({})'.format(ObjectID, object_type), report_file)
+                for change in changes:
+                    object_printer.print_indented(indentation_level + 2, change, report_file)
+    
+    object_printer.print_indented(indentation_level, 'Pools: {} added, {} removed, {} compared'.format(len(new_pool_ids - old_pool_ids), len(old_pool_ids - new_pool_ids), len(common_pool_ids)), report_file)
+    object_printer.print_indented(indentation_level, 'Objects: {} added, {} removed, {} changed, {} unchanged ({} compared Objects loaded)'.format(counts['added'], counts['removed'], counts['changed'], counts['unchanged'], counts['loaded']), report_file)
+    
+    # Summary of the changed variants, DIDs, DTCs and DOPs, in the order of the categories
+    for category in sorted(set(summary_categories.values()), key=list(summary_categories.values()).index):
+        if category not in summary:
+            continue
+        object_printer.print_indented(indentation_level, '{}: {} added, {} removed, {} changed'.format(category, *[len([x for x in summary[category] if x[0] == sign]) for sign in '+-~']), report_file)
+        for (sign, name, PoolID) in sorted(summary[category], key=lambda x: ('+-~'.index(x[0]), x[1], x[2])):
+            object_printer.print_indented(indentation_level + 1, '{} {} ({})'.format(sign, name, PoolID), report_file)
+
+
+# Run a comparison, displaying the elapsed time even if an error occurs
+### report_file_path = path of the report file
+### diff_function    = function which writes the comparison to the opened report file
+def run_diff(report_file_path, diff_function):
+    # Get the starting timestamp
+    start_time = time.time()
+    
+    # Run the app
+    # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
+    try:
+        with open(report_file_path, 'w', encoding='utf-8') as report_file:
+            diff_function(report_file)
+    except:
+        print('Error:\n{}'.format(traceback.format_exc()))
+    
+    # Get the elapsed time and split it into hours, minutes, seconds
+    elapsed_seconds = time.time() - start_time
+    (hours, remainder) = divmod(elapsed_seconds, 3600)
+    (minutes, seconds) = divmod(remainder, 60)
+    
+    # Display the time taken by the script to run
+    print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
+
+
+# Compare all Projects of two releases, writing the differences to a report file
+### old_projects_folder_path = old Projects path (folder with folders with .db and .key files)
+### new_projects_folder_path = new Projects path (folder with folders with .db and .key files)
+### report_file              = opened report file
+### jobs                     = number of worker processes (None = number of CPUs)
+def diff_projects(old_projects_folder_path, new_projects_folder_path, report_file, jobs = None):
+    # A valid project must contain string databases
+    old_project_names = set(os.path.basename(x) for x in project_builds.get_project_folder_paths(old_projects_folder_path))
+    new_project_names = set(os.path.basename(x) for x in project_builds.get_project_folder_paths(new_projects_folder_path))
+    
+    for project_name in sorted(new_project_names - old_project_names):
+        object_printer.print_indented(0, '+ {}'.format(project_name), report_file)
+    for project_name in sorted(old_project_names - new_project_names):
+        object_printer.print_indented(0, '- {}'.format(project_name), report_file)
+    
+    for project_name in sorted(old_project_names & new_project_names):
+        print('Comparing {}'.format(project_name))
+        object_printer.print_indented(0, '~ {}'.format(project_name), report_file)
+        diff_project(os.path.join(old_projects_folder_path, project_name), os.path.join(new_projects_folder_path, project_name), report_file, jobs, 1)
+
+
+def diffProjects_project(old_project_folder_path, new_project_folder_path, report_file_path, jobs = None):
+    if not os.path.isdir(old_project_folder_path) or not os.path.isdir(new_project_folder_path):
+        raise RuntimeError('Projects must be folders')
+    
+    run_diff(report_file_path, lambda report_file: diff_project(old_project_folder_path, new_project_folder_path, report_file, jobs))
+
+
+def diffProjects_projects(old_projects_folder_path, new_projects_folder_path, report_file_path, jobs = None):
+    if not os.path.isdir(old_projects_folder_path) or not os.path.isdir(new_projects_folder_path):
+        raise RuntimeError('Must provide folders to all projects')
+    
+    run_diff(report_file_path, lambda report_file: diff_projects(old_projects_folder_path, new_projects_folder_path, report_file, jobs))
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare two versions of MCD projects, Object by Object')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # Two versions of a project
+    parser_project = subparsers.add_parser('project', help='Compare two versions of a project')
+    parser_project.add_argument('old_project_folder_path', help='Old MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('new_project_folder_path', help='New MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('report_file_path', help='Path of the report file')
+    parser_project.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_project.set_defaults(func=diffProjects_project)
+    
+    # Two releases (all projects)
+    parser_all_projects = subparsers.add_parser('projects', help='Compare all projects of two releases')
+    parser_all_projects.add_argument('old_projects_folder_path', help='Old MCD projects (folder containing folders containing .db and .key files)')
+    parser_all_projects.add_argument('new_projects_folder_path', help='New MCD projects (folder containing folders containing .db and .key files)')
+    parser_all_projects.add_argument('report_file_path', help='Path of the report file')
+    parser_all_projects.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_all_projects.set_defaults(func=diffProjects_projects)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)
@@ -4,13 +4,22 @@ import traceback
 import time
 
 from classes.StringStorage import StringStorage
-from dumpProject import app_dumpProject
+from classes.DumpWriter import DumpWriter
+from classes.FailureReport import FailureReport
+from classes.ObjectStore import ObjectStore
+from classes.DumpFilter import DumpFilter
+from dumpProject import app_dumpProject, app_retryFailures
 
 
 # Unpack and dump the contents of all MCD Projects to a folder for each
 ### project_folder_path = Projects path (folder with folders with .db and .key files)
 ### output_folder_path  = path of folder where to create Project folder and write Pool files (dumps of .db files)
-def app_dumpAllProjects(project_folder_path, output_folder_path):
+### dump_writer         = instance of DumpWriter, used for opening the output files (None = plain text files)
+### failure_report      = instance of FailureReport, where Objects which fail to load are recorded (None = stop at the first failure)
+### object_store        = instance of ObjectStore, where each distinct Object is dumped once for all Projects (None = dump all Objects in the Pool files)
+### dump_filter         = instance of DumpFilter, selecting which Pools and Objects to dump (None = dump everything)
+### shard_size          = maximum size in bytes of the files each Pool is split into, with an index for reading single Objects (None = one file per Pool)
+def app_dumpAllProjects(project_folder_path, output_folder_path, dump_writer = None, failure_report = None, object_store = None, dump_filter = None, shard_size = None):
     # Go through each Project in the folder
     for project_name in os.listdir(project_folder_path):
         project_path = os.path.join(project_folder_path, project_name)
@@ -40,7 +49,24 @@ def app_dumpAllProjects(project_folder_path, output_folder_path):
         print('Unpacking {}'.format(project_name))
         
         # Dump the Project with the other module
-        app_dumpProject(string_storage, project_path, project_output_folder_path, False)
+        app_dumpProject(string_storage, project_path, project_output_folder_path, False, dump_writer, failure_report, object_store, dump_filter, shard_size)
+
+
+# Retry the Objects of all Projects which failed to load in a previous dump
+# Only the Projects and Pools from the failure report are opened
+### output_folder_path = path of folder where the Project folders were created
+### failure_report     = instance of FailureReport, containing the failures to retry (updated with the results)
+### dump_writer        = instance of DumpWriter, used for opening the output files (must match the one used for the dump)
+### object_store       = instance of ObjectStore (must be given if it was used for the dump)
+### dump_filter        = instance of DumpFilter (must match the one used for the dump, since it names the Pool files)
+def app_retryAllFailures(output_folder_path, failure_report, dump_writer = None, object_store = None, dump_filter = None):
+    for project_path in failure_report.get_project_folder_paths():
+        project_name = os.path.basename(project_path)
+        print('Retrying {}'.format(project_name))
+        
+        # Retry the Project's failures with the other module
+        string_storage = StringStorage(project_path)
+        app_retryFailures(string_storage, project_path, os.path.join(output_folder_path, project_name), failure_report, dump_writer, object_store, dump_filter)
 
 
 # Handle usage as script
@@ -48,6 +74,12 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Dump all Objects from all Pools of all MCD Projects')
     parser.add_argument('projects_folder_path', help='MCD Projects (folder containing folders containing .db and .key files)')
     parser.add_argument('output_folder_path', help='Main output folder, in which other folders with the names of the Projects will be added')
+    parser.add_argument('--keep-going', action='store_true', help='Record Objects which fail to load in a report (in the main output folder) and continue')
+    parser.add_argument('--retry-failures', action='store_true', help='Only load the Objects from the failure report again, and update their Pool files')
+    parser.add_argument('--object-store', action='store_true', help='Dump each distinct Object once, in a store shared by all Pools and Projects (in the main output folder)')
+    parser.add_argument('--shard-size', type=int, default=None, metavar='MB', help='Split each Pool file into shards of at most this size, with an index for reading single Objects (see classes/ShardedDumpReader.py)')
+    DumpWriter.add_arguments(parser)
+    DumpFilter.add_arguments(parser)
     args = parser.parse_args()
     
     # The projects_folder_path argument must be a path to a folder
@@ -61,13 +93,34 @@ if __name__ == '__main__':
     # Get the starting timestamp
     start_time = time.time()
     
+    # Failures are recorded in a report in the main output folder, if requested
+    failure_report = None
+    if args.keep_going or args.retry_failures:
+        failure_report = FailureReport(args.output_folder_path)
+    
+    # Identical Objects are dumped once in a store in the main output folder, if requested
+    object_store = None
+    if args.object_store:
+        object_store = ObjectStore(args.output_folder_path)
+    
     # Run the app
     # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
     try:
-        app_dumpAllProjects(args.projects_folder_path, args.output_folder_path)
+        if args.retry_failures:
+            app_retryAllFailures(args.output_folder_path, failure_report, DumpWriter.from_arguments(args), object_store, DumpFilter.from_arguments(args))
+        else:
+            app_dumpAllProjects(args.projects_folder_path, args.output_folder_path, DumpWriter.from_arguments(args), failure_report, object_store, DumpFilter.from_arguments(args), None if args.shard_size is None else args.shard_size * 1024 * 1024)
     except:
         print('Error:\n{}'.format(traceback.format_exc()))
     
+    # Save the store, including the Objects of a Project which was interrupted
+    if object_store is not None:
+        object_store.close()
+    
+    # Show how many failures are left
+    if failure_report is not None and failure_report.get_failure_count() != 0:
+        print('{} Objects failed to load, see {}'.format(failure_report.get_failure_count(), os.path.join(args.output_folder_path, FailureReport.report_file_name)))
+    
     # Get the elapsed time and split it into hours, minutes, seconds
     elapsed_seconds = time.time() - start_time
     (hours, remainder) = divmod(elapsed_seconds, 3600)
@@ -8,8 +8,10 @@ from common_utils import enum_converters, object_printer
 from classes.PblRecordManager import PblRecordManager
 from classes.StringStorage import StringStorage
 from classes.ObjectLoader import ObjectLoader
+from classes.DumpWriter import DumpWriter
+from classes.ObjectLocator import ObjectLocator
 
-from dumpMWB import get_protocol_layer_data_list, get_ecu_variant_map, get_ecu_variant_layer_data, parse_dop
+from dumpMWB import get_protocol_layer_data_list, get_protocol_pool_ids, get_ecu_variant_map, get_ecu_variant_layer_data, parse_dop
 
 
 # PBL is needed for parsing .key files, which will be done by the PblRecordManager class
@@ -21,11 +23,7 @@ pbl_record_manager = PblRecordManager(pbl_dll_path)
 # Get the table (and its keys) necessary for Coding
 def get_coding_keys_and_table(object_loader, layer_data_objects, project_folder_path, ecu_variant_layer_data):
     # Search for the DIAG-COMM reference with name 'DiagnServi_WriteDataByIdentVariaCodinTextu' (might not exist)
-    diag_com_ref_WDBI = None
-    for diag_com_ref in ecu_variant_layer_data['diag_com_refs']:
-        if diag_com_ref['map_key'] == 'DiagnServi_WriteDataByIdentVariaCodinTextu':
-            diag_com_ref_WDBI = diag_com_ref
-            break
+    diag_com_ref_WDBI = object_loader.get_layer_data_index(ecu_variant_layer_data).get_entry('diag_com_refs', 'DiagnServi_WriteDataByIdentVariaCodinTextu')
     
     # Return None for ECU-VARIANTs which do not have the Coding service defined
     if diag_com_ref_WDBI is None:
@@ -101,7 +99,11 @@ def get_coding_structure(object_loader, project_folder_path, coding_table_row_pa
     return coding_table_row_parameter['dop']
 
 
-def dump_codings_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, output_folder_path, overwrite = False, debug_info_indentation_level = 0):
+def dump_codings_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, output_folder_path, overwrite = False, debug_info_indentation_level = 0, dump_writer = None):
+    # By default, write uncompressed text files
+    if dump_writer is None:
+        dump_writer = DumpWriter()
+    
     # The PoolID simply refers to the file's name (without extension)
     pool_id = base_variant_filename
     if base_variant_filename.endswith('.db'):
@@ -147,10 +149,13 @@ def dump_codings_for_base_variant(object_loader, protocol_layer_data_list, proje
         # The .c extension is only used for highlighting and block folding in a code editor
         ecu_variant_output_file_path = os.path.join(base_variant_output_folder_path, 'VRC_' + ecu_variant_name + '.c')
         
-        # Only dump the Coding if the file doesn't already exist (or if overwriting is allowed)
-        if not overwrite and (os.path.exists(ecu_variant_output_file_path) and os.path.isfile(ecu_variant_output_file_path)):
+        # Only dump the Coding if the file isn't already up to date (or if overwriting is allowed)
+        if not overwrite and dump_writer.is_done(ecu_variant_output_file_path, object_loader.get_output_options()):
             object_printer.print_indented(debug_info_indentation_level + 1, 'Already done, skipping')
         else:
+            # Keep track of the Pools used for this output, so it can be redone when one of them changes
+            object_loader.reset_accessed_pool_ids()
+            
             # The layer data will be needed for getting a list of all Coding and also for solving some references
             
             # If parsing the BASE-VARIANT, its layer data was retrieved previously
@@ -179,7 +184,7 @@ def dump_codings_for_base_variant(object_loader, protocol_layer_data_list, proje
                 os.makedirs(base_variant_output_folder_path)
             
             # Open the output file and dump the Coding
-            with open(ecu_variant_output_file_path, 'w', encoding='utf-8') as ecu_variant_output_file:
+            with dump_writer.open(ecu_variant_output_file_path) as ecu_variant_output_file:
                 for coding_did in coding_keys:
                     # Get the definition for the current DID
                     table_row_result = get_coding_name_and_table_row_parameter_by_did(object_loader, project_folder_path, coding_keys, coding_table, coding_did)
@@ -209,9 +214,12 @@ def dump_codings_for_base_variant(object_loader, protocol_layer_data_list, proje
                     # Dump to the output file
                     object_printer.print_object(obj, '0x{:04X}: {} - {}'.format(coding_did, coding_long_name_id, coding_long_name), 0, ecu_variant_output_file, False)
                     object_printer.print_indented(0, '', ecu_variant_output_file)
+            
+            # Remember which input files the output was made from (the BASE-VARIANT and protocol layer data were loaded before the tracking started)
+            dump_writer.record(ecu_variant_output_file_path, project_folder_path, object_loader.get_accessed_pool_ids() | {pool_id} | get_protocol_pool_ids(protocol_layer_data_list), object_loader.get_output_options())
 
 
-def dump_codings_for_all_base_variants_in_project(object_loader, protocol_layer_data, project_folder_path, output_folder_path, overwrite = False, debug_info_indentation_level = 0):
+def dump_codings_for_all_base_variants_in_project(object_loader, protocol_layer_data, project_folder_path, output_folder_path, overwrite = False, debug_info_indentation_level = 0, dump_writer = None):
     # Go through each file (Pool) in the project folder
     for current_filename in os.listdir(project_folder_path):
         # The PoolID simply refers to the file's name (without extension)
@@ -230,10 +238,10 @@ def dump_codings_for_all_base_variants_in_project(object_loader, protocol_layer_
         object_printer.print_indented(debug_info_indentation_level, 'Dumping {}'.format(PoolID))
         
         # Dump the Coding with the other function
-        dump_codings_for_base_variant(object_loader, protocol_layer_data, project_folder_path, PoolID, output_folder_path, overwrite, debug_info_indentation_level + 1)
+        dump_codings_for_base_variant(object_loader, protocol_layer_data, project_folder_path, PoolID, output_folder_path, overwrite, debug_info_indentation_level + 1, dump_writer)
 
 
-def dump_codings_for_all_base_variants_in_all_projects(project_folder_path, output_folder_path, debug_info_indentation_level = 0):
+def dump_codings_for_all_base_variants_in_all_projects(project_folder_path, output_folder_path, debug_info_indentation_level = 0, dump_writer = None, locate_dops = False):
     # Go through each project in the folder
     for project_name in os.listdir(project_folder_path):
         project_path = os.path.join(project_folder_path, project_name)
@@ -278,11 +286,16 @@ def dump_codings_for_all_base_variants_in_all_projects(project_folder_path, outp
         if not os.path.isdir(project_output_folder_path):
             os.makedirs(project_output_folder_path)
         
+        # References without PoolID which are missing from the layer data maps can be searched in all Pools, if requested
+        # The index of all Pools is cached in the project output folder
+        if locate_dops:
+            object_loader.set_object_locator(ObjectLocator(pbl_record_manager, project_path, project_output_folder_path))
+        
         # Dump the Coding for each ECU-VARIANT in each BASE-VARIANT with the other function
-        dump_codings_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, project_path, project_output_folder_path, False, debug_info_indentation_level + 1)
+        dump_codings_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, project_path, project_output_folder_path, False, debug_info_indentation_level + 1, dump_writer)
 
 
-def dumpCoding_basevariant(project_folder_path, base_variant_filename, output_folder_path):
+def dumpCoding_basevariant(project_folder_path, base_variant_filename, output_folder_path, dump_writer = None, locate_dops = False):
     if not os.path.isdir(project_folder_path):
         raise RuntimeError('Project must be folder')
     
@@ -305,6 +318,11 @@ def dumpCoding_basevariant(project_folder_path, base_variant_filename, output_fo
     # An instance of the ObjectLoader class is used for loading Objects and references from the BASE-VARIANT Pool
     object_loader = ObjectLoader(pbl_record_manager, string_storage)
     
+    # References without PoolID which are missing from the layer data maps can be searched in all Pools, if requested
+    # The index of all Pools is cached in the project output folder
+    if locate_dops:
+        object_loader.set_object_locator(ObjectLocator(pbl_record_manager, project_folder_path, project_output_folder_path))
+    
     # Some references will only specify the ObjectID (object name) and not the PoolID (file name)
     # To resolve them, there are 3 maps that link an ObjectID with a PoolID: one for the ECU-VARIANT, one for the BASE-VARIANT, and one for the protocol
     # The ObjectID will be searched in them, in that order
@@ -314,10 +332,10 @@ def dumpCoding_basevariant(project_folder_path, base_variant_filename, output_fo
     protocol_layer_data_list = get_protocol_layer_data_list(object_loader, project_folder_path)
     
     # Run the app
-    dump_codings_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, project_output_folder_path, True)
+    dump_codings_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, project_output_folder_path, True, 0, dump_writer)
 
 
-def dumpCoding_project(project_folder_path, output_folder_path):
+def dumpCoding_project(project_folder_path, output_folder_path, dump_writer = None, locate_dops = False):
     if not os.path.isdir(project_folder_path):
         raise RuntimeError('Project must be folder')
     
@@ -340,6 +358,11 @@ def dumpCoding_project(project_folder_path, output_folder_path):
     # An instance of the ObjectLoader class is used for loading Objects and References from the BASE-VARIANT Pool
     object_loader = ObjectLoader(pbl_record_manager, string_storage)
     
+    # References without PoolID which are missing from the layer data maps can be searched in all Pools, if requested
+    # The index of all Pools is cached in the project output folder
+    if locate_dops:
+        object_loader.set_object_locator(ObjectLocator(pbl_record_manager, project_folder_path, project_output_folder_path))
+    
     # Get the starting timestamp
     start_time = time.time()
     
@@ -353,7 +376,7 @@ def dumpCoding_project(project_folder_path, output_folder_path):
     # Run the app
     # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
     try:
-        dump_codings_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, project_folder_path, project_output_folder_path)
+        dump_codings_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, project_folder_path, project_output_folder_path, False, 0, dump_writer)
     except:
         print('Error:\n{}'.format(traceback.format_exc()))
     
@@ -366,7 +389,7 @@ def dumpCoding_project(project_folder_path, output_folder_path):
     print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
 
 
-def dumpCoding_projects(projects_folder_path, output_folder_path):
+def dumpCoding_projects(projects_folder_path, output_folder_path, dump_writer = None, locate_dops = False):
     if not os.path.isdir(projects_folder_path):
         raise RuntimeError('Must provide folder to all projects')
     
@@ -380,7 +403,7 @@ def dumpCoding_projects(projects_folder_path, output_folder_path):
     # Run the app
     # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
     try:
-        dump_codings_for_all_base_variants_in_all_projects(projects_folder_path, output_folder_path)
+        dump_codings_for_all_base_variants_in_all_projects(projects_folder_path, output_folder_path, 0, dump_writer, locate_dops)
     except:
         print('Error:\n{}'.format(traceback.format_exc()))
     
@@ -403,21 +426,27 @@ if __name__ == '__main__':
     parser_basevariant.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
     parser_basevariant.add_argument('base_variant_filename', help='Filename of BASE-VARIANT (.bv.db file)')
     parser_basevariant.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for the project and BASE-VARIANT')
+    DumpWriter.add_arguments(parser_basevariant)
+    parser_basevariant.add_argument('--locate-dops', action='store_true', help='Search all Pools of the project for DOPs which are missing from the layer data maps (the MCD Kernel fails to load them)')
     parser_basevariant.set_defaults(func=dumpCoding_basevariant)
     
     # All Coding from all ECU-VARIANTs in all BASE-VARIANTs of a project
     parser_project = subparsers.add_parser('project', help='Dump Coding for all ECU-VARIANTs in all BASE-VARIANTs of a project')
     parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
     parser_project.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for the project and each BASE-VARIANT')
+    DumpWriter.add_arguments(parser_project)
+    parser_project.add_argument('--locate-dops', action='store_true', help='Search all Pools of the project for DOPs which are missing from the layer data maps (the MCD Kernel fails to load them)')
     parser_project.set_defaults(func=dumpCoding_project)
     
     # All Coding from all ECU-VARIANTs in all BASE-VARIANTs of all projects
     parser_all_projects = subparsers.add_parser('projects', help='Dump Coding for all ECU-VARIANTs in all BASE-VARIANTs of all projects')
     parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
     parser_all_projects.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for each project')
+    DumpWriter.add_arguments(parser_all_projects)
+    parser_all_projects.add_argument('--locate-dops', action='store_true', help='Search all Pools of the project for DOPs which are missing from the layer data maps (the MCD Kernel fails to load them)')
     parser_all_projects.set_defaults(func=dumpCoding_projects)
     
     # Parse the provided arguments and call the appropriate function based on the command
     args = parser.parse_args()
-    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
-    args.func(**filtered_args)
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command') + DumpWriter.argument_names}
+    args.func(dump_writer=DumpWriter.from_arguments(args), **filtered_args)
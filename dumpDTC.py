@@ -8,7 +8,9 @@ from common_utils import enum_converters, object_printer
 from classes.PblRecordManager import PblRecordManager
 from classes.StringStorage import StringStorage
 from classes.ObjectLoader import ObjectLoader
+from classes.DumpWriter import DumpWriter
 from classes.LongNameTranslation import LongNameTranslation
+from classes.DtcIndex import DtcIndex
 
 from dumpMWB import get_ecu_variant_map, get_ecu_variant_layer_data, get_protocol_layer_data_list
 
@@ -19,7 +21,11 @@ pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
 pbl_record_manager = PblRecordManager(pbl_dll_path)
 
 
-def dump_dtcs_for_base_variant(object_loader, long_name_translation, project_folder_path, base_variant_filename, output_folder_path, overwrite = False, debug_info_indentation_level = 0):
+def dump_dtcs_for_base_variant(object_loader, long_name_translation, project_folder_path, base_variant_filename, output_folder_path, overwrite = False, debug_info_indentation_level = 0, dump_writer = None, dtc_index = None):
+    # By default, write uncompressed text files
+    if dump_writer is None:
+        dump_writer = DumpWriter()
+    
     # The PoolID simply refers to the file's name (without extension)
     pool_id = base_variant_filename
     if base_variant_filename.endswith('.db'):
@@ -40,6 +46,9 @@ def dump_dtcs_for_base_variant(object_loader, long_name_translation, project_fol
     # Get the BASE-VARIANT's name from the "project data" (could get from filename too)
     base_variant_name = db_project_data['ecu_base_variant_ref']['object_id']
     
+    # The project name is the name of the last folder in the path, used in the DTC index
+    project_name = os.path.basename(os.path.abspath(project_folder_path))
+    
     # The output folder will be named like the BASE-VARIANT
     base_variant_output_folder_path = os.path.join(output_folder_path, base_variant_name)
     
@@ -61,6 +70,9 @@ def dump_dtcs_for_base_variant(object_loader, long_name_translation, project_fol
         else:
             object_printer.print_indented(debug_info_indentation_level, 'ECU-VARIANT {}'.format(ecu_variant_name))
         
+        # Keep track of the Pools used for this ECU-VARIANT's outputs, so they can be redone when one of them changes
+        object_loader.reset_accessed_pool_ids()
+        
         # If parsing the BASE-VARIANT, its layer data was retrieved previously
         if ecu_variant_name == base_variant_name:
             ecu_variant_layer_data = base_variant_layer_data
@@ -81,47 +93,71 @@ def dump_dtcs_for_base_variant(object_loader, long_name_translation, project_fol
             os.makedirs(base_variant_output_folder_path)
         
         # Go through each DTC DOP, creating a file for each
-        for dtc_dop in dtc_dops:
+        variant_dtcs = []
+        for dtc_dop_name in dtc_dops:
             # The DTCs will be dumped into a file named like the ECU-VARIANT and DTC DOP
             # The .c extension is only used for highlighting and block folding in a code editor
-            ecu_variant_output_file_path = os.path.join(base_variant_output_folder_path, dtc_dop + '_' + ecu_variant_name + '.c')
+            ecu_variant_output_file_path = os.path.join(base_variant_output_folder_path, dtc_dop_name + '_' + ecu_variant_name + '.c')
             
-            # Only dump the DTCs if the file doesn't already exist (or if overwriting is allowed)
-            if not overwrite and (os.path.exists(ecu_variant_output_file_path) and os.path.isfile(ecu_variant_output_file_path)):
+            # Only dump the DTCs if the file isn't already up to date (or if overwriting is allowed)
+            # The DTCs are still loaded for the index, if there is one
+            is_done = not overwrite and dump_writer.is_done(ecu_variant_output_file_path)
+            if is_done:
                 object_printer.print_indented(debug_info_indentation_level + 1, 'Already done, skipping')
-            else:
-                # Load the DOP, which is given without PoolID, so will be searched in a reference map
-                dummy_reference = {'object_id': dtc_dop, 'pool_id': None}
-                dtc_dop = object_loader.load_DOP_by_reference_without_PoolID(project_folder_path, [ecu_variant_layer_data], dummy_reference)
+                if dtc_index is None:
+                    continue
+            
+            # Load the DOP, which is given without PoolID, so will be searched in a reference map
+            dummy_reference = {'object_id': dtc_dop_name, 'pool_id': None}
+            dtc_dop = object_loader.load_DOP_by_reference_without_PoolID(project_folder_path, [ecu_variant_layer_data], dummy_reference)
+            
+            # Load all table rows at once, instead of opening the .db file again for each one
+            dtc_refs = dtc_dop['diag_trouble_codes_ref_map']
+            dtc_objects = object_loader.load_objects_by_references(project_folder_path, [x['reference'] for x in dtc_refs])
+            
+            # Add each DTC definition to a list
+            dtcs_output_object = []
+            for (dtc_ref, dtc_object) in zip(dtc_refs, dtc_objects):
+                # Ensure the key of the table row matches
+                trouble_code = dtc_ref['map_key']
+                if dtc_object['trouble_code'] != trouble_code:
+                    raise RuntimeError('DTC table row key {} does not match map key {}'.format(dtc_object['trouble_code'], trouble_code))
+                
+                # Get the fields of the definition
+                output_object = {}
+                output_object['trouble_code'] = trouble_code
+                output_object['dtc'] = dtc_object['trouble_code_text']
+                output_object['level'] = dtc_object['level']
+                output_object['raw_description'] = dtc_object['description']
+                
+                # The "LONG-NAME" is used as a LONG-NAME-ID to get a more detailed description
+                output_object['translated_description'] = long_name_translation.get_long_name_translation(dtc_object['long_name'], 'No translation database provided')
                 
-                # Add each DTC definition to a list
-                dtcs_output_object = []
-                for dtc_ref in dtc_dop['diag_trouble_codes_ref_map']:
-                    # Load the table row and ensure the key matches
-                    trouble_code = dtc_ref['map_key']
-                    dtc_object = object_loader.load_object_by_reference(project_folder_path, dtc_ref['reference'])
-                    if dtc_object['trouble_code'] != trouble_code:
-                        raise RuntimeError('DTC table row key {} does not match map key {}'.format(dtc_object['trouble_code'], trouble_code))
-                    
-                    # Get the fields of the definition
-                    output_object = {}
-                    output_object['trouble_code'] = trouble_code
-                    output_object['dtc'] = dtc_object['trouble_code_text']
-                    output_object['level'] = dtc_object['level']
-                    output_object['raw_description'] = dtc_object['description']
-                    
-                    # The "LONG-NAME" is used as a LONG-NAME-ID to get a more detailed description
-                    output_object['translated_description'] = long_name_translation.get_long_name_translation(dtc_object['long_name'], 'No translation database provided')
-                    
-                    # Add the definition to the list
-                    dtcs_output_object.append(output_object)
+                # Add the definition to the list
+                dtcs_output_object.append(output_object)
                 
+                # The index only gets the translation if there is one
+                if dtc_index is not None:
+                    variant_dtcs.append((dtc_dop_name, trouble_code, dtc_object['trouble_code_text'], dtc_object['level'], dtc_object['description'], dtc_object['long_name'], long_name_translation.get_long_name_translation(dtc_object['long_name'], None)))
+            
+            if not is_done:
                 # Dump to the output file
-                with open(ecu_variant_output_file_path, 'w', encoding='utf-8') as ecu_variant_output_file:
+                with dump_writer.open(ecu_variant_output_file_path) as ecu_variant_output_file:
                     object_printer.print_object(dtcs_output_object, '', 0, ecu_variant_output_file)
+                
+                # Remember which input files the output was made from (the BASE-VARIANT layer data was loaded before the tracking started)
+                dump_writer.record(ecu_variant_output_file_path, project_folder_path, object_loader.get_accessed_pool_ids() | {pool_id})
+        
+        # Replace the variant's DTCs in the index
+        if dtc_index is not None:
+            dtc_index.add_variant(project_name, base_variant_name, ecu_variant_name, variant_dtcs)
 
 
-def dump_dtcs_for_all_base_variants_in_project(object_loader, long_name_translation, project_folder_path, output_folder_path, overwrite = False, debug_info_indentation_level = 0):
+def dump_dtcs_for_all_base_variants_in_project(object_loader, long_name_translation, project_folder_path, output_folder_path, overwrite = False, debug_info_indentation_level = 0, dump_writer = None, dtc_index = None):
+    # The whole project is indexed again, so BASE-VARIANTs which no longer exist are removed from the index
+    if dtc_index is not None:
+        dtc_index.clear_project(os.path.basename(os.path.abspath(project_folder_path)))
+    
     # Go through each file (Pool) in the project folder
     for current_filename in os.listdir(project_folder_path):
         # The PoolID simply refers to the file's name (without extension)
@@ -140,10 +176,14 @@ def dump_dtcs_for_all_base_variants_in_project(object_loader, long_name_translat
         object_printer.print_indented(debug_info_indentation_level, 'Dumping {}'.format(PoolID))
         
         # Dump the DTCs with the other function
-        dump_dtcs_for_base_variant(object_loader, long_name_translation, project_folder_path, PoolID, output_folder_path, overwrite, debug_info_indentation_level + 1)
+        dump_dtcs_for_base_variant(object_loader, long_name_translation, project_folder_path, PoolID, output_folder_path, overwrite, debug_info_indentation_level + 1, dump_writer, dtc_index)
+    
+    # Save the project all at once, so the index never contains only part of it
+    if dtc_index is not None:
+        dtc_index.commit()
 
 
-def dump_dtcs_for_all_base_variants_in_all_projects(long_name_translation, project_folder_path, output_folder_path, debug_info_indentation_level = 0):
+def dump_dtcs_for_all_base_variants_in_all_projects(long_name_translation, project_folder_path, output_folder_path, debug_info_indentation_level = 0, dump_writer = None, dtc_index = None):
     # Go through each project in the folder
     for project_name in os.listdir(project_folder_path):
         project_path = os.path.join(project_folder_path, project_name)
@@ -183,10 +223,10 @@ def dump_dtcs_for_all_base_variants_in_all_projects(long_name_translation, proje
             os.makedirs(project_output_folder_path)
         
         # Dump the project's DTCs with the other function
-        dump_dtcs_for_all_base_variants_in_project(object_loader, long_name_translation, project_path, project_output_folder_path, False, debug_info_indentation_level + 1)
+        dump_dtcs_for_all_base_variants_in_project(object_loader, long_name_translation, project_path, project_output_folder_path, False, debug_info_indentation_level + 1, dump_writer, dtc_index)
 
 
-def dumpDTC_basevariant(project_folder_path, base_variant_filename, output_folder_path, translation_database_folder_path, translation_language):
+def dumpDTC_basevariant(project_folder_path, base_variant_filename, output_folder_path, translation_database_folder_path, translation_language, dump_writer = None, index_file_path = None):
     if not os.path.isdir(project_folder_path):
         raise RuntimeError('Project must be folder')
     
@@ -214,11 +254,16 @@ def dumpDTC_basevariant(project_folder_path, base_variant_filename, output_folde
     # The file "hsqldb.jar" should be in the working directory, in the "bin" folder
     long_name_translation = LongNameTranslation('bin/hsqldb.jar', translation_database_folder_path, translation_language)
     
+    # The DTC index is optional
+    dtc_index = DtcIndex(index_file_path) if index_file_path is not None else None
+    
     # Run the app
-    dump_dtcs_for_base_variant(object_loader, long_name_translation, project_folder_path, base_variant_filename, project_output_folder_path, True)
+    dump_dtcs_for_base_variant(object_loader, long_name_translation, project_folder_path, base_variant_filename, project_output_folder_path, True, 0, dump_writer, dtc_index)
+    if dtc_index is not None:
+        dtc_index.close()
 
 
-def dumpDTC_project(project_folder_path, output_folder_path, translation_database_folder_path, translation_language):
+def dumpDTC_project(project_folder_path, output_folder_path, translation_database_folder_path, translation_language, dump_writer = None, index_file_path = None):
     if not os.path.isdir(project_folder_path):
         raise RuntimeError('Project must be folder')
     
@@ -256,12 +301,20 @@ def dumpDTC_project(project_folder_path, output_folder_path, translation_databas
         print('    Not UDS project')
         sys.exit()
     
+    # The DTC index is optional
+    dtc_index = DtcIndex(index_file_path) if index_file_path is not None else None
+    
     # Run the app
     # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
     try:
-        dump_dtcs_for_all_base_variants_in_project(object_loader, long_name_translation, project_folder_path, project_output_folder_path)
+        dump_dtcs_for_all_base_variants_in_project(object_loader, long_name_translation, project_folder_path, project_output_folder_path, False, 0, dump_writer, dtc_index)
     except:
+        # The project which failed was cleared and only partly added, so it's discarded (the index keeps its previous contents)
+        if dtc_index is not None:
+            dtc_index.rollback()
         print('Error:\n{}'.format(traceback.format_exc()))
+    if dtc_index is not None:
+        dtc_index.close()
     
     # Get the elapsed time and split it into hours, minutes, seconds
     elapsed_seconds = time.time() - start_time
@@ -272,7 +325,7 @@ def dumpDTC_project(project_folder_path, output_folder_path, translation_databas
     print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
 
 
-def dumpDTC_projects(projects_folder_path, output_folder_path, translation_database_folder_path, translation_language):
+def dumpDTC_projects(projects_folder_path, output_folder_path, translation_database_folder_path, translation_language, dump_writer = None, index_file_path = None):
     if not os.path.isdir(projects_folder_path):
         raise RuntimeError('Must provide folder to all projects')
     
@@ -288,12 +341,20 @@ def dumpDTC_projects(projects_folder_path, output_folder_path, translation_datab
     # Get the starting timestamp
     start_time = time.time()
     
+    # The DTC index is optional, and shared by all projects
+    dtc_index = DtcIndex(index_file_path) if index_file_path is not None else None
+    
     # Run the app
     # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
     try:
-        dump_dtcs_for_all_base_variants_in_all_projects(long_name_translation, projects_folder_path, output_folder_path)
+        dump_dtcs_for_all_base_variants_in_all_projects(long_name_translation, projects_folder_path, output_folder_path, 0, dump_writer, dtc_index)
     except:
+        # The project which failed was cleared and only partly added, so it's discarded (the index keeps its previous contents)
+        if dtc_index is not None:
+            dtc_index.rollback()
         print('Error:\n{}'.format(traceback.format_exc()))
+    if dtc_index is not None:
+        dtc_index.close()
     
     # Get the elapsed time and split it into hours, minutes, seconds
     elapsed_seconds = time.time() - start_time
@@ -316,6 +377,8 @@ if __name__ == '__main__':
     parser_basevariant.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for the project and BASE-VARIANT')
     parser_basevariant.add_argument('translation_database_folder_path', help='Folder containing the translation database (e.g. ".../DIDB/db")', nargs='?')
     parser_basevariant.add_argument('translation_language', help='Language for translations (e.g. "en_US")', nargs='?')
+    parser_basevariant.add_argument('--index', dest='index_file_path', default=None, help='Path of an SQLite DTC index to also write the DTCs to (created if it doesn\'t exist)')
+    DumpWriter.add_arguments(parser_basevariant)
     parser_basevariant.set_defaults(func=dumpDTC_basevariant)
     
     # All DTCs from all ECU-VARIANTs in all BASE-VARIANTs of a project
@@ -324,6 +387,8 @@ if __name__ == '__main__':
     parser_project.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for the project and each BASE-VARIANT')
     parser_project.add_argument('translation_database_folder_path', help='Folder containing the translation database (e.g. ".../DIDB/db")', nargs='?')
     parser_project.add_argument('translation_language', help='Language for translations (e.g. "en_US")', nargs='?')
+    parser_project.add_argument('--index', dest='index_file_path', default=None, help='Path of an SQLite DTC index to also write the DTCs to (created if it doesn\'t exist)')
+    DumpWriter.add_arguments(parser_project)
     parser_project.set_defaults(func=dumpDTC_project)
     
     # All DTCs from all ECU-VARIANTs in all BASE-VARIANTs of all projects
@@ -332,9 +397,11 @@ if __name__ == '__main__':
     parser_all_projects.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for each project')
     parser_all_projects.add_argument('translation_database_folder_path', help='Folder containing the translation database (e.g. ".../DIDB/db")', nargs='?')
     parser_all_projects.add_argument('translation_language', help='Language for translations (e.g. "en_US")', nargs='?')
+    parser_all_projects.add_argument('--index', dest='index_file_path', default=None, help='Path of an SQLite DTC index to also write the DTCs to (created if it doesn\'t exist)')
+    DumpWriter.add_arguments(parser_all_projects)
     parser_all_projects.set_defaults(func=dumpDTC_projects)
     
     # Parse the provided arguments and call the appropriate function based on the command
     args = parser.parse_args()
-    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
-    args.func(**filtered_args)
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command') + DumpWriter.argument_names}
+    args.func(dump_writer=DumpWriter.from_arguments(args), **filtered_args)
@@ -0,0 +1,283 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+
+from common_utils import enum_converters, object_printer
+from classes.StringStorage import StringStorage
+from classes.ObjectLoader import ObjectLoader
+from classes.DumpWriter import DumpWriter
+from classes.ObjectLocator import ObjectLocator
+from classes.LongNameTranslation import LongNameTranslation
+
+from dumpMWB import pbl_record_manager, mwb_structures_file_name, get_protocol_layer_data_list, dump_mwbs_for_base_variant
+from dumpCoding import dump_codings_for_base_variant
+from dumpAdaptations import dump_adaptations_for_base_variant
+from dumpFreezeFrames import dump_freezeframes_for_base_variant
+from dumpDTC import dump_dtcs_for_base_variant
+from dumpECUVariantPatterns import dump_patterns_for_base_variant
+
+
+# Names of the extractors which can be run, in the order they are run for each BASE-VARIANT
+extractor_names = ['patterns', 'dtc', 'mwb', 'coding', 'adaptations', 'freezeframes']
+
+
+# Object types loaded by every extractor for each BASE-VARIANT, which are only decoded once and shared by all of them
+shared_object_types = ['DB_PROJECT_DATA', 'DB_LAYER_DATA', 'MCD_DB_ECU_VARIANT']
+
+
+# Run the selected extractors for a BASE-VARIANT, one after the other, with the same ObjectLoader
+# Everything loaded by the first extractor (PBL records, project data, layer data, ECU-VARIANTs, resolved and parsed DOPs) is reused by the others
+### object_loader            = instance of ObjectLoader, with StringStorage instance loaded from the target project
+### protocol_layer_data_list = list returned by get_protocol_layer_data_list
+### long_name_translation    = instance of LongNameTranslation, used for DTC descriptions
+### project_folder_path      = project path (folder with .db and .key files)
+### base_variant_filename    = filename of BASE-VARIANT (.bv.db file)
+### output_folder_path       = folder where the BASE-VARIANT's output folder is created
+### extractors               = list of extractor names (see `extractor_names`)
+### shared_structures        = write the MWB STRUCTUREs once per BASE-VARIANT (see dumpMWB)
+def dump_definitions_for_base_variant(object_loader, protocol_layer_data_list, long_name_translation, project_folder_path, base_variant_filename, output_folder_path, extractors, overwrite = False, debug_info_indentation_level = 0, dump_writer = None, shared_structures = False):
+    for extractor in extractor_names:
+        if extractor not in extractors:
+            continue
+        
+        object_printer.print_indented(debug_info_indentation_level, 'Extracting {}'.format(extractor))
+        match extractor:
+            case 'patterns':
+                dump_patterns_for_base_variant(object_loader, project_folder_path, base_variant_filename, output_folder_path, overwrite, debug_info_indentation_level + 1, dump_writer)
+            case 'dtc':
+                dump_dtcs_for_base_variant(object_loader, long_name_translation, project_folder_path, base_variant_filename, output_folder_path, overwrite, debug_info_indentation_level + 1, dump_writer)
+            case 'mwb':
+                dump_mwbs_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, output_folder_path, overwrite, debug_info_indentation_level + 1, dump_writer, shared_structures)
+            case 'coding':
+                dump_codings_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, output_folder_path, overwrite, debug_info_indentation_level + 1, dump_writer)
+            case 'adaptations':
+                dump_adaptations_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, output_folder_path, overwrite, debug_info_indentation_level + 1, dump_writer)
+            case 'freezeframes':
+                dump_freezeframes_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, output_folder_path, overwrite, debug_info_indentation_level + 1, dump_writer)
+    
+    # The shared Objects of this BASE-VARIANT won't be needed again
+    object_loader.clear_object_cache()
+
+
+def dump_definitions_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, long_name_translation, project_folder_path, output_folder_path, extractors, overwrite = False, debug_info_indentation_level = 0, dump_writer = None, shared_structures = False):
+    # Go through each file (Pool) in the project folder
+    for current_filename in os.listdir(project_folder_path):
+        # The PoolID simply refers to the file's name (without extension)
+        (PoolID, extension) = os.path.splitext(current_filename)
+        
+        # Only parse .db files
+        db_file_path = os.path.join(project_folder_path, current_filename)
+        if not os.path.isfile(db_file_path) or extension != '.db':
+            continue
+        
+        # Only parse .bv.db files
+        if enum_converters.get_db_file_type(PoolID) != 'Base Variant':
+            continue
+        
+        # Display the current BASE-VARIANT being dumped
+        object_printer.print_indented(debug_info_indentation_level, 'Dumping {}'.format(PoolID))
+        
+        # Run the extractors with the other function
+        dump_definitions_for_base_variant(object_loader, protocol_layer_data_list, long_name_translation, project_folder_path, PoolID, output_folder_path, extractors, overwrite, debug_info_indentation_level + 1, dump_writer, shared_structures)
+
+
+# Prepare an ObjectLoader for a project, shared by all extractors
+### project_folder_path        = project path (folder with .db and .key files)
+### project_output_folder_path = project output folder (the index of all Pools is cached there, if locating DOPs)
+### locate_dops                = search all Pools of the project for DOPs which are missing from the layer data maps
+def get_project_object_loader(project_folder_path, project_output_folder_path, locate_dops):
+    # Create an instance of the StringStorage class, used for loading the strings database
+    # The strings database is unique to each project
+    string_storage = StringStorage(project_folder_path)
+    
+    # An instance of the ObjectLoader class is used for loading Objects and references from the BASE-VARIANT Pools
+    object_loader = ObjectLoader(pbl_record_manager, string_storage)
+    object_loader.cache_objects(shared_object_types)
+    
+    # References without PoolID which are missing from the layer data maps can be searched in all Pools, if requested
+    if locate_dops:
+        object_loader.set_object_locator(ObjectLocator(pbl_record_manager, project_folder_path, project_output_folder_path))
+    return object_loader
+
+
+def dump_definitions_for_all_base_variants_in_all_projects(project_folder_path, output_folder_path, extractors, long_name_translation, debug_info_indentation_level = 0, dump_writer = None, locate_dops = False, shared_structures = False):
+    # Go through each project in the folder
+    for project_name in os.listdir(project_folder_path):
+        project_path = os.path.join(project_folder_path, project_name)
+        
+        # Only parse folders
+        if not os.path.isdir(project_path):
+            continue
+        
+        # Display the current project being unpacked
+        object_printer.print_indented(debug_info_indentation_level, 'Unpacking {}'.format(project_name))
+        
+        # Create the project output folder if it doesn't exist
+        project_output_folder_path = os.path.join(output_folder_path, project_name)
+        
+        # A valid project must contain string databases
+        # If an error occurs while trying to load them, the project is invalid
+        try:
+            object_loader = get_project_object_loader(project_path, project_output_folder_path, False)
+        except FileNotFoundError:
+            object_printer.print_indented(debug_info_indentation_level + 1, 'Invalid project')
+            if project_name == '_META':
+                object_printer.print_indented(debug_info_indentation_level + 1, 'Did you accidentally provide a specific project folder instead of the folder with all projects?')
+            continue
+        
+        # The project must contain the UDS protocol definition
+        try:
+            protocol_layer_data_list = get_protocol_layer_data_list(object_loader, project_path)
+        except FileNotFoundError:
+            object_printer.print_indented(debug_info_indentation_level + 1, 'Not UDS project')
+            continue
+        
+        if not os.path.isdir(project_output_folder_path):
+            os.makedirs(project_output_folder_path)
+        
+        # The index of all Pools is cached in the project output folder, so it can only be created now
+        if locate_dops:
+            object_loader.set_object_locator(ObjectLocator(pbl_record_manager, project_path, project_output_folder_path))
+        
+        # Run the extractors for each BASE-VARIANT with the other function
+        dump_definitions_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, long_name_translation, project_path, project_output_folder_path, extractors, False, debug_info_indentation_level + 1, dump_writer, shared_structures)
+
+
+def dumpDefinitions_basevariant(project_folder_path, base_variant_filename, output_folder_path, extractors, translation_database_folder_path = None, translation_language = None, dump_writer = None, locate_dops = False, shared_structures = False):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    # The project's output folder is named like the last folder in the path
+    project_output_folder_path = os.path.join(output_folder_path, os.path.basename(project_folder_path))
+    if not os.path.isdir(project_output_folder_path):
+        os.makedirs(project_output_folder_path)
+    
+    object_loader = get_project_object_loader(project_folder_path, project_output_folder_path, locate_dops)
+    
+    # Initialize the LONG-NAME translation (if the optional arguments are not given, nothing is really done)
+    # The file "hsqldb.jar" should be in the working directory, in the "bin" folder
+    long_name_translation = LongNameTranslation('bin/hsqldb.jar', translation_database_folder_path, translation_language)
+    
+    # Since the protocol is common for all BASE-VARIANTS, it's better to load it only once for the whole project
+    protocol_layer_data_list = get_protocol_layer_data_list(object_loader, project_folder_path)
+    
+    # Run the app
+    dump_definitions_for_base_variant(object_loader, protocol_layer_data_list, long_name_translation, project_folder_path, base_variant_filename, project_output_folder_path, extractors, True, 0, dump_writer, shared_structures)
+
+
+def dumpDefinitions_project(project_folder_path, output_folder_path, extractors, translation_database_folder_path = None, translation_language = None, dump_writer = None, locate_dops = False, shared_structures = False):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    # The project's output folder is named like the last folder in the path
+    project_output_folder_path = os.path.join(output_folder_path, os.path.basename(project_folder_path))
+    if not os.path.isdir(project_output_folder_path):
+        os.makedirs(project_output_folder_path)
+    
+    object_loader = get_project_object_loader(project_folder_path, project_output_folder_path, locate_dops)
+    
+    # Initialize the LONG-NAME translation (if the optional arguments are not given, nothing is really done)
+    # The file "hsqldb.jar" should be in the working directory, in the "bin" folder
+    long_name_translation = LongNameTranslation('bin/hsqldb.jar', translation_database_folder_path, translation_language)
+    
+    # Get the starting timestamp
+    start_time = time.time()
+    
+    # The project must contain the UDS protocol definition
+    try:
+        protocol_layer_data_list = get_protocol_layer_data_list(object_loader, project_folder_path)
+    except FileNotFoundError:
+        print('    Not UDS project')
+        sys.exit()
+    
+    # Run the app
+    # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
+    try:
+        dump_definitions_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, long_name_translation, project_folder_path, project_output_folder_path, extractors, False, 0, dump_writer, shared_structures)
+    except:
+        print('Error:\n{}'.format(traceback.format_exc()))
+    
+    # Get the elapsed time and split it into hours, minutes, seconds
+    elapsed_seconds = time.time() - start_time
+    (hours, remainder) = divmod(elapsed_seconds, 3600)
+    (minutes, seconds) = divmod(remainder, 60)
+    
+    # Display the time taken by the script to run
+    print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
+
+
+def dumpDefinitions_projects(projects_folder_path, output_folder_path, extractors, translation_database_folder_path = None, translation_language = None, dump_writer = None, locate_dops = False, shared_structures = False):
+    if not os.path.isdir(projects_folder_path):
+        raise RuntimeError('Must provide folder to all projects')
+    
+    # Create the main output folder if it doesn't exist
+    if not os.path.isdir(output_folder_path):
+        os.makedirs(output_folder_path)
+    
+    # Initialize the LONG-NAME translation (if the optional arguments are not given, nothing is really done)
+    # The file "hsqldb.jar" should be in the working directory, in the "bin" folder
+    long_name_translation = LongNameTranslation('bin/hsqldb.jar', translation_database_folder_path, translation_language)
+    
+    # Get the starting timestamp
+    start_time = time.time()
+    
+    # Run the app
+    # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
+    try:
+        dump_definitions_for_all_base_variants_in_all_projects(projects_folder_path, output_folder_path, extractors, long_name_translation, 0, dump_writer, locate_dops, shared_structures)
+    except:
+        print('Error:\n{}'.format(traceback.format_exc()))
+    
+    # Get the elapsed time and split it into hours, minutes, seconds
+    elapsed_seconds = time.time() - start_time
+    (hours, remainder) = divmod(elapsed_seconds, 3600)
+    (minutes, seconds) = divmod(remainder, 60)
+    
+    # Display the time taken by the script to run
+    print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
+
+
+# Add the arguments common to all commands
+### parser = argparse subparser
+def add_common_arguments(parser):
+    parser.add_argument('--extract', dest='extractors', nargs='+', choices=extractor_names, default=extractor_names, help='Extractors to run for each BASE-VARIANT (default: all)')
+    parser.add_argument('--translation-database', dest='translation_database_folder_path', default=None, help='Folder containing the translation database, used for DTC descriptions (e.g. ".../DIDB/db")')
+    parser.add_argument('--translation-language', dest='translation_language', default=None, help='Language for translations (e.g. "en_US")')
+    DumpWriter.add_arguments(parser)
+    parser.add_argument('--locate-dops', action='store_true', help='Search all Pools of the project for DOPs which are missing from the layer data maps (the MCD Kernel fails to load them)')
+    parser.add_argument('--shared-structures', action='store_true', help='Write each distinct MWB STRUCTURE once per BASE-VARIANT (in "{}"), the MWB files only reference it by hash'.format(mwb_structures_file_name))
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dump several kinds of definitions (ECU-VARIANT patterns, DTCs, MWBs, Codings, Adaptations, Freeze Frames) in a single pass over each BASE-VARIANT')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # All ECU-VARIANTs in a BASE-VARIANT of a project
+    parser_basevariant = subparsers.add_parser('basevariant', help='Dump definitions for all ECU-VARIANTs in a BASE-VARIANT')
+    parser_basevariant.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    parser_basevariant.add_argument('base_variant_filename', help='Filename of BASE-VARIANT (.bv.db file)')
+    parser_basevariant.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for the project and BASE-VARIANT')
+    add_common_arguments(parser_basevariant)
+    parser_basevariant.set_defaults(func=dumpDefinitions_basevariant)
+    
+    # All ECU-VARIANTs in all BASE-VARIANTs of a project
+    parser_project = subparsers.add_parser('project', help='Dump definitions for all ECU-VARIANTs in all BASE-VARIANTs of a project')
+    parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for the project and each BASE-VARIANT')
+    add_common_arguments(parser_project)
+    parser_project.set_defaults(func=dumpDefinitions_project)
+    
+    # All ECU-VARIANTs in all BASE-VARIANTs of all projects
+    parser_all_projects = subparsers.add_parser('projects', help='Dump definitions for all ECU-VARIANTs in all BASE-VARIANTs of all projects')
+    parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
+    parser_all_projects.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for each project')
+    add_common_arguments(parser_all_projects)
+    parser_all_projects.set_defaults(func=dumpDefinitions_projects)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command') + DumpWriter.argument_names}
+    args.func(dump_writer=DumpWriter.from_arguments(args), **filtered_args)
@@ -8,6 +8,7 @@ from common_utils import enum_converters, object_printer
 from classes.PblRecordManager import PblRecordManager
 from classes.StringStorage import StringStorage
 from classes.ObjectLoader import ObjectLoader
+from classes.DumpWriter import DumpWriter
 
 from dumpMWB import get_ecu_variant_map, get_protocol_layer_data_list
 
@@ -18,7 +19,11 @@ pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
 pbl_record_manager = PblRecordManager(pbl_dll_path)
 
 
-def dump_patterns_for_base_variant(object_loader, project_folder_path, base_variant_filename, output_folder_path, overwrite = False, debug_info_indentation_level = 0):
+def dump_patterns_for_base_variant(object_loader, project_folder_path, base_variant_filename, output_folder_path, overwrite = False, debug_info_indentation_level = 0, dump_writer = None):
+    # By default, write uncompressed text files
+    if dump_writer is None:
+        dump_writer = DumpWriter()
+    
     # The PoolID simply refers to the file's name (without extension)
     pool_id = base_variant_filename
     if base_variant_filename.endswith('.db'):
@@ -54,10 +59,13 @@ def dump_patterns_for_base_variant(object_loader, project_folder_path, base_vari
         # The .c extension is only used for highlighting and block folding in a code editor
         ecu_variant_output_file_path = os.path.join(base_variant_output_folder_path, 'PAT_' + ecu_variant_name + '.c')
         
-        # Only dump the patterns if the file doesn't already exist (or if overwriting is allowed)
-        if not overwrite and (os.path.exists(ecu_variant_output_file_path) and os.path.isfile(ecu_variant_output_file_path)):
+        # Only dump the patterns if the file isn't already up to date (or if overwriting is allowed)
+        if not overwrite and dump_writer.is_done(ecu_variant_output_file_path):
             object_printer.print_indented(debug_info_indentation_level + 1, 'Already done, skipping')
         else:
+            # Keep track of the Pools used for this output, so it can be redone when one of them changes
+            object_loader.reset_accessed_pool_ids()
+            
             # Load the ECU-VARIANT object by its reference
             ecu_variant = object_loader.load_object_by_reference(project_folder_path, ecu_variant_map[ecu_variant_name])
             
@@ -121,12 +129,15 @@ def dump_patterns_for_base_variant(object_loader, project_folder_path, base_vari
                 os.makedirs(base_variant_output_folder_path)
             
             # Dump to the output file
-            with open(ecu_variant_output_file_path, 'w', encoding='utf-8') as ecu_variant_output_file:
+            with dump_writer.open(ecu_variant_output_file_path) as ecu_variant_output_file:
                 object_printer.print_object(output_object, '\'{}\''.format(ecu_variant['ecu']['short_name']), 0, ecu_variant_output_file)
                 object_printer.print_indented(0, '', ecu_variant_output_file)
+            
+            # Remember which input files the output was made from (the BASE-VARIANT's project data was loaded before the tracking started)
+            dump_writer.record(ecu_variant_output_file_path, project_folder_path, object_loader.get_accessed_pool_ids() | {pool_id})
 
 
-def dump_patterns_for_all_base_variants_in_project(object_loader, project_folder_path, output_folder_path, overwrite = False, debug_info_indentation_level = 0):
+def dump_patterns_for_all_base_variants_in_project(object_loader, project_folder_path, output_folder_path, overwrite = False, debug_info_indentation_level = 0, dump_writer = None):
     # Go through each file (Pool) in the project folder
     for current_filename in os.listdir(project_folder_path):
         # The PoolID simply refers to the file's name (without extension)
@@ -145,10 +156,10 @@ def dump_patterns_for_all_base_variants_in_project(object_loader, project_folder
         object_printer.print_indented(debug_info_indentation_level, 'Dumping {}'.format(PoolID))
         
         # Dump the patterns with the other function
-        dump_patterns_for_base_variant(object_loader, project_folder_path, PoolID, output_folder_path, overwrite, debug_info_indentation_level + 1)
+        dump_patterns_for_base_variant(object_loader, project_folder_path, PoolID, output_folder_path, overwrite, debug_info_indentation_level + 1, dump_writer)
 
 
-def dump_patterns_for_all_base_variants_in_all_projects(project_folder_path, output_folder_path, debug_info_indentation_level = 0):
+def dump_patterns_for_all_base_variants_in_all_projects(project_folder_path, output_folder_path, debug_info_indentation_level = 0, dump_writer = None):
     # Go through each project in the folder
     for project_name in os.listdir(project_folder_path):
         project_path = os.path.join(project_folder_path, project_name)
@@ -188,10 +199,10 @@ def dump_patterns_for_all_base_variants_in_all_projects(project_folder_path, out
             os.makedirs(project_output_folder_path)
         
         # Dump the project's patterns with the other function
-        dump_patterns_for_all_base_variants_in_project(object_loader, project_path, project_output_folder_path, False, debug_info_indentation_level + 1)
+        dump_patterns_for_all_base_variants_in_project(object_loader, project_path, project_output_folder_path, False, debug_info_indentation_level + 1, dump_writer)
 
 
-def dumpECUVariantPatterns_basevariant(project_folder_path, base_variant_filename, output_folder_path):
+def dumpECUVariantPatterns_basevariant(project_folder_path, base_variant_filename, output_folder_path, dump_writer = None):
     if not os.path.isdir(project_folder_path):
         raise RuntimeError('Project must be folder')
     
@@ -215,10 +226,10 @@ def dumpECUVariantPatterns_basevariant(project_folder_path, base_variant_filenam
     object_loader = ObjectLoader(pbl_record_manager, string_storage)
     
     # Run the app
-    dump_patterns_for_base_variant(object_loader, project_folder_path, base_variant_filename, project_output_folder_path, True)
+    dump_patterns_for_base_variant(object_loader, project_folder_path, base_variant_filename, project_output_folder_path, True, 0, dump_writer)
 
 
-def dumpECUVariantPatterns_project(project_folder_path, output_folder_path):
+def dumpECUVariantPatterns_project(project_folder_path, output_folder_path, dump_writer = None):
     if not os.path.isdir(project_folder_path):
         raise RuntimeError('Project must be folder')
     
@@ -254,7 +265,7 @@ def dumpECUVariantPatterns_project(project_folder_path, output_folder_path):
     # Run the app
     # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
     try:
-        dump_patterns_for_all_base_variants_in_project(object_loader, project_folder_path, project_output_folder_path)
+        dump_patterns_for_all_base_variants_in_project(object_loader, project_folder_path, project_output_folder_path, False, 0, dump_writer)
     except:
         print('Error:\n{}'.format(traceback.format_exc()))
     
@@ -267,7 +278,7 @@ def dumpECUVariantPatterns_project(project_folder_path, output_folder_path):
     print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
 
 
-def dumpECUVariantPatterns_projects(projects_folder_path, output_folder_path):
+def dumpECUVariantPatterns_projects(projects_folder_path, output_folder_path, dump_writer = None):
     if not os.path.isdir(projects_folder_path):
         raise RuntimeError('Must provide folder to all projects')
     
@@ -281,7 +292,7 @@ def dumpECUVariantPatterns_projects(projects_folder_path, output_folder_path):
     # Run the app
     # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
     try:
-        dump_patterns_for_all_base_variants_in_all_projects(projects_folder_path, output_folder_path)
+        dump_patterns_for_all_base_variants_in_all_projects(projects_folder_path, output_folder_path, 0, dump_writer)
     except:
         print('Error:\n{}'.format(traceback.format_exc()))
     
@@ -304,21 +315,24 @@ if __name__ == '__main__':
     parser_basevariant.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
     parser_basevariant.add_argument('base_variant_filename', help='Filename of BASE-VARIANT (.bv.db file)')
     parser_basevariant.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for the project and BASE-VARIANT')
+    DumpWriter.add_arguments(parser_basevariant)
     parser_basevariant.set_defaults(func=dumpECUVariantPatterns_basevariant)
     
     # All matching patterns from all ECU-VARIANTs in all BASE-VARIANTs of a project
     parser_project = subparsers.add_parser('project', help='Dump matching patterns for all ECU-VARIANTs in all BASE-VARIANTs of a project')
     parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
     parser_project.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for the project and each BASE-VARIANT')
+    DumpWriter.add_arguments(parser_project)
     parser_project.set_defaults(func=dumpECUVariantPatterns_project)
     
     # All matching patterns from all ECU-VARIANTs in all BASE-VARIANTs of all projects
     parser_all_projects = subparsers.add_parser('projects', help='Dump matching patterns for all ECU-VARIANTs in all BASE-VARIANTs of all projects')
     parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
     parser_all_projects.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for each project')
+    DumpWriter.add_arguments(parser_all_projects)
     parser_all_projects.set_defaults(func=dumpECUVariantPatterns_projects)
     
     # Parse the provided arguments and call the appropriate function based on the command
     args = parser.parse_args()
-    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
-    args.func(**filtered_args)
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command') + DumpWriter.argument_names}
+    args.func(dump_writer=DumpWriter.from_arguments(args), **filtered_args)
@@ -4,10 +4,13 @@ import sys
 import time
 import traceback
 
-from common_utils import enum_converters, object_printer
+from common_utils import enum_converters, object_printer, object_hasher
 from classes.PblRecordManager import PblRecordManager
 from classes.StringStorage import StringStorage
 from classes.ObjectLoader import ObjectLoader
+from classes.DumpWriter import DumpWriter
+from classes.ObjectLocator import ObjectLocator
+from classes.ParsedDopCache import ParsedDopCache
 
 
 # PBL is needed for parsing .key files, which will be done by the PblRecordManager class
@@ -16,6 +19,14 @@ pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
 pbl_record_manager = PblRecordManager(pbl_dll_path)
 
 
+# Referenced DOPs which were already parsed, shared by all dumpers in this process (see ParsedDopCache)
+parsed_dop_cache = ParsedDopCache()
+
+
+# Name of the file with the STRUCTUREs shared by all variants of a BASE-VARIANT (see `shared_structures` in dump_mwbs_for_base_variant)
+mwb_structures_file_name = 'MWB_STRUCTURES.c'
+
+
 # Get a list of "layer data" objects necessary for resolving DOP references with the UDS protocol, in order of relevance
 ### object_loader       = instance of ObjectLoader, with StringStorage instance loaded from the target project
 ### project_folder_path = project path (folder with .db and .key files)
@@ -37,6 +48,20 @@ def get_protocol_layer_data_list(object_loader, project_folder_path):
     return protocol_layer_data_list
 
 
+# Get the PoolID of each protocol "layer data" object, in the same order
+### protocol_layer_data_list = list returned by get_protocol_layer_data_list
+def get_protocol_layer_pool_ids(protocol_layer_data_list):
+    # The UDS protocol's layer data is the second to last in the list, and references the parent layers
+    uds_protocol_layer_data = protocol_layer_data_list[-2]
+    return list(uds_protocol_layer_data['parent_layers_vector']) + ['0.0.0@PR_UDSOnCAN.pr', '0.0.0@PR_OBDOnCAN.pr']
+
+
+# Get the PoolIDs of all Pools which the protocol "layer data" objects were loaded from
+### protocol_layer_data_list = list returned by get_protocol_layer_data_list
+def get_protocol_pool_ids(protocol_layer_data_list):
+    return set(get_protocol_layer_pool_ids(protocol_layer_data_list))
+
+
 # Convert a list of coefficients to a polynomial
 ### coefficients = list of coefficients for each term
 def polynomial_to_string(coefficients):
@@ -68,7 +93,32 @@ def polynomial_to_string(coefficients):
     return ' + '.join(terms) or '0'
 
 
+# Parse a DOP by its reference, reusing the result if the same DOP was already parsed
+### object_loader       = instance of ObjectLoader, with StringStorage instance loaded from the target project
+### layer_data_objects  = list or "layer data" objects, used for solving references which don't specify the PoolID (file name)
+### project_folder_path = project path (folder with .db and .key files)
+### PoolID              = name of the DOP's Pool
+### ObjectID            = name of the DOP
+### check_dop           = function called with the loaded DOP before parsing it (e.g. to check its type), None = no check
+def parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, PoolID, ObjectID, check_dop = None):
+    parsed_dop = parsed_dop_cache.get(object_loader, layer_data_objects, project_folder_path, PoolID, ObjectID)
+    if parsed_dop is None:
+        dop = object_loader.load_object_by_id(project_folder_path, PoolID, ObjectID)
+        if check_dop is not None:
+            check_dop(dop)
+        parsed_dop = parsed_dop_cache.parse(object_loader, layer_data_objects, project_folder_path, PoolID, ObjectID, lambda: parse_dop(object_loader, layer_data_objects, project_folder_path, dop))
+    return parsed_dop
+
+
+# Make sure a loaded DOP is a BASIC-STRUCTURE
+### struct_dop = loaded DOP
+def check_basic_structure(struct_dop):
+    if struct_dop['#OBJECT_TYPE'] != 'MCD_DB_PARAMETER_STRUCTURE':
+        raise RuntimeError('Object is not BASIC-STRUCTURE: {}'.format(struct_dop['#OBJECT_TYPE']))
+
+
 # Parse an object, returning a dictionary with its important fields
+# Referenced DOPs are parsed only once (see ParsedDopCache), so the returned dictionary may share parts with other results and must not be modified
 ### object_loader       = instance of ObjectLoader, with StringStorage instance loaded from the target project
 ### layer_data_objects  = list or "layer data" objects, used for solving references which don't specify the PoolID (file name)
 ### project_folder_path = project path (folder with .db and .key files)
@@ -120,8 +170,12 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
                     
                     # The referenced DOP might be missing the PoolID
                     # The following function will try to find it using the DOP reference maps found in the database's LayerData
+                    # If it was already parsed for the same references, it doesn't have to be loaded again
                     try:
-                        parameter_dop = object_loader.load_DOP_by_reference_without_PoolID(project_folder_path, layer_data_objects, dop['db_object_ref'])
+                        (parameter_dop_PoolID, parameter_dop_ObjectID) = parsed_dop_cache.resolve_reference(object_loader, layer_data_objects, dop['db_object_ref'])
+                        output_object['dop'] = parsed_dop_cache.get(object_loader, layer_data_objects, project_folder_path, parameter_dop_PoolID, parameter_dop_ObjectID)
+                        if output_object['dop'] is None:
+                            parameter_dop = object_loader.load_object_by_id(project_folder_path, parameter_dop_PoolID, parameter_dop_ObjectID)
                     
                     # If not found (error in project), mimic the MCD error that is thrown on projects with this sort of problem
                     except:
@@ -130,7 +184,8 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
                     # The DOP is usually found
                     else:
                         # Add the referenced DOP to the object
-                        output_object['dop'] = parse_dop(object_loader, layer_data_objects, project_folder_path, parameter_dop)
+                        if output_object['dop'] is None:
+                            output_object['dop'] = parsed_dop_cache.parse(object_loader, layer_data_objects, project_folder_path, parameter_dop_PoolID, parameter_dop_ObjectID, lambda: parse_dop(object_loader, layer_data_objects, project_folder_path, parameter_dop))
                 
                 # RESERVED parameter: MCD-2D V2.2 - page 78, paragraph 2
                 case 'eRESERVED':
@@ -212,10 +267,10 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
                     
                     # The referenced DOP might be missing the PoolID
                     # The following function will try to find it using the DOP reference maps found in the database's LayerData
-                    parameter_dop = object_loader.load_DOP_by_reference_without_PoolID(project_folder_path, layer_data_objects, dop['db_object_ref'])
+                    (parameter_dop_PoolID, parameter_dop_ObjectID) = parsed_dop_cache.resolve_reference(object_loader, layer_data_objects, dop['db_object_ref'])
                     
                     # Add the referenced DOP to the object
-                    output_object['dop'] = parse_dop(object_loader, layer_data_objects, project_folder_path, parameter_dop)
+                    output_object['dop'] = parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, parameter_dop_PoolID, parameter_dop_ObjectID)
                 
                 # SYSTEM parameter: MCD-2D V2.2 - page 80, paragraph 1
                 case 'eSYSTEM':
@@ -230,10 +285,10 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
                         raise RuntimeError('SYSTEM parameter has default')
                     
                     # The value received by the D-server is a physical value and shall be coded using the referenced DOP
-                    parameter_dop = object_loader.load_DOP_by_reference_without_PoolID(project_folder_path, layer_data_objects, dop['db_object_ref'])
+                    (parameter_dop_PoolID, parameter_dop_ObjectID) = parsed_dop_cache.resolve_reference(object_loader, layer_data_objects, dop['db_object_ref'])
                     
                     # Add the referenced DOP to the object
-                    output_object['dop'] = parse_dop(object_loader, layer_data_objects, project_folder_path, parameter_dop)
+                    output_object['dop'] = parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, parameter_dop_PoolID, parameter_dop_ObjectID)
                 
                 case _:
                     object_printer.print_indented(0, '') 
@@ -1078,10 +1133,7 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
             output_object['item_byte_size'] = dop['item_byte_size']
             
             # The reference to the BASIC-STRUCTURE defines the complex DOP to be repeatedly applied
-            struct_dop = object_loader.load_object_by_reference(project_folder_path, dop['structure_ref']) # MCD_DB_PARAMETER_STRUCTURE
-            if struct_dop['#OBJECT_TYPE'] != 'MCD_DB_PARAMETER_STRUCTURE':
-                raise RuntimeError('Object is not BASIC-STRUCTURE: {}'.format(struct_dop['#OBJECT_TYPE']))
-            output_object['structure'] = parse_dop(object_loader, layer_data_objects, project_folder_path, struct_dop)
+            output_object['structure'] = parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, *ObjectLoader.decode_object_reference(dop['structure_ref']), check_dop=check_basic_structure) # MCD_DB_PARAMETER_STRUCTURE
         
         # Dynamic length field: MCD-2D V2.2 - 7.3.6.10.4
         case 'MCD_DB_PARAMETER_DYNAMIC_LENGTH_FIELD':
@@ -1090,8 +1142,8 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
             
             # The determination of the number of repetitions is described by DETERMINE-NUMBER-OF-ITEMS
             # The DATA-OBJECT-PROP referenced to is used to calculate the repetition number
-            determine_number_of_items_dop = object_loader.load_object_by_reference(project_folder_path, dop['determine_number_of_items_dop_ref']) # DB_DOP_SIMPLE_BASE
-            output_object['determine_number_of_items'] = parse_dop(object_loader, layer_data_objects, project_folder_path, determine_number_of_items_dop)
+            # The parsed DOP may be shared with other references to it, so it's copied before adding the positions of this reference
+            output_object['determine_number_of_items'] = dict(parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, *ObjectLoader.decode_object_reference(dop['determine_number_of_items_dop_ref']))) # DB_DOP_SIMPLE_BASE
             
             # The repetition number is contained in its physical value of type A_UINT32
             if output_object['determine_number_of_items']['physical_base_data_type'] != 'A_UINT32':
@@ -1109,10 +1161,7 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
             # Each further item starts at the byte edge following the item before
             
             # The reference to the BASIC-STRUCTURE defines the COMPLEX-DOP to be repeatedly applied
-            struct_dop = object_loader.load_object_by_reference(project_folder_path, dop['structure_ref']) # MCD_DB_PARAMETER_STRUCTURE
-            if struct_dop['#OBJECT_TYPE'] != 'MCD_DB_PARAMETER_STRUCTURE':
-                raise RuntimeError('Object is not BASIC-STRUCTURE: {}'.format(struct_dop['#OBJECT_TYPE']))
-            output_object['structure'] = parse_dop(object_loader, layer_data_objects, project_folder_path, struct_dop)
+            output_object['structure'] = parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, *ObjectLoader.decode_object_reference(dop['structure_ref']), check_dop=check_basic_structure) # MCD_DB_PARAMETER_STRUCTURE
         
         # Dynamic Endmarker Field: MCD-2D V2.2 - 7.3.6.10.5
         case 'MCD_DB_PARAMETER_DYNAMIC_ENDMARKER_FIELD':
@@ -1123,8 +1172,7 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
             # Before each iteration step, the end of PDU condition is tested
             # If the end of PDU is reached, then the processing of the iteration stops immediately
             # Otherwise, the referenced DATA-OBJECT-PROP is used to calculate a physical value of the parameter at the current position in the PDU
-            determine_termination_parameter_dop = object_loader.load_object_by_reference(project_folder_path, dop['dop_base_ref']) # DB_DOP_SIMPLE_BASE
-            output_object['determine_termination_parameter'] = parse_dop(object_loader, layer_data_objects, project_folder_path, determine_termination_parameter_dop)
+            output_object['determine_termination_parameter'] = parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, *ObjectLoader.decode_object_reference(dop['dop_base_ref'])) # DB_DOP_SIMPLE_BASE
             
             # If the resulting physical value matches the TERMINATION-VALUE (inside DATA-OBJECT-PROP-REF), the field ends without any additional item
             # Therefore, the value inside the TERMINATION-VALUE shall be given in the physical type of this referenced DATA-OBJECT-PROP
@@ -1138,10 +1186,7 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
             # If the interpretation of the ENDMARKER bytes is not desired, they can be skipped with a RESERVED parameter
             
             # The reference to the BASIC-STRUCTURE defines the complex DOP to be repeatedly applied
-            struct_dop = object_loader.load_object_by_reference(project_folder_path, dop['structure_ref']) # MCD_DB_PARAMETER_STRUCTURE
-            if struct_dop['#OBJECT_TYPE'] != 'MCD_DB_PARAMETER_STRUCTURE':
-                raise RuntimeError('Object is not BASIC-STRUCTURE: {}'.format(struct_dop['#OBJECT_TYPE']))
-            output_object['structure'] = parse_dop(object_loader, layer_data_objects, project_folder_path, struct_dop)
+            output_object['structure'] = parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, *ObjectLoader.decode_object_reference(dop['structure_ref']), check_dop=check_basic_structure) # MCD_DB_PARAMETER_STRUCTURE
         
         # End of PDU field: MCD-2D V2.2 - 7.3.6.10.6
         case 'MCD_DB_PARAMETER_END_OF_PDU_FIELD':
@@ -1152,10 +1197,7 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
             # Each further item starts at the byte edge following the item before
             
             # The reference to the BASIC-STRUCTURE defines the COMPLEX-DOP to be repeatedly applied
-            struct_dop = object_loader.load_object_by_reference(project_folder_path, dop['structure_ref']) # MCD_DB_PARAMETER_STRUCTURE
-            if struct_dop['#OBJECT_TYPE'] != 'MCD_DB_PARAMETER_STRUCTURE':
-                raise RuntimeError('Object is not BASIC-STRUCTURE: {}'.format(struct_dop['#OBJECT_TYPE']))
-            output_object['structure'] = parse_dop(object_loader, layer_data_objects, project_folder_path, struct_dop)
+            output_object['structure'] = parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, *ObjectLoader.decode_object_reference(dop['structure_ref']), check_dop=check_basic_structure) # MCD_DB_PARAMETER_STRUCTURE
         
         # Multiplexer: MCD-2D V2.2 - 7.3.6.10.7
         case 'MCD_DB_PARAMETER_MULTIPLEXER':
@@ -1167,8 +1209,8 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
             
             # The determination of the actual switch-key is described inside SWITCH-KEY
             # The DATA-OBJECT-PROP referenced to is used to calculate the switch-key, which is contained in its physical value
-            switch_key_dop = object_loader.load_object_by_reference(project_folder_path, dop['switch_key']['dop_base_ref']) # DB_DOP_SIMPLE_BASE
-            output_object['switch_key'] = parse_dop(object_loader, layer_data_objects, project_folder_path, switch_key_dop)
+            # The parsed DOP may be shared with other references to it, so it's copied before adding the positions of this reference
+            output_object['switch_key'] = dict(parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, *ObjectLoader.decode_object_reference(dop['switch_key']['dop_base_ref']))) # DB_DOP_SIMPLE_BASE
             
             # Its BYTE-POSITION is relative to the that of the MUX
             output_object['switch_key']['byte_position'] = dop['switch_key']['byte_position']
@@ -1207,10 +1249,7 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
                 # If a matching CASE is found, the referenced STRUCTURE is analyzed at the BYTE-POSITION (child element of MUX), relatively to the byte position of the MUX
                 
                 # Add the referenced STRUCTURE's fields to the CASE object
-                struct_dop = object_loader.load_object_by_reference(project_folder_path, case['structure_dop_ref']) # MCD_DB_PARAMETER_STRUCTURE
-                if struct_dop['#OBJECT_TYPE'] != 'MCD_DB_PARAMETER_STRUCTURE':
-                    raise RuntimeError('Object is not BASIC-STRUCTURE: {}'.format(struct_dop['#OBJECT_TYPE']))
-                case_output_object['structure'] = parse_dop(object_loader, layer_data_objects, project_folder_path, struct_dop)
+                case_output_object['structure'] = parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, *ObjectLoader.decode_object_reference(case['structure_dop_ref']), check_dop=check_basic_structure) # MCD_DB_PARAMETER_STRUCTURE
                 
                 # Add the CASE to the list of CASES
                 output_object['cases'].append(case_output_object)
@@ -1228,10 +1267,7 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
                     raise RuntimeError('DEFAULT-CASE has DESCRIPTION: {}'.format(dop['default_case']['description']))
                 
                 # Add the referenced STRUCTURE's fields to the DEFAULT-CASE object
-                struct_dop = object_loader.load_object_by_reference(project_folder_path, dop['default_case']['structure_dop_ref']) # MCD_DB_PARAMETER_STRUCTURE
-                if struct_dop['#OBJECT_TYPE'] != 'MCD_DB_PARAMETER_STRUCTURE':
-                    raise RuntimeError('Object is not BASIC-STRUCTURE: {}'.format(struct_dop['#OBJECT_TYPE']))
-                output_object['default_case']['structure'] = parse_dop(object_loader, layer_data_objects, project_folder_path, struct_dop)
+                output_object['default_case']['structure'] = parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, *ObjectLoader.decode_object_reference(dop['default_case']['structure_dop_ref']), check_dop=check_basic_structure) # MCD_DB_PARAMETER_STRUCTURE
         
         # Some MWBs are able to include a DTC as one of the parameters in their structure
         case 'DB_DOP_DTC':
@@ -1320,8 +1356,7 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
                 raise RuntimeError('Expected TABLE, not {}'.format(table['#OBJECT_TYPE']))
             
             # Load and parse the DOP that extracts the TABLE-KEY's value
-            table_key_dop = object_loader.load_object_by_reference(project_folder_path, table['dop_simple_ref'])
-            table_key_parsed_dop = parse_dop(object_loader, layer_data_objects, project_folder_path, table_key_dop)
+            table_key_parsed_dop = parse_dop_by_id(object_loader, layer_data_objects, project_folder_path, *ObjectLoader.decode_object_reference(table['dop_simple_ref']))
             
             # I expect a table key to always convert a simple unsigned integer to a unicode string
             if table_key_parsed_dop['coded_base_data_type'] != 'A_UINT32':
@@ -1381,18 +1416,22 @@ def parse_dop(object_loader, layer_data_objects, project_folder_path, dop):
             # Store each table row
             output_object['table_rows'] = []
             for table_key_map_entry in table['table_key_map']:
-                # Load the table row
-                table_entry = object_loader.load_object_by_reference(project_folder_path, table_key_map_entry['reference'])
-                if table_entry['#OBJECT_TYPE'] != 'MCD_DB_TABLE_PARAMETER':
-                    raise RuntimeError('Expected MCD_DB_TABLE_PARAMETER, not {}'.format(table_entry['#OBJECT_TYPE']))
-                
-                # Get the table row parameter
-                table_entry_parameter = table_entry['parameter']
-                if table_entry_parameter['#OBJECT_TYPE'] != 'MCD_DB_PARAMETER':
-                    raise RuntimeError('Expected MCD_DB_PARAMETER, not {}'.format(table_entry_parameter['#OBJECT_TYPE']))
-                
-                # Parse the table row parameter
-                table_row_output_object = parse_dop(object_loader, layer_data_objects, project_folder_path, table_entry_parameter)
+                # If the table row was already parsed for the same references, it doesn't have to be loaded again
+                (table_entry_PoolID, table_entry_ObjectID) = ObjectLoader.decode_object_reference(table_key_map_entry['reference'])
+                table_row_output_object = parsed_dop_cache.get(object_loader, layer_data_objects, project_folder_path, table_entry_PoolID, table_entry_ObjectID)
+                if table_row_output_object is None:
+                    # Load the table row
+                    table_entry = object_loader.load_object_by_id(project_folder_path, table_entry_PoolID, table_entry_ObjectID)
+                    if table_entry['#OBJECT_TYPE'] != 'MCD_DB_TABLE_PARAMETER':
+                        raise RuntimeError('Expected MCD_DB_TABLE_PARAMETER, not {}'.format(table_entry['#OBJECT_TYPE']))
+                    
+                    # Get the table row parameter
+                    table_entry_parameter = table_entry['parameter']
+                    if table_entry_parameter['#OBJECT_TYPE'] != 'MCD_DB_PARAMETER':
+                        raise RuntimeError('Expected MCD_DB_PARAMETER, not {}'.format(table_entry_parameter['#OBJECT_TYPE']))
+                    
+                    # Parse the table row parameter
+                    table_row_output_object = parsed_dop_cache.parse(object_loader, layer_data_objects, project_folder_path, table_entry_PoolID, table_entry_ObjectID, lambda: parse_dop(object_loader, layer_data_objects, project_folder_path, table_entry_parameter))
                 
                 # The LONG-NAME of the parsed object should be the same as the key from the map
                 # So, the TABLE-KEY's (physical) value will be searched in the LONG-NAME of each table row
@@ -1443,11 +1482,7 @@ def get_ecu_variant_layer_data(object_loader, project_folder_path, ecu_variant_r
 # Get the table (and its keys) necessary for MWBs
 def get_mwb_keys_and_table(object_loader, layer_data_objects, project_folder_path, ecu_variant_layer_data):
     # Search for the DIAG-COMM reference with name 'DiagnServi_ReadDataByIdentMeasuValue' (might not exist)
-    diag_com_ref_RDBI = None
-    for diag_com_ref in ecu_variant_layer_data['diag_com_refs']:
-        if diag_com_ref['map_key'] == 'DiagnServi_ReadDataByIdentMeasuValue':
-            diag_com_ref_RDBI = diag_com_ref
-            break
+    diag_com_ref_RDBI = object_loader.get_layer_data_index(ecu_variant_layer_data).get_entry('diag_com_refs', 'DiagnServi_ReadDataByIdentMeasuValue')
     
     # Return None for ECU-VARIANTs which do not have the MWB service defined
     if diag_com_ref_RDBI is None:
@@ -1540,7 +1575,11 @@ def get_mwb_structure(object_loader, project_folder_path, mwb_table_row_paramete
     return mwb_table_row_parameter['dop']
 
 
-def dump_mwbs_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, output_folder_path, overwrite = False, debug_info_indentation_level = 0):
+def dump_mwbs_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, output_folder_path, overwrite = False, debug_info_indentation_level = 0, dump_writer = None, shared_structures = False):
+    # By default, write uncompressed text files
+    if dump_writer is None:
+        dump_writer = DumpWriter()
+    
     # The PoolID simply refers to the file's name (without extension)
     pool_id = base_variant_filename
     if base_variant_filename.endswith('.db'):
@@ -1564,6 +1603,34 @@ def dump_mwbs_for_base_variant(object_loader, protocol_layer_data_list, project_
     # The output folder will be named like the BASE-VARIANT
     base_variant_output_folder_path = os.path.join(output_folder_path, base_variant_name)
     
+    # With shared structures, each distinct STRUCTURE is written once into a file shared by all variants, and the variant files only contain its hash
+    # The mode is recorded with each file (along with the loading options), so files made in another mode are never taken as done
+    structures_output_file_path = os.path.join(base_variant_output_folder_path, mwb_structures_file_name)
+    output_options = object_loader.get_output_options() + (['shared-structures'] if shared_structures else [])
+    if shared_structures:
+        # The shared file is written last, so if it's up to date, the variant files were made in the same pass and are up to date too
+        # Otherwise, all variants are dumped again, since the shared file must contain the structures of all of them
+        if not overwrite and dump_writer.is_done(structures_output_file_path, output_options):
+            object_printer.print_indented(debug_info_indentation_level, 'Already done, skipping')
+            return
+        overwrite = True
+        
+        # Distinct structures keyed by hash, in the order they were found, and the Pools they were made from
+        shared_structure_map = {}
+        shared_structure_pool_ids = set()
+        
+        # Parsed DOPs are reused, so the same STRUCTURE object is usually only hashed once
+        # The hashes are keyed by the object's id, and the object is kept so its id can't be reused
+        structure_hashes = {}
+        
+        # The variant files are only recorded after the shared file, since they can't be used without it
+        pending_records = []
+    
+    # Without shared structures, variant files written with them (which only contain hashes) must not be kept
+    # The shared file is only removed once all variants were dumped again, so an interrupted run still redoes them
+    elif os.path.isfile(dump_writer.get_output_file_path(structures_output_file_path)):
+        overwrite = True
+    
     # Load the layer data for the BASE-VARIANT, which is contained in the current file
     base_variant_layer_data = object_loader.load_object_by_id(project_folder_path, pool_id, '#RtGen_DB_LAYER_DATA')
     
@@ -1586,10 +1653,13 @@ def dump_mwbs_for_base_variant(object_loader, protocol_layer_data_list, project_
         # The .c extension is only used for highlighting and block folding in a code editor
         ecu_variant_output_file_path = os.path.join(base_variant_output_folder_path, 'MWB_' + ecu_variant_name + '.c')
         
-        # Only dump the MWBs if the file doesn't already exist (or if overwriting is allowed)
-        if not overwrite and (os.path.exists(ecu_variant_output_file_path) and os.path.isfile(ecu_variant_output_file_path)):
+        # Only dump the MWBs if the file isn't already up to date (or if overwriting is allowed)
+        if not overwrite and dump_writer.is_done(ecu_variant_output_file_path, output_options):
             object_printer.print_indented(debug_info_indentation_level + 1, 'Already done, skipping')
         else:
+            # Keep track of the Pools used for this output, so it can be redone when one of them changes
+            object_loader.reset_accessed_pool_ids()
+            
             # The layer data will be needed for getting a list of all MWBs and also for solving some references
             
             # If parsing the BASE-VARIANT, its layer data was retrieved previously
@@ -1618,7 +1688,7 @@ def dump_mwbs_for_base_variant(object_loader, protocol_layer_data_list, project_
                 os.makedirs(base_variant_output_folder_path)
             
             # Open the output file and dump the MWBs
-            with open(ecu_variant_output_file_path, 'w', encoding='utf-8') as ecu_variant_output_file:
+            with dump_writer.open(ecu_variant_output_file_path) as ecu_variant_output_file:
                 for mwb_did in mwb_keys:
                     # Get the definition for the current DID
                     table_row_result = get_mwb_name_and_table_row_parameter_by_did(object_loader, project_folder_path, mwb_keys, mwb_table, mwb_did)
@@ -1645,12 +1715,42 @@ def dump_mwbs_for_base_variant(object_loader, protocol_layer_data_list, project_
                         'structure': mwb_structure
                     }
                     
+                    # Only reference the STRUCTURE by its hash, if it's written to the shared file
+                    if shared_structures:
+                        if id(mwb_structure) not in structure_hashes:
+                            structure_hashes[id(mwb_structure)] = (mwb_structure, object_hasher.get_object_hash(mwb_structure))
+                        structure_hash = structure_hashes[id(mwb_structure)][1]
+                        shared_structure_map.setdefault(structure_hash, mwb_structure)
+                        obj['structure'] = structure_hash
+                    
                     # Dump to the output file
                     object_printer.print_object(obj, '0x{:04X}: {} - {}'.format(mwb_did, mwb_long_name_id, mwb_long_name), 0, ecu_variant_output_file, False)
                     object_printer.print_indented(0, '', ecu_variant_output_file)
+            
+            # Remember which input files the output was made from (the BASE-VARIANT and protocol layer data were loaded before the tracking started)
+            if shared_structures:
+                pending_records.append((ecu_variant_output_file_path, object_loader.get_accessed_pool_ids() | {pool_id} | get_protocol_pool_ids(protocol_layer_data_list)))
+                shared_structure_pool_ids |= object_loader.get_accessed_pool_ids()
+            else:
+                dump_writer.record(ecu_variant_output_file_path, project_folder_path, object_loader.get_accessed_pool_ids() | {pool_id} | get_protocol_pool_ids(protocol_layer_data_list), output_options)
+    
+    # Write each distinct STRUCTURE once, named by its hash
+    # The file is also written (empty) if no variant has MWBs, since it marks the BASE-VARIANT as done
+    if shared_structures:
+        if not os.path.isdir(base_variant_output_folder_path):
+            os.makedirs(base_variant_output_folder_path)
+        with dump_writer.open(structures_output_file_path) as structures_output_file:
+            for structure_hash, mwb_structure in shared_structure_map.items():
+                object_printer.print_object(mwb_structure, 'STRUCTURE {}'.format(structure_hash), 0, structures_output_file, False)
+                object_printer.print_indented(0, '', structures_output_file)
+        dump_writer.record(structures_output_file_path, project_folder_path, shared_structure_pool_ids | {pool_id} | get_protocol_pool_ids(protocol_layer_data_list), output_options)
+        for (ecu_variant_output_file_path, ecu_variant_pool_ids) in pending_records:
+            dump_writer.record(ecu_variant_output_file_path, project_folder_path, ecu_variant_pool_ids, output_options)
+    elif os.path.isfile(dump_writer.get_output_file_path(structures_output_file_path)):
+        os.remove(dump_writer.get_output_file_path(structures_output_file_path))
 
 
-def dump_mwbs_for_all_base_variants_in_project(object_loader, protocol_layer_data, project_folder_path, output_folder_path, overwrite = False, debug_info_indentation_level = 0):
+def dump_mwbs_for_all_base_variants_in_project(object_loader, protocol_layer_data, project_folder_path, output_folder_path, overwrite = False, debug_info_indentation_level = 0, dump_writer = None, shared_structures = False):
     # Go through each file (Pool) in the project folder
     for current_filename in os.listdir(project_folder_path):
         # The PoolID simply refers to the file's name (without extension)
@@ -1669,10 +1769,10 @@ def dump_mwbs_for_all_base_variants_in_project(object_loader, protocol_layer_dat
         object_printer.print_indented(debug_info_indentation_level, 'Dumping {}'.format(PoolID))
         
         # Dump the MWBs with the other function
-        dump_mwbs_for_base_variant(object_loader, protocol_layer_data, project_folder_path, PoolID, output_folder_path, overwrite, debug_info_indentation_level + 1)
+        dump_mwbs_for_base_variant(object_loader, protocol_layer_data, project_folder_path, PoolID, output_folder_path, overwrite, debug_info_indentation_level + 1, dump_writer, shared_structures)
 
 
-def dump_mwbs_for_all_base_variants_in_all_projects(project_folder_path, output_folder_path, debug_info_indentation_level = 0):
+def dump_mwbs_for_all_base_variants_in_all_projects(project_folder_path, output_folder_path, debug_info_indentation_level = 0, dump_writer = None, locate_dops = False, shared_structures = False):
     # Go through each project in the folder
     for project_name in os.listdir(project_folder_path):
         project_path = os.path.join(project_folder_path, project_name)
@@ -1717,11 +1817,16 @@ def dump_mwbs_for_all_base_variants_in_all_projects(project_folder_path, output_
         if not os.path.isdir(project_output_folder_path):
             os.makedirs(project_output_folder_path)
         
+        # References without PoolID which are missing from the layer data maps can be searched in all Pools, if requested
+        # The index of all Pools is cached in the project output folder
+        if locate_dops:
+            object_loader.set_object_locator(ObjectLocator(pbl_record_manager, project_path, project_output_folder_path))
+        
         # Dump the MWBs for each ECU-VARIANT in each BASE-VARIANT with the other function
-        dump_mwbs_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, project_path, project_output_folder_path, False, debug_info_indentation_level + 1)
+        dump_mwbs_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, project_path, project_output_folder_path, False, debug_info_indentation_level + 1, dump_writer, shared_structures)
 
 
-def dumpMWB_basevariant(project_folder_path, base_variant_filename, output_folder_path):
+def dumpMWB_basevariant(project_folder_path, base_variant_filename, output_folder_path, dump_writer = None, locate_dops = False, shared_structures = False):
     if not os.path.isdir(project_folder_path):
         raise RuntimeError('Project must be folder')
     
@@ -1744,6 +1849,11 @@ def dumpMWB_basevariant(project_folder_path, base_variant_filename, output_folde
     # An instance of the ObjectLoader class is used for loading Objects and references from the BASE-VARIANT Pool
     object_loader = ObjectLoader(pbl_record_manager, string_storage)
     
+    # References without PoolID which are missing from the layer data maps can be searched in all Pools, if requested
+    # The index of all Pools is cached in the project output folder
+    if locate_dops:
+        object_loader.set_object_locator(ObjectLocator(pbl_record_manager, project_folder_path, project_output_folder_path))
+    
     # Some references will only specify the ObjectID (object name) and not the PoolID (file name)
     # To resolve them, there are 3 maps that link an ObjectID with a PoolID: one for the ECU-VARIANT, one for the BASE-VARIANT, and one for the protocol
     # The ObjectID will be searched in them, in that order
@@ -1753,10 +1863,10 @@ def dumpMWB_basevariant(project_folder_path, base_variant_filename, output_folde
     protocol_layer_data_list = get_protocol_layer_data_list(object_loader, project_folder_path)
     
     # Run the app
-    dump_mwbs_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, project_output_folder_path, True)
+    dump_mwbs_for_base_variant(object_loader, protocol_layer_data_list, project_folder_path, base_variant_filename, project_output_folder_path, True, 0, dump_writer, shared_structures)
 
 
-def dumpMWB_project(project_folder_path, output_folder_path):
+def dumpMWB_project(project_folder_path, output_folder_path, dump_writer = None, locate_dops = False, shared_structures = False):
     if not os.path.isdir(project_folder_path):
         raise RuntimeError('Project must be folder')
     
@@ -1779,6 +1889,11 @@ def dumpMWB_project(project_folder_path, output_folder_path):
     # An instance of the ObjectLoader class is used for loading Objects and References from the BASE-VARIANT Pool
     object_loader = ObjectLoader(pbl_record_manager, string_storage)
     
+    # References without PoolID which are missing from the layer data maps can be searched in all Pools, if requested
+    # The index of all Pools is cached in the project output folder
+    if locate_dops:
+        object_loader.set_object_locator(ObjectLocator(pbl_record_manager, project_folder_path, project_output_folder_path))
+    
     # Get the starting timestamp
     start_time = time.time()
     
@@ -1792,7 +1907,7 @@ def dumpMWB_project(project_folder_path, output_folder_path):
     # Run the app
     # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
     try:
-        dump_mwbs_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, project_folder_path, project_output_folder_path)
+        dump_mwbs_for_all_base_variants_in_project(object_loader, protocol_layer_data_list, project_folder_path, project_output_folder_path, False, 0, dump_writer, shared_structures)
     except:
         print('Error:\n{}'.format(traceback.format_exc()))
     
@@ -1805,7 +1920,7 @@ def dumpMWB_project(project_folder_path, output_folder_path):
     print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
 
 
-def dumpMWB_projects(projects_folder_path, output_folder_path):
+def dumpMWB_projects(projects_folder_path, output_folder_path, dump_writer = None, locate_dops = False, shared_structures = False):
     if not os.path.isdir(projects_folder_path):
         raise RuntimeError('Must provide folder to all projects')
     
@@ -1819,7 +1934,7 @@ def dumpMWB_projects(projects_folder_path, output_folder_path):
     # Run the app
     # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
     try:
-        dump_mwbs_for_all_base_variants_in_all_projects(projects_folder_path, output_folder_path)
+        dump_mwbs_for_all_base_variants_in_all_projects(projects_folder_path, output_folder_path, 0, dump_writer, locate_dops, shared_structures)
     except:
         print('Error:\n{}'.format(traceback.format_exc()))
     
@@ -1842,21 +1957,30 @@ if __name__ == '__main__':
     parser_basevariant.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
     parser_basevariant.add_argument('base_variant_filename', help='Filename of BASE-VARIANT (.bv.db file)')
     parser_basevariant.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for the project and BASE-VARIANT')
+    DumpWriter.add_arguments(parser_basevariant)
+    parser_basevariant.add_argument('--locate-dops', action='store_true', help='Search all Pools of the project for DOPs which are missing from the layer data maps (the MCD Kernel fails to load them)')
+    parser_basevariant.add_argument('--shared-structures', action='store_true', help='Write each distinct STRUCTURE once per BASE-VARIANT (in "{}"), the variant files only reference it by hash'.format(mwb_structures_file_name))
     parser_basevariant.set_defaults(func=dumpMWB_basevariant)
     
     # All MWBs from all ECU-VARIANTs in all BASE-VARIANTs of a project
     parser_project = subparsers.add_parser('project', help='Dump MWBs for all ECU-VARIANTs in all BASE-VARIANTs of a project')
     parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
     parser_project.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for the project and each BASE-VARIANT')
+    DumpWriter.add_arguments(parser_project)
+    parser_project.add_argument('--locate-dops', action='store_true', help='Search all Pools of the project for DOPs which are missing from the layer data maps (the MCD Kernel fails to load them)')
+    parser_project.add_argument('--shared-structures', action='store_true', help='Write each distinct STRUCTURE once per BASE-VARIANT (in "{}"), the variant files only reference it by hash'.format(mwb_structures_file_name))
     parser_project.set_defaults(func=dumpMWB_project)
     
     # All MWBs from all ECU-VARIANTs in all BASE-VARIANTs of all projects
     parser_all_projects = subparsers.add_parser('projects', help='Dump MWBs for all ECU-VARIANTs in all BASE-VARIANTs of all projects')
     parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
     parser_all_projects.add_argument('output_folder_path', help='Path of folder where to write the dump files, in a separate folder for each project')
+    DumpWriter.add_arguments(parser_all_projects)
+    parser_all_projects.add_argument('--locate-dops', action='store_true', help='Search all Pools of the project for DOPs which are missing from the layer data maps (the MCD Kernel fails to load them)')
+    parser_all_projects.add_argument('--shared-structures', action='store_true', help='Write each distinct STRUCTURE once per BASE-VARIANT (in "{}"), the variant files only reference it by hash'.format(mwb_structures_file_name))
     parser_all_projects.set_defaults(func=dumpMWB_projects)
     
     # Parse the provided arguments and call the appropriate function based on the command
     args = parser.parse_args()
-    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
-    args.func(**filtered_args)
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command') + DumpWriter.argument_names}
+    args.func(dump_writer=DumpWriter.from_arguments(args), **filtered_args)
@@ -1,4 +1,5 @@
 import argparse
+import io
 import os
 import struct
 
@@ -6,6 +7,12 @@ from common_utils import enum_converters, object_printer
 from classes.PblRecordManager import PblRecordManager
 from classes.ObjectLoader import ObjectLoader
 from classes.StringStorage import StringStorage
+from classes.DumpWriter import DumpWriter
+from classes.FailureReport import FailureReport
+from classes.ObjectStore import ObjectStore
+from classes.DumpFilter import DumpFilter
+from classes.ShardedDumpFile import ShardedDumpFile
+from classes.ShardedDumpReader import ShardedDumpReader
 
 
 # Import the `__all__` list from the "__init__.py" module of the "object_loaders" package as the list of supported Objects to unpack
@@ -18,16 +25,62 @@ pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
 pbl_record_manager = PblRecordManager(pbl_dll_path)
 
 
+# Write a loaded Object to a Pool file
+# With an ObjectStore, the Object's dump is added to the store (once for all identical Objects), and only a reference to it is written
+### output_pool_file  = output file of the Pool
+### ObjectID          = name of the Object
+### obj               = loaded Object
+### object_type       = type of the Object
+### object_store      = instance of ObjectStore (None = write the whole dump)
+### data_hash         = hash of the Object's compressed data (only needed with an ObjectStore)
+### string_references = strings read while loading the Object (only needed with an ObjectStore)
+### string_storage    = instance of StringStorage, loaded from the target Project (only needed with an ObjectStore)
+def write_object(output_pool_file, ObjectID, obj, object_type, object_store = None, data_hash = None, string_references = None, string_storage = None):
+    if object_store is None:
+        object_printer.print_object(obj, '\'{}\''.format(ObjectID), 0, output_pool_file)
+    else:
+        dump_file = io.StringIO()
+        object_printer.print_object(obj, '', 0, dump_file)
+        content_hash = object_store.add(data_hash, string_references, string_storage, object_type, dump_file.getvalue())
+        object_printer.print_indented(0, ObjectStore.get_reference(ObjectID, content_hash), output_pool_file)
+
+
+# Get the path of a Pool file, as named by the dumper (before the compression extension, if any)
+# A Pool file with only some object types gets a suffix, so it's never taken for (or replaces) the complete one
+### output_folder_path = path of folder where the Pool files are written
+### PoolID             = name of the Pool
+### dump_filter        = instance of DumpFilter, selecting which Pools and Objects are dumped (None = everything)
+def get_output_pool_path(output_folder_path, PoolID, dump_filter = None):
+    # The .c extension is only used for highlighting and block folding in a code editor
+    return os.path.join(output_folder_path, PoolID + ('' if dump_filter is None else dump_filter.get_output_suffix()) + '.c')
+
+
 # Unpack and dump the contents of a single MCD Project to a folder
 ### string_storage      = instance of StringStorage, loaded from the target Project
 ### project_folder_path = Project path (folder with .db and .key files)
 ### output_folder_path  = path of folder where to write Pool files (dumps of .db files)
 ### overwrite           = whether or not to unpack and dump a Pool if it already exists (False = skip file)
-def app_dumpProject(string_storage, project_folder_path, output_folder_path, overwrite = True):
+### dump_writer         = instance of DumpWriter, used for opening the output files (None = plain text files)
+### failure_report      = instance of FailureReport, where Objects which fail to load are recorded (None = stop at the first failure)
+### object_store        = instance of ObjectStore, where each distinct Object is dumped once (None = dump all Objects in the Pool files)
+### dump_filter         = instance of DumpFilter, selecting which Pools and Objects to dump (None = dump everything)
+### shard_size          = maximum size in bytes of the files each Pool is split into, with an index for reading single Objects (None = one file per Pool)
+def app_dumpProject(string_storage, project_folder_path, output_folder_path, overwrite = True, dump_writer = None, failure_report = None, object_store = None, dump_filter = None, shard_size = None):
+    # By default, write uncompressed text files
+    if dump_writer is None:
+        dump_writer = DumpWriter()
+    
+    # The index points to byte offsets in the shards, so they can't be compressed
+    if shard_size is not None and dump_writer.compression is not None:
+        raise RuntimeError('Sharded Pool files cannot be compressed')
+    
     # An instance of the ObjectLoader class is used for loading Objects from Pools
     # The first parameter (instance of the PblRecordManager class) is not needed since we will extract the PBL records "manually"
     object_loader = ObjectLoader(None, string_storage)
     
+    # With a filter on object types, the Pool files don't contain all Objects
+    filters_object_types = dump_filter is not None and dump_filter.filters_object_types()
+    
     # Go through each file (Pool) in the Project folder
     for current_filename in os.listdir(project_folder_path):
         # The PoolID simply refers to the file's name (without extension)
@@ -38,29 +91,63 @@ def app_dumpProject(string_storage, project_folder_path, output_folder_path, ove
         if not os.path.isfile(db_file_path) or extension != '.db':
             continue
         
+        # Skip the Pools which weren't selected, before reading anything from them
+        if dump_filter is not None and not dump_filter.includes_pool(PoolID):
+            continue
+        
         # The current Pool will be unpacked into its own file
-        # The .c extension is only used for highlighting and block folding in a code editor
-        output_pool_path = os.path.join(output_folder_path, PoolID + '.c')
+        output_pool_path = get_output_pool_path(output_folder_path, PoolID, dump_filter)
         
-        # Only unpack the Pool if the file doesn't already exist (or if overwriting is allowed)
-        if overwrite or not os.path.isfile(output_pool_path):
+        # A sharded Pool file is complete once its index is written, so the index is what's recorded in the manifest
+        recorded_output_pool_path = output_pool_path if shard_size is None else ShardedDumpFile.get_index_file_path(output_pool_path)
+        
+        # Only unpack the Pool if the file isn't already up to date (or if overwriting is allowed)
+        if overwrite or not dump_writer.is_done(recorded_output_pool_path):
             # Open the output file
-            with open(output_pool_path, 'w', encoding='utf-8') as output_pool_file:
-                # Determine the Pool's type and write it to the file
-                db_file_type = enum_converters.get_db_file_type(PoolID)
-                object_printer.print_indented(0, db_file_type, output_pool_file)
+            # If a previous run was interrupted while dumping this Pool, it will continue from its last checkpoint
+            # A Pool file with only some object types is always written from the beginning, so a later complete dump never resumes it
+            # Sharded Pool files can't be resumed either
+            if shard_size is not None:
+                opened_output_pool_file = ShardedDumpFile(output_pool_path, shard_size)
+            elif filters_object_types:
+                opened_output_pool_file = dump_writer.open(output_pool_path)
+            else:
+                opened_output_pool_file = dump_writer.open_resumable(output_pool_path, project_folder_path, [PoolID])
+            with opened_output_pool_file as output_pool_file:
+                # The Objects added to the store must be saved before the Pool file referencing them
+                if object_store is not None:
+                    output_pool_file.add_checkpoint_callback(object_store.commit)
                 
                 # Load all records from the .key file
                 # They contain information on how to extract all Objects from the .db file
                 pbl_records = pbl_record_manager.get_all_records(project_folder_path, PoolID)
                 
+                # When starting from the beginning, determine the Pool's type and write it to the file
+                if output_pool_file.completed_objects == 0:
+                    # Failures from a previous dump of the Pool are no longer relevant
+                    # Unless only some object types are dumped, since the failed Objects may not be loaded again
+                    if failure_report is not None and not filters_object_types:
+                        failure_report.clear_pool(project_folder_path, PoolID)
+                    
+                    db_file_type = enum_converters.get_db_file_type(PoolID)
+                    object_printer.print_indented(0, db_file_type, output_pool_file)
+                    output_pool_file.complete_header()
+                
+                # Otherwise, skip the Objects which were already dumped
+                # The records are always read in the same order, so the last completed one must be at the same index
+                else:
+                    ObjectID_hashes = list(pbl_records)
+                    if output_pool_file.completed_objects > len(ObjectID_hashes) or ObjectID_hashes[output_pool_file.completed_objects - 1] != output_pool_file.last_completed_object:
+                        raise RuntimeError('Checkpoint does not match the records of Pool {}'.format(PoolID))
+                    print('Resuming {} after {} Objects'.format(PoolID, output_pool_file.completed_objects))
+                
                 # Open the .db file once for all Objects
                 db_file_path = os.path.join(project_folder_path, PoolID + '.db')
                 with open(db_file_path, 'rb') as db_file:
                     # Go though each record, to unpack each Object
-                    for ObjectID_hash in pbl_records:
-                        # Extract the current Object's data from the .db file
-                        object_data = ObjectLoader.get_object_data_from_opened_db_file(pbl_records[ObjectID_hash], db_file)
+                    for ObjectID_index, ObjectID_hash in enumerate(pbl_records):
+                        if ObjectID_index < output_pool_file.completed_objects:
+                            continue
                         
                         # The key of each record in the records dictionary is the hash for an ASCII string
                         # Convert it to the corresponding string (using the strings database), this is the Object's name
@@ -68,23 +155,197 @@ def app_dumpProject(string_storage, project_folder_path, output_folder_path, ove
                         if ObjectID is None:
                             raise RuntimeError('ObjectID is invalid')
                         
-                        # The first 2 bytes of an Object's data are an enum which represents the Object's type
-                        object_type_enum = struct.unpack('<H', object_data[:2])[0]
-                        object_type = enum_converters.get_object_type_enum(object_type_enum)
+                        # Read the current Object's compressed data from the .db file
+                        pbl_data = pbl_records[ObjectID_hash]
+                        compressed_data = ObjectLoader.get_compressed_object_data_from_opened_db_file(pbl_data, db_file)
                         
-                        # Only attempt to parse known object types
-                        if object_type in supported_object_types:
-                            # Load the Object
-                            # This will either return dictionary (most common), or a list (for Objects with "plural" types)
-                            obj = object_loader.load_object_by_object_data(object_data)
+                        # Skip the Objects of types which weren't selected, only inflating their header to get the type
+                        # The Pool file can't be resumed in this case, so the skipped Objects don't need to be marked as completed
+                        if filters_object_types and not dump_filter.includes_object_type(PblRecordManager.get_object_type_enum_from_compressed_data(compressed_data)):
+                            continue
+                        
+                        # With an ObjectStore, an Object which was already dumped (in any Pool or Project) is not loaded again
+                        data_hash = None
+                        if object_store is not None:
+                            data_hash = ObjectStore.get_data_hash(compressed_data)
+                            content_hash = object_store.find(data_hash, string_storage)
+                            if content_hash is not None:
+                                object_printer.print_indented(0, '', output_pool_file)
+                                object_printer.print_indented(0, ObjectStore.get_reference(ObjectID, content_hash), output_pool_file)
+                                output_pool_file.complete_object(ObjectID_hash, ObjectID)
+                                continue
+                        
+                        # Decompress, identify and load the Object
+                        # If a failure report is used, errors are recorded there and the dump continues with the next Object
+                        object_type_enum = None
+                        try:
+                            # Decompress the current Object's data
+                            object_data = ObjectLoader.decompress_object_data(pbl_data, compressed_data)
+                            
+                            # The first 2 bytes of an Object's data are an enum which represents the Object's type
+                            object_type_enum = struct.unpack('<H', object_data[:2])[0]
+                            object_type = enum_converters.get_object_type_enum(object_type_enum)
+                            
+                            # Only attempt to parse known object types
+                            if object_type in supported_object_types:
+                                # Load the Object
+                                # This will either return dictionary (most common), or a list (for Objects with "plural" types)
+                                # The strings it uses are recorded for the ObjectStore
+                                if object_store is not None:
+                                    string_storage.start_recording_strings()
+                                obj = object_loader.load_object_by_object_data(object_data)
+                                string_references = string_storage.stop_recording_strings()
+                                
+                                # Dump the Object to the output file
+                                object_printer.print_indented(0, '', output_pool_file)
+                                write_object(output_pool_file, ObjectID, obj, object_type, object_store, data_hash, string_references, string_storage)
+                            
+                            # Warn about unknown object types
+                            else:
+                                print('Unknown object_type: {}'.format(object_type))
+                        except Exception as e:
+                            if failure_report is None:
+                                raise
+                            
+                            # Stop recording strings, in case loading the Object failed
+                            string_storage.stop_recording_strings()
                             
-                            # Dump the Object to the output file
+                            # Record the failure, with where to find the Object's data in the .db file
+                            (file_position, compressed_size, decompressed_size) = PblRecordManager.parse_pbl_data(pbl_data)
+                            failure_report.add(project_folder_path, PoolID, ObjectID, object_type_enum, file_position, e)
+                            print('Failed to load {} from {}: {}'.format(ObjectID, PoolID, e))
+                            
+                            # Leave a placeholder in the output file, which will be replaced when retrying the failure
                             object_printer.print_indented(0, '', output_pool_file)
-                            object_printer.print_object(obj, '\'{}\''.format(ObjectID), 0, output_pool_file)
+                            object_printer.print_indented(0, FailureReport.get_placeholder(ObjectID), output_pool_file)
                         
-                        # Warn about unknown object types
-                        else:
-                            print('Unknown object_type: {}'.format(object_type))
+                        # The Object is done, this is where a later run can resume
+                        output_pool_file.complete_object(ObjectID_hash, ObjectID)
+            
+            # The index and shards of a previous sharded dump would otherwise be taken for the Pool file when retrying failures
+            if shard_size is None:
+                ShardedDumpFile.remove(output_pool_path)
+            
+            # Remember which input files the output was made from, so it's only redone when they change
+            # An incomplete Pool file is not recorded, so a later complete dump doesn't skip it
+            if not filters_object_types:
+                dump_writer.record(recorded_output_pool_path, project_folder_path, [PoolID])
+
+
+# Retry the Objects of a Project which failed to load in a previous dump
+# Only the failed Objects are loaded again, and their placeholders in the Pool files are replaced with their dumps
+### string_storage      = instance of StringStorage, loaded from the target Project
+### project_folder_path = Project path (folder with .db and .key files)
+### output_folder_path  = path of folder where the Pool files were written
+### failure_report      = instance of FailureReport, containing the failures to retry (updated with the results)
+### dump_writer         = instance of DumpWriter, used for opening the output files (must match the one used for the dump)
+### object_store        = instance of ObjectStore (must be given if it was used for the dump)
+### dump_filter         = instance of DumpFilter (must match the one used for the dump, since it names the Pool files)
+def app_retryFailures(string_storage, project_folder_path, output_folder_path, failure_report, dump_writer = None, object_store = None, dump_filter = None):
+    # By default, the files are uncompressed text files
+    if dump_writer is None:
+        dump_writer = DumpWriter()
+    
+    # An instance of the ObjectLoader class is used for loading Objects from their data
+    object_loader = ObjectLoader(None, string_storage)
+    
+    # Go through each Pool which has failures
+    for (PoolID, pool_failures) in failure_report.get_failures_by_pool(project_folder_path).items():
+        if dump_filter is not None and not dump_filter.includes_pool(PoolID):
+            continue
+        
+        # The placeholders can only be replaced in a complete Pool file
+        # A dump written as a single file removes the index of a previous sharded one, so an existing index is always current
+        output_pool_path = get_output_pool_path(output_folder_path, PoolID, dump_filter)
+        sharded = ShardedDumpReader.exists(output_pool_path)
+        if not sharded and not os.path.isfile(dump_writer.get_output_file_path(output_pool_path)):
+            print('Cannot retry {}, its dump does not exist'.format(PoolID))
+            continue
+        
+        # Load all records from the .key file, to find the failed Objects in the .db file
+        pbl_records = pbl_record_manager.get_all_records(project_folder_path, PoolID)
+        
+        # Load each failed Object again, keeping the dumps of the ones which succeed, keyed by their placeholders
+        replacements = {}
+        db_file_path = os.path.join(project_folder_path, PoolID + '.db')
+        with open(db_file_path, 'rb') as db_file:
+            for failure in pool_failures:
+                ObjectID = failure['object_id']
+                pbl_data = pbl_records[string_storage.get_ascii_hash(ObjectID)]
+                
+                object_type_enum = None
+                try:
+                    # Extract and identify the Object like when dumping
+                    compressed_data = ObjectLoader.get_compressed_object_data_from_opened_db_file(pbl_data, db_file)
+                    object_data = ObjectLoader.decompress_object_data(pbl_data, compressed_data)
+                    object_type_enum = struct.unpack('<H', object_data[:2])[0]
+                    object_type = enum_converters.get_object_type_enum(object_type_enum)
+                    if object_type not in supported_object_types:
+                        raise RuntimeError('Unknown object_type: {}'.format(object_type))
+                    
+                    # Load the Object, recording the strings it uses for the ObjectStore
+                    if object_store is not None:
+                        string_storage.start_recording_strings()
+                    obj = object_loader.load_object_by_object_data(object_data)
+                    string_references = string_storage.stop_recording_strings()
+                except Exception as e:
+                    string_storage.stop_recording_strings()
+                    
+                    # Update the failure, the exception may be different now
+                    (file_position, compressed_size, decompressed_size) = PblRecordManager.parse_pbl_data(pbl_data)
+                    failure_report.add(project_folder_path, PoolID, ObjectID, object_type_enum, file_position, e)
+                    print('Still failing to load {} from {}: {}'.format(ObjectID, PoolID, e))
+                    continue
+                
+                # Dump the Object like it would have been in the Pool file
+                replacement_file = io.StringIO()
+                data_hash = ObjectStore.get_data_hash(compressed_data) if object_store is not None else None
+                write_object(replacement_file, ObjectID, obj, object_type, object_store, data_hash, string_references, string_storage)
+                replacements[FailureReport.get_placeholder(ObjectID)] = replacement_file.getvalue()
+        
+        # Nothing to do if all Objects still fail
+        if len(replacements) == 0:
+            continue
+        
+        # Copy the Pool file, replacing the placeholders
+        # The old file is closed before the new one replaces it
+        if not sharded:
+            with dump_writer.open(output_pool_path) as new_output_pool_file:
+                if object_store is not None:
+                    new_output_pool_file.add_checkpoint_callback(object_store.commit)
+                
+                with dump_writer.open_for_reading(output_pool_path) as old_output_pool_file:
+                    for line in old_output_pool_file:
+                        replacement = replacements.get(line.rstrip('\n'))
+                        new_output_pool_file.write(line if replacement is None else replacement)
+        
+        # A sharded Pool file is copied Object by Object, so the new index points to the replaced dumps
+        else:
+            with ShardedDumpReader(output_pool_path) as old_output_pool_file:
+                shard_size = old_output_pool_file.shard_size
+            
+            with ShardedDumpFile(output_pool_path, shard_size) as new_output_pool_file:
+                if object_store is not None:
+                    new_output_pool_file.add_checkpoint_callback(object_store.commit)
+                
+                with ShardedDumpReader(output_pool_path) as old_output_pool_file:
+                    new_output_pool_file.write(old_output_pool_file.get_header())
+                    new_output_pool_file.complete_header()
+                    for (ObjectID, text) in old_output_pool_file.get_objects():
+                        for line in text.splitlines(keepends=True):
+                            replacement = replacements.get(line.rstrip('\n'))
+                            new_output_pool_file.write(line if replacement is None else replacement)
+                        new_output_pool_file.complete_object(None, ObjectID)
+                    new_output_pool_file.write(old_output_pool_file.get_trailer())
+        
+        # The Pool file is now up to date
+        dump_writer.record(output_pool_path if not sharded else ShardedDumpFile.get_index_file_path(output_pool_path), project_folder_path, [PoolID])
+        
+        # Remove the failures which were fixed
+        for failure in pool_failures:
+            if FailureReport.get_placeholder(failure['object_id']) in replacements:
+                failure_report.remove(project_folder_path, PoolID, failure['object_id'])
+        print('Retried {}: {} of {} Objects fixed'.format(PoolID, len(replacements), len(pool_failures)))
 
 
 # Handle usage as script
@@ -92,6 +353,12 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Dump all Objects from all Pools of an MCD Project')
     parser.add_argument('project_folder_path', help='MCD Project (folder containing .db and .key files)')
     parser.add_argument('output_folder_path', help='Main output folder, in which another folder with the name of the Project will be added')
+    parser.add_argument('--keep-going', action='store_true', help='Record Objects which fail to load in a report (in the main output folder) and continue')
+    parser.add_argument('--retry-failures', action='store_true', help='Only load the Objects from the failure report again, and update their Pool files')
+    parser.add_argument('--object-store', action='store_true', help='Dump each distinct Object once, in a store shared by all Pools and Projects (in the main output folder)')
+    parser.add_argument('--shard-size', type=int, default=None, metavar='MB', help='Split each Pool file into shards of at most this size, with an index for reading single Objects (see classes/ShardedDumpReader.py)')
+    DumpWriter.add_arguments(parser)
+    DumpFilter.add_arguments(parser)
     args = parser.parse_args()
     
     # The project_folder_path argument must be a path to a folder
@@ -117,5 +384,28 @@ if __name__ == '__main__':
     # The strings database is unique to each Project
     string_storage = StringStorage(args.project_folder_path)
     
+    # The output files may be compressed, and their inputs are recorded in a manifest in the main output folder
+    dump_writer = DumpWriter.from_arguments(args)
+    
+    # Failures are recorded in a report in the main output folder, if requested
+    failure_report = None
+    if args.keep_going or args.retry_failures:
+        failure_report = FailureReport(args.output_folder_path)
+    
+    # Identical Objects are dumped once in a store in the main output folder, if requested
+    object_store = None
+    if args.object_store:
+        object_store = ObjectStore(args.output_folder_path)
+    
     # Run the app
-    app_dumpProject(string_storage, args.project_folder_path, project_output_folder_path)
+    if args.retry_failures:
+        app_retryFailures(string_storage, args.project_folder_path, project_output_folder_path, failure_report, dump_writer, object_store, DumpFilter.from_arguments(args))
+    else:
+        app_dumpProject(string_storage, args.project_folder_path, project_output_folder_path, True, dump_writer, failure_report, object_store, DumpFilter.from_arguments(args), None if args.shard_size is None else args.shard_size * 1024 * 1024)
+    
+    if object_store is not None:
+        object_store.close()
+    
+    # Show how many failures are left
+    if failure_report is not None and failure_report.get_failure_count() != 0:
+        print('{} Objects failed to load, see {}'.format(failure_report.get_failure_count(), os.path.join(args.output_folder_path, FailureReport.report_file_name)))
@@ -0,0 +1,184 @@
+import argparse
+import concurrent.futures
+import os
+
+from common_utils import object_hasher, project_builds
+from classes.DefinitionDatabase import DefinitionDatabase
+from dumpMWB import get_ecu_variant_map, get_ecu_variant_layer_data, get_mwb_keys_and_table, get_mwb_name_and_table_row_parameter_by_did
+from dumpCoding import get_coding_keys_and_table, get_coding_name_and_table_row_parameter_by_did
+from dumpAdaptations import get_adaptation_keys_and_table, get_adaptation_name_and_table_row_parameter_by_did
+from buildSymbolTables import get_worker_project
+
+
+# Names of the kinds of definitions which can be exported, with the kind stored in the database and the functions which get them
+# The table row lookup of MWBs returns None for a missing row, the other ones raise KeyError
+definition_kinds = {
+    'mwb': ('MWB', get_mwb_keys_and_table, get_mwb_name_and_table_row_parameter_by_did),
+    'coding': ('CODING', get_coding_keys_and_table, get_coding_name_and_table_row_parameter_by_did),
+    'adaptations': ('ADAPTATION', get_adaptation_keys_and_table, get_adaptation_name_and_table_row_parameter_by_did)
+}
+
+
+# Get the definitions of one kind of a variant, flattening each STRUCTURE which wasn't flattened yet
+### object_loader          = instance of ObjectLoader, with StringStorage instance loaded from the target Project
+### layer_data_objects     = list of "layer data" objects, for solving references which don't specify a PoolID
+### project_folder_path    = Project path (folder with .db and .key files)
+### ecu_variant_layer_data = "layer data" object of the variant
+### definition_kind        = name of the kind of definitions (key of `definition_kinds`)
+### structures             = dictionary of flattened STRUCTUREs by hash, to which the new ones are added
+# * returns a list of (kind, DID, LONG-NAME, LONG-NAME-ID, DESCRIPTION, BYTE-POSITION, BIT-POSITION, STRUCTURE hash) tuples, or None if the variant has no such table
+def get_variant_definitions(object_loader, layer_data_objects, project_folder_path, ecu_variant_layer_data, definition_kind, structures):
+    (kind, get_keys_and_table, get_name_and_table_row_parameter_by_did) = definition_kinds[definition_kind]
+    
+    keys_and_table_result = get_keys_and_table(object_loader, layer_data_objects, project_folder_path, ecu_variant_layer_data)
+    if keys_and_table_result is None:
+        return None
+    (keys, table) = keys_and_table_result
+    
+    definitions = []
+    for did in keys:
+        try:
+            table_row_result = get_name_and_table_row_parameter_by_did(object_loader, project_folder_path, keys, table, did)
+        except KeyError:
+            table_row_result = None
+        
+        # A missing table row is still exported, without position and STRUCTURE
+        if table_row_result is None:
+            definitions.append((kind, did, keys[did]['long_name'], keys[did]['long_name_id'], None, None, None, None))
+            continue
+        table_row_parameter = table_row_result[2]
+        
+        # Equal STRUCTUREs (of any variant) are only flattened and stored once
+        structure_hash = None
+        structure = table_row_parameter['dop']
+        if type(structure) is dict and structure.get('type') == 'STRUCTURE':
+            structure_hash = object_hasher.get_object_hash(structure)
+            if structure_hash not in structures:
+                structures[structure_hash] = DefinitionDatabase.flatten_structure(structure)
+        
+        definitions.append((kind, did, keys[did]['long_name'], keys[did]['long_name_id'], table_row_parameter['description'], table_row_parameter['byte_position'], table_row_parameter['bit_position'], structure_hash))
+    return definitions
+
+
+# Get the definitions of a BASE-VARIANT and of each of its ECU-VARIANTs (run in a worker process)
+### project_folder_path        = Project path (folder with .db and .key files)
+### PoolID                     = name of the BASE-VARIANT Pool
+### definition_kinds_to_export = list of names of the kinds of definitions (keys of `definition_kinds`)
+# * returns (BASE-VARIANT name, list of (variant, kind, DID, ...) tuples (see get_variant_definitions), dictionary of flattened STRUCTUREs by hash)
+def get_base_variant_definitions(project_folder_path, PoolID, definition_kinds_to_export):
+    (object_loader, protocol_layer_data_list) = get_worker_project(project_folder_path)
+    
+    db_project_data = object_loader.load_object_by_id(project_folder_path, PoolID, '#RtGen_DB_PROJECT_DATA')
+    base_variant_name = db_project_data['ecu_base_variant_ref']['object_id']
+    base_variant_layer_data = object_loader.load_object_by_id(project_folder_path, PoolID, '#RtGen_DB_LAYER_DATA')
+    
+    # The BASE-VARIANT has its own definitions too, like in dumpMWB
+    variants = [(base_variant_name, base_variant_layer_data)]
+    ecu_variant_map = get_ecu_variant_map(db_project_data) or {}
+    for ecu_variant_name, ecu_variant_reference in ecu_variant_map.items():
+        variants.append((ecu_variant_name, get_ecu_variant_layer_data(object_loader, project_folder_path, ecu_variant_reference)))
+    
+    definitions = []
+    structures = {}
+    for (variant_name, variant_layer_data) in variants:
+        layer_data_objects = [variant_layer_data, base_variant_layer_data] + protocol_layer_data_list
+        for definition_kind in definition_kinds_to_export:
+            variant_definitions = get_variant_definitions(object_loader, layer_data_objects, project_folder_path, variant_layer_data, definition_kind, structures)
+            if variant_definitions is not None:
+                definitions += [(variant_name,) + x for x in variant_definitions]
+    return (base_variant_name, definitions, structures)
+
+
+# Export the definitions of a Project into the database, replacing its previous ones (without committing them)
+# The BASE-VARIANTs are parsed in parallel, the database is written in the main process
+### project_folder_path        = Project path (folder with .db and .key files)
+### definition_database        = instance of DefinitionDatabase
+### executor                   = pool of worker processes
+### definition_kinds_to_export = list of names of the kinds of definitions (keys of `definition_kinds`)
+def export_project_definitions(project_folder_path, definition_database, executor, definition_kinds_to_export):
+    project_name = os.path.basename(os.path.abspath(project_folder_path))
+    pool_ids = project_builds.get_pool_ids(project_folder_path, 'Base Variant')
+    
+    definition_database.clear_project(project_name)
+    
+    futures = {executor.submit(get_base_variant_definitions, project_folder_path, PoolID, definition_kinds_to_export): PoolID for PoolID in pool_ids}
+    definition_count = 0
+    for future in concurrent.futures.as_completed(futures):
+        (base_variant_name, definitions, structures) = future.result()
+        
+        # The STRUCTUREs must be stored before the definitions which refer to them
+        for (structure_hash, (parameters, compu_scales)) in structures.items():
+            definition_database.add_structure(structure_hash, parameters, compu_scales)
+        definition_database.add_definitions(project_name, base_variant_name, definitions)
+        definition_count += len(definitions)
+    
+    print('Exported {} definitions from {} BASE-VARIANTs of {}'.format(definition_count, len(pool_ids), project_name))
+
+
+# Export the definitions, one Project at a time (see project_builds.run_project_builds)
+### project_folder_paths       = list of Project paths
+### database_file_path         = path of the SQLite database
+### jobs                       = number of worker processes (None = number of CPUs)
+### definition_kinds_to_export = list of names of the kinds of definitions (keys of `definition_kinds`)
+def run_export(project_folder_paths, database_file_path, jobs, definition_kinds_to_export):
+    definition_database = DefinitionDatabase(database_file_path)
+    project_builds.run_project_builds(project_folder_paths, lambda project_folder_path, executor: export_project_definitions(project_folder_path, definition_database, executor, definition_kinds_to_export), definition_database, jobs)
+
+
+def exportDefinitions_project(project_folder_path, database_file_path, jobs = None, extract = None):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    run_export([project_folder_path], database_file_path, jobs, extract or list(definition_kinds))
+
+
+def exportDefinitions_projects(projects_folder_path, database_file_path, jobs = None, extract = None):
+    if not os.path.isdir(projects_folder_path):
+        raise RuntimeError('Must provide folder to all projects')
+    
+    run_export(project_builds.get_project_folder_paths(projects_folder_path), database_file_path, jobs, extract or list(definition_kinds))
+
+
+def exportDefinitions_query(database_file_path, query):
+    if not os.path.isfile(database_file_path):
+        raise RuntimeError('Definition database not found: {}'.format(database_file_path))
+    
+    definition_database = DefinitionDatabase(database_file_path)
+    (columns, rows) = definition_database.query(query)
+    print('\t'.join(columns))
+    for row in rows:
+        print('\t'.join('' if x is None else str(x) for x in row))
+    definition_database.close()
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the MWB, Coding and Adaptation definitions of MCD projects to an indexed SQLite database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # All variants of a project
+    parser_project = subparsers.add_parser('project', help='Export the definitions of a project')
+    parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('database_file_path', help='Path of the SQLite database (created if it doesn\'t exist, the project is replaced if it was exported before)')
+    parser_project.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_project.add_argument('--extract', nargs='+', choices=list(definition_kinds), default=None, help='Kinds of definitions to export (default: all)')
+    parser_project.set_defaults(func=exportDefinitions_project)
+    
+    # All variants of all projects, in the same database
+    parser_all_projects = subparsers.add_parser('projects', help='Export the definitions of all projects')
+    parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
+    parser_all_projects.add_argument('database_file_path', help='Path of the SQLite database (created if it doesn\'t exist, each project is replaced if it was exported before)')
+    parser_all_projects.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_all_projects.add_argument('--extract', nargs='+', choices=list(definition_kinds), default=None, help='Kinds of definitions to export (default: all)')
+    parser_all_projects.set_defaults(func=exportDefinitions_projects)
+    
+    # Any SQL query
+    parser_query = subparsers.add_parser('query', help='Run an SQL query on the database')
+    parser_query.add_argument('database_file_path', help='Path of the SQLite database')
+    parser_query.add_argument('query', help='SQL query (e.g. SELECT * FROM definitions WHERE did = 0x0600)')
+    parser_query.set_defaults(func=exportDefinitions_query)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)
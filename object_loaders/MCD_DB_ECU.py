@@ -1,3 +1,4 @@
+from common_utils import common_loaders
 from classes import DbObject
 
 
@@ -26,6 +27,7 @@ def load(stream):
         item['reference']['object_id'] = stream.loadAsciiString()[0]
         item['reference']['pool_id'] = stream.loadAsciiString()[0]
         item['reference']['access_key'] = DbObject.load_object_from_stream_if_exists(stream) # MCDAccessKeyImpl
+        common_loaders.record_reference(item['reference'])
         
         obj['location_refs'].append(item)
     
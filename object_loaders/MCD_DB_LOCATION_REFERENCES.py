@@ -1,3 +1,4 @@
+from common_utils import common_loaders
 from classes import DbObject
 
 
@@ -6,6 +7,7 @@ def load(stream):
     
     obj['object_id'] = stream.loadAsciiString()[0]
     obj['pool_id'] = stream.loadAsciiString()[0]
+    common_loaders.record_reference(obj)
     
     obj['access_keys'] = []
     for i in range(stream.loadOneByteType()):
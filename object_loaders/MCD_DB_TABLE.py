@@ -29,6 +29,7 @@ def load(stream):
         named_reference['pool_id'] = stream.loadAsciiString()[0]
         named_reference['short_name'] = stream.loadAsciiString()[0]
         item['reference'] = named_reference
+        common_loaders.record_reference(named_reference)
         
         obj['table_key_map'].append(item)
     
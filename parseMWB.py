@@ -8,6 +8,7 @@ from classes.PblRecordManager import PblRecordManager
 from classes.ObjectLoader import ObjectLoader
 from classes.StringStorage import StringStorage
 from classes.LongNameTranslation import LongNameTranslation
+from classes.MwbModelCache import MwbModelCache
 from dumpMWB import pbl_record_manager, get_protocol_layer_data_list, get_ecu_variant_map, get_ecu_variant_layer_data, get_mwb_keys_and_table, get_mwb_name_and_table_row_parameter_by_did, get_mwb_structure, parse_dop
 
 
@@ -1407,23 +1408,32 @@ def dump_processed_mwb_response(processed_mwb_response):
         object_printer.print_indented(item['level'], '{} {} - {}'.format(item['type'], item['name'], item['value']))
 
 
-# Parse the UDS service 0x22 response of an ECU-VARIANT from an MCD Project
+# Get the MWB of each DID, as stored in the MWB model cache
+### object_loader       = instance of ObjectLoader, with StringStorage instance loaded from the target Project
+### project_folder_path = Project path (folder with .db and .key files)
+### mwb_keys            = MWB keys returned by `get_mwb_keys_and_table()`
+### mwb_table           = MWB table returned by `get_mwb_keys_and_table()`
+# * returns a dictionary of DID -> (LONG-NAME, LONG-NAME-ID, table row parameter or None)
+def get_mwb_rows(object_loader, project_folder_path, mwb_keys, mwb_table):
+    mwb_rows = {}
+    for did in mwb_keys:
+        table_row_result = get_mwb_name_and_table_row_parameter_by_did(object_loader, project_folder_path, mwb_keys, mwb_table, did)
+        
+        # The table row parameter is None if it's missing, the error is only raised if that DID is requested
+        if table_row_result is None:
+            mwb_rows[did] = (mwb_keys[did]['long_name'], mwb_keys[did]['long_name_id'], None)
+        else:
+            mwb_rows[did] = table_row_result
+    return mwb_rows
+
+
+# Load the MWBs of an ECU-VARIANT from an MCD Project
 ### object_loader         = instance of ObjectLoader, with StringStorage instance loaded from the target Project
-### long_name_translation = instance of LongNameTranslation, for translating LONG-NAMEs
 ### project_folder_path   = Project path (folder with .db and .key files)
-### base_variant_filename = path of desired BASE-VARIANT file (.bv.db), with or without the .db extension
-### desired_ecu_variant   = ECU-VARIANT name (included in BASE-VARIANT) for which to parse the response
-### response              = string of UDS response bytes in HEX, without header bytes
-def app_parseMWB(object_loader, long_name_translation, project_folder_path, base_variant_filename, desired_ecu_variant, desired_did, response):
-    # The PoolID simply refers to the file's name (without extension)
-    pool_id = base_variant_filename
-    if base_variant_filename.endswith('.db'):
-        pool_id = base_variant_filename[:-3]
-    
-    # Only parse a .bv.db file
-    if enum_converters.get_db_file_type(pool_id) != 'Base Variant':
-        raise RuntimeError('A BASE-VARIANT database must be provided (.bv.db)')
-    
+### base_variant_PoolID   = name of the BASE-VARIANT Pool (.bv.db file, without extension)
+### desired_ecu_variant   = ECU-VARIANT name (included in BASE-VARIANT)
+# * returns a dictionary of DID -> (LONG-NAME, LONG-NAME-ID, table row parameter or None)
+def load_mwb_rows(object_loader, project_folder_path, base_variant_PoolID, desired_ecu_variant):
     # Some references will only specify the ObjectID (object name) and not the PoolID (file name)
     # To resolve them, there are 3(+) maps that link an ObjectID with a PoolID: one for the ECU-VARIANT, one for the BASE-VARIANT, and one (or more) for the protocol
     # The ObjectID will be searched in them, in that order
@@ -1431,13 +1441,13 @@ def app_parseMWB(object_loader, long_name_translation, project_folder_path, base
     protocol_layer_data_list = get_protocol_layer_data_list(object_loader, project_folder_path)
     
     # Load the Object with ID '#RtGen_DB_PROJECT_DATA', which contains info about the ECU-VARIANTs included in the BASE-VARIANT
-    db_project_data = object_loader.load_object_by_id(project_folder_path, pool_id, '#RtGen_DB_PROJECT_DATA')
+    db_project_data = object_loader.load_object_by_id(project_folder_path, base_variant_PoolID, '#RtGen_DB_PROJECT_DATA')
     
     # Get the BASE-VARIANT's name
     base_variant_name = db_project_data['ecu_base_variant_ref']['object_id']
     
     # Load the layer data for the BASE-VARIANT, which is contained in the current file
-    base_variant_layer_data = object_loader.load_object_by_id(project_folder_path, pool_id, '#RtGen_DB_LAYER_DATA')
+    base_variant_layer_data = object_loader.load_object_by_id(project_folder_path, base_variant_PoolID, '#RtGen_DB_LAYER_DATA')
     
     # Get a map of available ECU-VARIANTs (each name resolves to a reference)
     ecu_variant_map = get_ecu_variant_map(db_project_data)
@@ -1474,27 +1484,64 @@ def app_parseMWB(object_loader, long_name_translation, project_folder_path, base
         # Unpack the result
         mwb_keys, mwb_table = get_mwb_keys_and_table_result
     
+    # Resolve the MWB of each DID
+    return get_mwb_rows(object_loader, project_folder_path, mwb_keys, mwb_table)
+
+
+# Parse the UDS service 0x22 response of an ECU-VARIANT from an MCD Project
+### object_loader         = instance of ObjectLoader, with StringStorage instance loaded from the target Project (None = created only if needed)
+### long_name_translation = instance of LongNameTranslation, for translating LONG-NAMEs
+### project_folder_path   = Project path (folder with .db and .key files)
+### base_variant_filename = path of desired BASE-VARIANT file (.bv.db), with or without the .db extension
+### desired_ecu_variant   = ECU-VARIANT name (included in BASE-VARIANT) for which to parse the response
+### response              = string of UDS response bytes in HEX, without header bytes
+### mwb_model_cache       = instance of MwbModelCache, used instead of loading the MWBs if it's valid for the ECU-VARIANT (None = not used)
+def app_parseMWB(object_loader, long_name_translation, project_folder_path, base_variant_filename, desired_ecu_variant, desired_did, response, mwb_model_cache = None):
+    # The PoolID simply refers to the file's name (without extension)
+    pool_id = base_variant_filename
+    if base_variant_filename.endswith('.db'):
+        pool_id = base_variant_filename[:-3]
+    
+    # Only parse a .bv.db file
+    if enum_converters.get_db_file_type(pool_id) != 'Base Variant':
+        raise RuntimeError('A BASE-VARIANT database must be provided (.bv.db)')
+    
     # If the DID was provided as a string, convert it to an integer, assuming it's in HEX format
     if isinstance(desired_did, str):
         desired_did = int(desired_did, 16)
     else:
         desired_did = int(desired_did)
     
+    # If the MWBs of the ECU-VARIANT are cached, only the requested one is loaded from the cache (nothing is loaded from the Project)
+    if mwb_model_cache is not None and mwb_model_cache.is_valid(project_folder_path, pool_id, desired_ecu_variant):
+        mwb_row = mwb_model_cache.get_mwb(project_folder_path, pool_id, desired_ecu_variant, desired_did)
+        available_dids = None
+    else:
+        # The strings database is only needed now
+        if object_loader is None:
+            object_loader = ObjectLoader(pbl_record_manager, StringStorage(project_folder_path))
+        
+        mwb_rows = load_mwb_rows(object_loader, project_folder_path, pool_id, desired_ecu_variant)
+        if mwb_model_cache is not None:
+            mwb_model_cache.store(project_folder_path, pool_id, desired_ecu_variant, object_loader.get_accessed_pool_ids(), mwb_rows)
+        
+        mwb_row = mwb_rows.get(desired_did)
+        available_dids = sorted(mwb_rows)
+    
     # If the requested DID does not exist, print the list of available DIDs
-    if desired_did not in mwb_keys:
+    if mwb_row is None:
+        if available_dids is None:
+            available_dids = mwb_model_cache.get_dids(project_folder_path, pool_id, desired_ecu_variant)
         object_printer.print_indented(0, 'Available DIDs:')
-        for did in sorted(mwb_keys):
+        for did in available_dids:
             object_printer.print_indented(1, '{:04X}'.format(did))
         object_printer.print_indented(0, '')
         raise RuntimeError('DID {:04X} does not exist'.format(desired_did))
     
-    # Get the request MWB's name and corresponding table row parameter
-    table_row_result = get_mwb_name_and_table_row_parameter_by_did(object_loader, project_folder_path, mwb_keys, mwb_table, desired_did)
-    if table_row_result is None:
+    # Unpack the request MWB's name and corresponding table row parameter
+    mwb_long_name, mwb_long_name_id, mwb_table_row_parameter = mwb_row
+    if mwb_table_row_parameter is None:
         raise RuntimeError('Failed to find MWB table row')
-    else:
-        # Unpack the result
-        mwb_long_name, mwb_long_name_id, mwb_table_row_parameter = table_row_result
     
     # Get the corresponding STRUCTURE parameter of the requested MWB
     mwb_structure = get_mwb_structure(object_loader, project_folder_path, mwb_table_row_parameter)
@@ -1518,6 +1565,7 @@ if __name__ == '__main__':
     parser.add_argument('response', help='Bytes of UDS response, written in HEX (without the positive response byte, DID, etc.)')
     parser.add_argument('translation_database_folder_path', help='Folder containing the translation database (e.g. ".../DIDB/db")', nargs='?')
     parser.add_argument('translation_language', help='Language for translations (e.g. "en_US")', nargs='?')
+    parser.add_argument('--cache', dest='cache_file_path', default=None, help='SQLite file where the MWBs of each ECU-VARIANT are kept, so later runs only load the requested one (created if it doesn\'t exist)')
     args = parser.parse_args()
     
     # The project_folder_path argument must be a path to a folder
@@ -1527,17 +1575,26 @@ if __name__ == '__main__':
     # The project name is the name of the last folder in the path
     project_name = os.path.basename(args.project_folder_path)
     
-    # Create an instance of the StringStorage class, used for loading the strings database
-    # The strings database is unique to each Project
-    string_storage = StringStorage(args.project_folder_path)
-    
-    # An instance of the ObjectLoader class is used for loading Objects and references from the BASE-VARIANT Pool
-    # The first parameter (instance of the PblRecordManager class) is needed here since PBL records will be handled "internally"
-    object_loader = ObjectLoader(pbl_record_manager, string_storage)
+    # With the MWB model cache, the strings database is only loaded if the cache can't be used (see app_parseMWB)
+    object_loader = None
+    mwb_model_cache = None
+    if args.cache_file_path is not None:
+        mwb_model_cache = MwbModelCache(args.cache_file_path)
+    else:
+        # Create an instance of the StringStorage class, used for loading the strings database
+        # The strings database is unique to each Project
+        string_storage = StringStorage(args.project_folder_path)
+        
+        # An instance of the ObjectLoader class is used for loading Objects and references from the BASE-VARIANT Pool
+        # The first parameter (instance of the PblRecordManager class) is needed here since PBL records will be handled "internally"
+        object_loader = ObjectLoader(pbl_record_manager, string_storage)
     
     # Initialize the LONG-NAME translation (if the optional arguments are not given, nothing is really done)
     # The file "hsqldb.jar" should be in the working directory, in the "bin" folder
     long_name_translation = LongNameTranslation('bin/hsqldb.jar', args.translation_database_folder_path, args.translation_language)
     
     # Run the app
-    app_parseMWB(object_loader, long_name_translation, args.project_folder_path, args.base_variant_filename, args.ecu_variant_name, args.did, args.response)
+    app_parseMWB(object_loader, long_name_translation, args.project_folder_path, args.base_variant_filename, args.ecu_variant_name, args.did, args.response, mwb_model_cache)
+    
+    if mwb_model_cache is not None:
+        mwb_model_cache.close()
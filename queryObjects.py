@@ -0,0 +1,305 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import re
+import sys
+import time
+import traceback
+
+from common_utils import enum_converters, project_builds
+from classes.PblRecordManager import PblRecordManager
+from classes.StringStorage import StringStorage
+from classes.DbStream import DbStream
+from classes import DbObject
+
+
+# Import the `__all__` list from the "__init__.py" module of the "object_loaders" package as the list of supported Objects to unpack
+from object_loaders import __all__ as supported_object_types
+
+
+# PBL is needed for parsing .key files, which will be done by the PblRecordManager class
+# The file "pbl.dll" should be in the working directory, in the "bin" folder
+# Each worker process imports this module again, so it gets its own instance
+pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
+pbl_record_manager = PblRecordManager(pbl_dll_path)
+
+
+# Operators which can be used in predicates, longest first so '==' isn't read as '='
+predicate_operators = ['==', '!=', '=~', '>=', '<=', '>', '<']
+
+
+# StringStorage of the Project currently queried by a worker process, as (project_folder_path, string_storage)
+worker_string_storage = (None, None)
+
+
+# Get the StringStorage of a Project in a worker process
+### project_folder_path = Project path (folder with .db and .key files)
+def get_worker_string_storage(project_folder_path):
+    global worker_string_storage
+    if worker_string_storage[0] != project_folder_path:
+        worker_string_storage = (project_folder_path, StringStorage(project_folder_path))
+    return worker_string_storage[1]
+
+
+# Parse a predicate given on the command line
+### predicate_string = predicate like 'semantic==X', 'compu_category==eTEXTTAB' or 'parameters[*].short_name=~^Param'
+# * returns a (path, operator, value) tuple, where the path is a list of keys and indices ('*' = any list item)
+def parse_predicate(predicate_string):
+    match = re.fullmatch(r'([^=!~<>]+)(==|!=|=~|>=|<=|>|<)(.*)', predicate_string)
+    if match is None:
+        raise RuntimeError('Invalid predicate: {} (must be "field<operator>value", with operator in {})'.format(predicate_string, ', '.join(predicate_operators)))
+    (path_string, operator, value) = match.groups()
+    
+    # The path uses the same format as the differences from diffProjects (e.g. 'parameters[2].dop.object_id')
+    path = []
+    for part in path_string.strip().split('.'):
+        part_match = re.fullmatch(r'([^\[\]]*)((?:\[(?:\d+|\*)\])*)', part)
+        if part_match is None:
+            raise RuntimeError('Invalid field in predicate: {}'.format(path_string))
+        if part_match.group(1) != '':
+            path.append(part_match.group(1))
+        for index in re.findall(r'\[(\d+|\*)\]', part_match.group(2)):
+            path.append(index if index == '*' else int(index))
+    
+    if operator == '=~':
+        value = re.compile(value)
+    return (path, operator, value)
+
+
+# Get the values found at a path in a loaded object
+### obj  = loaded object (or part of one)
+### path = list of keys and indices, from `parse_predicate`
+# * returns a list of values (empty if the path doesn't exist)
+def get_values(obj, path):
+    if len(path) == 0:
+        return [obj]
+    (key, remaining_path) = (path[0], path[1:])
+    
+    if key == '*':
+        if type(obj) is not list:
+            return []
+        return [value for item in obj for value in get_values(item, remaining_path)]
+    if type(obj) is dict and key in obj:
+        return get_values(obj[key], remaining_path)
+    if type(obj) is list and type(key) is int and key < len(obj):
+        return get_values(obj[key], remaining_path)
+    return []
+
+
+# Compare a simple value from an object with the value of a predicate
+### value           = value from the loaded object
+### operator        = one of `predicate_operators`
+### predicate_value = value given on the command line (string, or compiled regex for '=~')
+def compare_value(value, operator, predicate_value):
+    if operator == '=~':
+        return value is not None and predicate_value.search(str(value)) is not None
+    
+    # Numbers are compared as numbers, anything else as text (None is written as 'None', like in the dumps)
+    if type(value) in (int, float):
+        try:
+            predicate_value = type(value)(int(predicate_value, 0) if type(value) is int else predicate_value)
+        except ValueError:
+            return operator == '!='
+    else:
+        value = str(value)
+    
+    if operator == '==':
+        return value == predicate_value
+    if operator == '!=':
+        return value != predicate_value
+    if operator == '>=':
+        return value >= predicate_value
+    if operator == '<=':
+        return value <= predicate_value
+    if operator == '>':
+        return value > predicate_value
+    return value < predicate_value
+
+
+# Check whether a loaded object matches all predicates
+# For paths which lead to several values (via '[*]'), one matching value is enough
+### obj        = loaded object
+### predicates = list of (path, operator, value) tuples, from `parse_predicate`
+def matches_predicates(obj, predicates):
+    for (path, operator, predicate_value) in predicates:
+        if not any(compare_value(value, operator, predicate_value) for value in get_values(obj, path)):
+            return False
+    return True
+
+
+# Convert values which JSON can't represent
+### value = value from a loaded object
+def get_json_value(value):
+    if type(value) in (bytes, bytearray):
+        return value.hex(' ').upper()
+    raise TypeError('Cannot convert {} to JSON'.format(type(value).__name__))
+
+
+# Query all Objects of a Pool (run in a worker process)
+### project_folder_path = Project path (folder with .db and .key files)
+### PoolID              = name of the Pool
+### object_type_enums   = set of object type enums to load (None = all supported types)
+### predicates          = list of (path, operator, value) tuples, from `parse_predicate`
+# * returns a list of JSON lines, one for each matching Object, and a list of (ObjectID, error) tuples for Objects which failed to load
+def query_pool(project_folder_path, PoolID, object_type_enums, predicates):
+    string_storage = get_worker_string_storage(project_folder_path)
+    project_name = os.path.basename(os.path.abspath(project_folder_path))
+    lines = []
+    failures = []
+    
+    pbl_records = pbl_record_manager.get_all_records(project_folder_path, PoolID)
+    
+    # Open the .db file once for all Objects, and read the Objects in file order
+    with open(os.path.join(project_folder_path, PoolID + '.db'), 'rb') as db_file:
+        for ObjectID_hash, pbl_data in sorted(pbl_records.items(), key=lambda x: PblRecordManager.parse_pbl_data(x[1])[0]):
+            (file_position, compressed_size, decompressed_size) = PblRecordManager.parse_pbl_data(pbl_data)
+            
+            stream = None
+            try:
+                compressed_data = PblRecordManager.get_compressed_object_data(db_file, file_position, compressed_size)
+                
+                # Only the header is inflated to get the type, so Objects of other types are never decompressed
+                object_type_enum = PblRecordManager.get_object_type_enum_from_compressed_data(compressed_data)
+                if object_type_enums is None:
+                    if enum_converters.object_types.get(object_type_enum) not in supported_object_types:
+                        continue
+                elif object_type_enum not in object_type_enums:
+                    continue
+                
+                # Load the Object from its own stream, and read out the remaining bytes, so the stream doesn't print anything when it's destroyed
+                stream = DbStream(PblRecordManager.decompress_object_data(compressed_data, decompressed_size), string_storage)
+                obj = DbObject.load_object_from_stream(stream)
+                stream.read(stream.get_length())
+            except Exception as e:
+                # The stream of an Object which failed to load still has bytes, which it would print to stdout (among the results) when it's destroyed
+                if stream is not None:
+                    stream.read(stream.get_length())
+                failures.append((string_storage.get_ascii_string(ObjectID_hash), '{}: {}'.format(type(e).__name__, e)))
+                continue
+            
+            if matches_predicates(obj, predicates):
+                line = {'project': project_name, 'pool_id': PoolID, 'object_id': string_storage.get_ascii_string(ObjectID_hash), 'object': obj}
+                lines.append(json.dumps(line, default=get_json_value))
+    
+    return (lines, failures)
+
+
+# Query all Pools of the given Projects in parallel, writing each matching Object as a JSON line
+### project_folder_paths = list of Project paths (folders with .db and .key files)
+### output_file          = opened text file (or stdout) for the results
+### object_type_enums    = set of object type enums to load (None = all supported types)
+### predicates           = list of (path, operator, value) tuples, from `parse_predicate`
+### jobs                 = number of worker processes (None = number of CPUs)
+# * returns the number of matching Objects
+def query_projects(project_folder_paths, output_file, object_type_enums, predicates, jobs = None):
+    match_count = 0
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        # All Pools of all Projects are submitted at once, and the results of each Pool are written as soon as it's done
+        futures = {}
+        for project_folder_path in project_folder_paths:
+            for PoolID in project_builds.get_pool_ids(project_folder_path):
+                futures[executor.submit(query_pool, project_folder_path, PoolID, object_type_enums, predicates)] = (project_folder_path, PoolID)
+        
+        for future in concurrent.futures.as_completed(futures):
+            (project_folder_path, PoolID) = futures[future]
+            (lines, failures) = future.result()
+            
+            for line in lines:
+                output_file.write(line + '\n')
+            output_file.flush()
+            match_count += len(lines)
+            
+            # Status messages go to stderr, so the results can be piped
+            for (ObjectID, error) in failures:
+                print('{}/{} {}: failed to load: {}'.format(os.path.basename(project_folder_path), PoolID, ObjectID, error), file=sys.stderr)
+    
+    print('Found {} matching Objects in {} Pools'.format(match_count, len(futures)), file=sys.stderr)
+    return match_count
+
+
+# Run the query, displaying the elapsed time even if an error occurs
+### project_folder_paths = list of Project paths (folders with .db and .key files)
+### object_types         = list of object type names to query (None = all supported types)
+### predicates           = list of predicate strings, see `parse_predicate`
+### output_file_path     = path to the JSON Lines output file (None = stdout)
+### jobs                 = number of worker processes (None = number of CPUs)
+def run_query(project_folder_paths, object_types, predicates, output_file_path, jobs):
+    # Get the starting timestamp
+    start_time = time.time()
+    
+    # Run the app
+    # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
+    try:
+        # Convert the object type names to enums, so they can be compared with the Object headers
+        object_type_enums = None
+        if object_types is not None:
+            object_type_enums = set()
+            for object_type in object_types:
+                if object_type not in supported_object_types:
+                    raise RuntimeError('Unsupported object type: {}'.format(object_type))
+                object_type_enums.update(enum for enum, name in enum_converters.object_types.items() if name == object_type)
+        
+        parsed_predicates = [parse_predicate(x) for x in (predicates or [])]
+        
+        if output_file_path is None:
+            query_projects(project_folder_paths, sys.stdout, object_type_enums, parsed_predicates, jobs)
+        else:
+            with open(output_file_path, 'w', encoding='utf-8') as output_file:
+                query_projects(project_folder_paths, output_file, object_type_enums, parsed_predicates, jobs)
+    except:
+        print('Error:\n{}'.format(traceback.format_exc()), file=sys.stderr)
+    
+    # Get the elapsed time and split it into hours, minutes, seconds
+    elapsed_seconds = time.time() - start_time
+    (hours, remainder) = divmod(elapsed_seconds, 3600)
+    (minutes, seconds) = divmod(remainder, 60)
+    
+    # Display the time taken by the script to run
+    print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)), file=sys.stderr)
+
+
+def queryObjects_project(project_folder_path, object_types = None, predicates = None, output_file_path = None, jobs = None):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    run_query([project_folder_path], object_types, predicates, output_file_path, jobs)
+
+
+def queryObjects_projects(projects_folder_path, object_types = None, predicates = None, output_file_path = None, jobs = None):
+    if not os.path.isdir(projects_folder_path):
+        raise RuntimeError('Must provide folder to all projects')
+    
+    # A valid project must contain string databases
+    run_query(project_builds.get_project_folder_paths(projects_folder_path), object_types, predicates, output_file_path, jobs)
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find Objects of MCD projects by type and field values, and write them as JSON Lines')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # Arguments shared by all commands
+    def add_query_arguments(subparser):
+        subparser.add_argument('--type', dest='object_types', action='append', default=None, help='Object type to query (e.g. MCD_DB_PARAMETER), can be given multiple times (default: all types)')
+        subparser.add_argument('--where', dest='predicates', action='append', default=None, help='Predicate which matching Objects must satisfy (e.g. "semantic==DATA" or "parameters[*].short_name=~^Param_"), can be given multiple times')
+        subparser.add_argument('--output', dest='output_file_path', default=None, help='JSON Lines output file (default: stdout)')
+        subparser.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    
+    # All Pools of a project
+    parser_project = subparsers.add_parser('project', help='Query all Pools of a project')
+    parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    add_query_arguments(parser_project)
+    parser_project.set_defaults(func=queryObjects_project)
+    
+    # All Pools of all projects
+    parser_all_projects = subparsers.add_parser('projects', help='Query all Pools of all projects')
+    parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
+    add_query_arguments(parser_all_projects)
+    parser_all_projects.set_defaults(func=queryObjects_projects)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)
@@ -0,0 +1,60 @@
+import argparse
+import os
+
+from classes.DtcIndex import DtcIndex
+
+
+# Display rows of the index
+### rows = list of rows returned by DtcIndex
+def print_rows(rows):
+    for (project_name, base_variant_name, variant_name, dtc_dop_name, trouble_code, display_trouble_code, level, description, long_name_id, translated_description) in rows:
+        print('{} {} {} {} 0x{:06X} {} (level {}) - {} - {} {}'.format(project_name, base_variant_name, variant_name, dtc_dop_name, trouble_code, display_trouble_code, level, description, long_name_id, translated_description))
+
+
+def searchDtcs_code(index_file_path, trouble_code, project_name = None):
+    if not os.path.isfile(index_file_path):
+        raise RuntimeError('DTC index not found: {}'.format(index_file_path))
+    
+    dtc_index = DtcIndex(index_file_path)
+    rows = dtc_index.find_trouble_code(int(trouble_code, 16), project_name)
+    if len(rows) == 0:
+        print('Trouble code {} is not defined by any variant'.format(trouble_code))
+    print_rows(rows)
+    dtc_index.close()
+
+
+def searchDtcs_text(index_file_path, text_query, project_name = None):
+    if not os.path.isfile(index_file_path):
+        raise RuntimeError('DTC index not found: {}'.format(index_file_path))
+    
+    dtc_index = DtcIndex(index_file_path)
+    rows = dtc_index.search_text(text_query, project_name)
+    if len(rows) == 0:
+        print('No DTC matches {}'.format(text_query))
+    print_rows(rows)
+    dtc_index.close()
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Search the DTC index written by dumpDTC (with --index)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # Variants which define a trouble code
+    parser_code = subparsers.add_parser('code', help='Find all variants which define a trouble code')
+    parser_code.add_argument('index_file_path', help='Path of the SQLite DTC index')
+    parser_code.add_argument('trouble_code', help='Trouble code, specified as three HEX bytes')
+    parser_code.add_argument('--project', dest='project_name', default=None, help='Only search this project')
+    parser_code.set_defaults(func=searchDtcs_code)
+    
+    # DTCs with matching texts
+    parser_text = subparsers.add_parser('text', help='Find all DTCs whose texts (trouble code text, description, translated description) match a full-text query')
+    parser_text.add_argument('index_file_path', help='Path of the SQLite DTC index')
+    parser_text.add_argument('text_query', help='SQLite FTS5 query (e.g. "throttle AND sensor", "lambda*")')
+    parser_text.add_argument('--project', dest='project_name', default=None, help='Only search this project')
+    parser_text.set_defaults(func=searchDtcs_text)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)
@@ -0,0 +1,181 @@
+import argparse
+import concurrent.futures
+import os
+import struct
+import time
+import traceback
+
+from common_utils import enum_converters
+from classes.PblRecordManager import PblRecordManager
+from classes.ObjectLoader import ObjectLoader
+from classes.StringStorage import StringStorage
+from classes.StringIndex import StringIndex
+from classes.ReferenceGraph import ReferenceGraph
+
+
+# Import the `__all__` list from the "__init__.py" module of the "object_loaders" package as the list of supported Objects to unpack
+from object_loaders import __all__ as supported_object_types
+
+
+# PBL is needed for parsing .key files, which will be done by the PblRecordManager class
+# The file "pbl.dll" should be in the working directory, in the "bin" folder
+# Each worker process imports this module again, so it gets its own instance
+pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
+pbl_record_manager = PblRecordManager(pbl_dll_path)
+
+
+# StringStorage of the Project, loaded once in each worker process
+worker_string_storage = None
+
+
+# Load the strings database in a worker process
+### project_folder_path = Project path (folder with .db and .key files)
+def init_worker(project_folder_path):
+    global worker_string_storage
+    worker_string_storage = StringStorage(project_folder_path)
+
+
+# Get the size and modification time of the files an index is built from (string databases and Pools), keyed by filename
+### project_folder_path = Project path (folder with .db and .key files)
+def get_source_files(project_folder_path):
+    source_files = {}
+    for current_filename in sorted(os.listdir(project_folder_path)):
+        current_file_path = os.path.join(project_folder_path, current_filename)
+        if (current_filename.startswith(('AStringData.', 'UStringData.')) or current_filename.endswith('.db')) and os.path.isfile(current_file_path):
+            current_file_stat = os.stat(current_file_path)
+            source_files[current_filename] = [current_file_stat.st_size, current_file_stat.st_mtime_ns]
+    return source_files
+
+
+# Load all Objects of a Pool and get the strings used by each one (run in a worker process)
+### project_folder_path = Project path (folder with .db and .key files)
+### PoolID              = name of the Pool
+# * returns a list of (PoolID, ObjectID, string references) tuples, and a list of (ObjectID, error) tuples for the Objects which failed to load
+def get_pool_strings(project_folder_path, PoolID):
+    object_loader = ObjectLoader(None, worker_string_storage)
+    string_usage = []
+    failures = []
+    
+    # Load all records from the .key file
+    pbl_records = pbl_record_manager.get_all_records(project_folder_path, PoolID)
+    
+    # Open the .db file once for all Objects
+    with open(os.path.join(project_folder_path, PoolID + '.db'), 'rb') as db_file:
+        for ObjectID_hash, pbl_data in pbl_records.items():
+            ObjectID = worker_string_storage.get_ascii_string(ObjectID_hash)
+            
+            try:
+                object_data = ObjectLoader.get_object_data_from_opened_db_file(pbl_data, db_file)
+                
+                # Only attempt to parse known object types
+                object_type = enum_converters.object_types.get(struct.unpack('<H', object_data[:2])[0])
+                if object_type not in supported_object_types:
+                    continue
+                
+                # All strings retrieved while loading the Object are recorded
+                worker_string_storage.start_recording_strings()
+                object_loader.load_object_by_object_data(object_data)
+                string_usage.append((PoolID, ObjectID, worker_string_storage.stop_recording_strings()))
+            except Exception as e:
+                worker_string_storage.stop_recording_strings()
+                failures.append((ObjectID, '{}: {}'.format(type(e).__name__, e)))
+    
+    return (string_usage, failures)
+
+
+# Load the string index of a Project from its cache file, or build it if the Project changed since it was saved
+### project_folder_path = Project path (folder with .db and .key files)
+### index_file_path     = path of the index file
+### rebuild             = whether to build the index even if the cached one is valid
+### jobs                = number of worker processes (None = number of CPUs)
+def get_string_index(project_folder_path, index_file_path, rebuild = False, jobs = None):
+    source_files = get_source_files(project_folder_path)
+    
+    if not rebuild and os.path.isfile(index_file_path):
+        string_index = StringIndex.load(index_file_path)
+        if string_index.source_files == source_files:
+            return string_index
+        print('Project changed, building index again')
+    
+    # The PoolID simply refers to the file's name (without extension)
+    pool_ids = [os.path.splitext(x)[0] for x in source_files if x.endswith('.db')]
+    
+    # The Pools are loaded in parallel, to find which Objects use each string
+    string_usage = []
+    failure_count = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(project_folder_path,)) as executor:
+        futures = {executor.submit(get_pool_strings, project_folder_path, PoolID): PoolID for PoolID in pool_ids}
+        for future in concurrent.futures.as_completed(futures):
+            (pool_string_usage, failures) = future.result()
+            string_usage += pool_string_usage
+            for (ObjectID, error) in failures:
+                print('Failed to load {} from {}: {}'.format(ObjectID, futures[future], error))
+            failure_count += len(failures)
+    
+    string_index = StringIndex()
+    string_index.build(StringStorage(project_folder_path), sorted(string_usage, key=lambda x: (x[0], str(x[1]))), source_files)
+    string_index.save(index_file_path)
+    
+    (string_count, trigram_count, object_count) = string_index.get_size()
+    print('Indexed {} strings ({} trigrams) used by {} Objects ({} Objects failed to load)\n'.format(string_count, trigram_count, object_count, failure_count))
+    return string_index
+
+
+def searchStrings_project(project_folder_path, index_file_path, text, graph_file_path = None, recursive = False, rebuild = False, jobs = None):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    # Get the starting timestamp
+    start_time = time.time()
+    
+    # Run the app
+    # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
+    try:
+        string_index = get_string_index(project_folder_path, index_file_path, rebuild, jobs)
+        
+        # The reference graph (from buildReferenceGraph) shows where the Objects using the strings are used
+        graph = None if graph_file_path is None else ReferenceGraph.load(graph_file_path)
+        
+        search_start_time = time.time()
+        matches = string_index.search(text)
+        print('Found {} strings in {:.1f} ms'.format(len(matches), 1000 * (time.time() - search_start_time)))
+        
+        for (string_type, string_hash, string) in matches:
+            print('\n{} 0x{:08X} \'{}\''.format(string_type, string_hash, string))
+            for (PoolID, ObjectID) in string_index.get_objects(string_type, string_hash):
+                print('    {} {}'.format(PoolID, ObjectID))
+                if graph is not None:
+                    for (referencing_PoolID, referencing_ObjectID) in graph.get_referencing_objects(PoolID, ObjectID, recursive):
+                        print('        <- {} {}'.format(referencing_PoolID, referencing_ObjectID))
+    except:
+        print('Error:\n{}'.format(traceback.format_exc()))
+    
+    # Get the elapsed time and split it into hours, minutes, seconds
+    elapsed_seconds = time.time() - start_time
+    (hours, remainder) = divmod(elapsed_seconds, 3600)
+    (minutes, seconds) = divmod(remainder, 60)
+    
+    # Display the time taken by the script to run
+    print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find the strings of an MCD project containing a text, and the Objects which use them')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # Search the strings of a project
+    parser_project = subparsers.add_parser('project', help='Search the strings of a project')
+    parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('index_file_path', help='Path of the index file (built if it doesn\'t exist or the project changed)')
+    parser_project.add_argument('text', help='Text to search for (case-insensitive)')
+    parser_project.add_argument('--graph', dest='graph_file_path', default=None, help='Reference graph of the project (from buildReferenceGraph), for listing the Objects which reference the matches')
+    parser_project.add_argument('--recursive', action='store_true', help='With --graph, also list the Objects which reference those, and so on')
+    parser_project.add_argument('--rebuild', action='store_true', help='Build the index even if the cached one is valid')
+    parser_project.add_argument('--jobs', type=int, default=None, help='Number of worker processes for building the index (default: number of CPUs)')
+    parser_project.set_defaults(func=searchStrings_project)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)
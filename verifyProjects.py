@@ -0,0 +1,212 @@
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+import traceback
+import zlib
+
+from common_utils import enum_converters, project_builds
+from classes.PblRecordManager import PblRecordManager
+from classes.StringStorage import StringStorage
+from classes.DbStream import DbStream
+from classes import DbObject
+
+
+# Import the `__all__` list from the "__init__.py" module of the "object_loaders" package as the list of supported Objects to unpack
+from object_loaders import __all__ as supported_object_types
+
+
+# PBL is needed for parsing .key files, which will be done by the PblRecordManager class
+# The file "pbl.dll" should be in the working directory, in the "bin" folder
+# Each worker process imports this module again, so it gets its own instance
+pbl_dll_path = os.path.join(os.path.abspath(os.getcwd()), 'bin/pbl.dll')
+pbl_record_manager = PblRecordManager(pbl_dll_path)
+
+
+# StringStorage of the Project currently verified by a worker process, as (project_folder_path, string_storage)
+# The Pools are submitted Project by Project, so it's rarely loaded again
+worker_string_storage = (None, None)
+
+
+# Get the StringStorage of a Project in a worker process
+### project_folder_path = Project path (folder with .db and .key files)
+def get_worker_string_storage(project_folder_path):
+    global worker_string_storage
+    if worker_string_storage[0] != project_folder_path:
+        worker_string_storage = (project_folder_path, StringStorage(project_folder_path))
+    return worker_string_storage[1]
+
+
+# Check an Object's data
+### compressed_data   = zlib stream read from the .db file
+### pbl_data          = PBL record data of the Object
+### string_storage    = instance of StringStorage, loaded from the Object's Project
+# * returns the type of the problem and its description, or None if the Object is valid
+def verify_object(compressed_data, pbl_data, string_storage):
+    (file_position, compressed_size, decompressed_size) = PblRecordManager.parse_pbl_data(pbl_data)
+    
+    # The .db file may be shorter than the PBL record says
+    if len(compressed_data) != compressed_size:
+        return ('truncated', 'read {} of {} bytes at 0x{:X}'.format(len(compressed_data), compressed_size, file_position))
+    
+    # The zlib stream must be valid
+    try:
+        object_data = bytearray(zlib.decompress(compressed_data))
+    except zlib.error as e:
+        return ('corrupt stream', str(e))
+    
+    # Its decompressed length must match the PBL record
+    if len(object_data) != decompressed_size:
+        return ('length mismatch', '{} bytes, PBL record says {}'.format(len(object_data), decompressed_size))
+    
+    # Only attempt to load known object types
+    if len(object_data) < 2:
+        return ('length mismatch', 'only {} bytes'.format(len(object_data)))
+    object_type = enum_converters.object_types.get(int.from_bytes(object_data[:2], 'little'))
+    if object_type not in supported_object_types:
+        return None
+    
+    # Load the Object from its own stream, so the remaining bytes can be checked
+    stream = DbStream(object_data, string_storage)
+    try:
+        DbObject.load_object_from_stream(stream)
+    except Exception as e:
+        return ('load error', '{}: {}'.format(type(e).__name__, e))
+    
+    # After an Object is fully loaded, its stream must only contain the 3-byte terminator
+    # The remaining bytes are read here, so the stream doesn't print them again when it's destroyed
+    remaining_data = stream.read(stream.get_length())
+    if len(remaining_data) > 3:
+        return ('leftover bytes', '{} bytes ({}): {}'.format(len(remaining_data) - 3, object_type, DbStream.bytearray_to_string(remaining_data[:-3][:64])))
+    
+    return None
+
+
+# Verify all Objects of a Pool (run in a worker process)
+### project_folder_path = Project path (folder with .db and .key files)
+### PoolID              = name of the Pool
+# * returns the number of verified Objects, and a list of (ObjectID, problem type, description) tuples
+def verify_pool(project_folder_path, PoolID):
+    string_storage = get_worker_string_storage(project_folder_path)
+    problems = []
+    
+    pbl_records = pbl_record_manager.get_all_records(project_folder_path, PoolID)
+    
+    # Open the .db file once for all Objects, and read the Objects in file order
+    with open(os.path.join(project_folder_path, PoolID + '.db'), 'rb') as db_file:
+        for ObjectID_hash, pbl_data in sorted(pbl_records.items(), key=lambda x: PblRecordManager.parse_pbl_data(x[1])[0]):
+            ObjectID = string_storage.get_ascii_string(ObjectID_hash)
+            if ObjectID is None:
+                problems.append(('0x{:08X}'.format(ObjectID_hash), 'invalid ObjectID', 'hash not in strings database'))
+                ObjectID = '0x{:08X}'.format(ObjectID_hash)
+            
+            (file_position, compressed_size, decompressed_size) = PblRecordManager.parse_pbl_data(pbl_data)
+            problem = verify_object(PblRecordManager.get_compressed_object_data(db_file, file_position, compressed_size), pbl_data, string_storage)
+            if problem is not None:
+                problems.append((ObjectID,) + problem)
+    
+    return (len(pbl_records), problems)
+
+
+# Verify all Pools of the given Projects in parallel, and display the problems
+### project_folder_paths = list of Project paths (folders with .db and .key files)
+### jobs                 = number of worker processes (None = number of CPUs)
+# * returns the number of problems found
+def verify_projects(project_folder_paths, jobs = None):
+    object_count = 0
+    problem_counts = {}
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        # All Pools of all Projects are submitted at once, so the workers never wait for a Project to finish
+        futures = {}
+        for project_folder_path in project_folder_paths:
+            for PoolID in project_builds.get_pool_ids(project_folder_path):
+                futures[executor.submit(verify_pool, project_folder_path, PoolID)] = (project_folder_path, PoolID)
+        
+        for future in concurrent.futures.as_completed(futures):
+            (project_folder_path, PoolID) = futures[future]
+            project_name = os.path.basename(project_folder_path)
+            
+            # A Pool which can't be read at all (e.g. broken .key file) is one problem
+            try:
+                (pool_object_count, problems) = future.result()
+            except Exception as e:
+                (pool_object_count, problems) = (0, [(None, 'unreadable pool', '{}: {}'.format(type(e).__name__, e))])
+            
+            object_count += pool_object_count
+            for (ObjectID, problem_type, description) in problems:
+                print('{}/{} {}: {}: {}'.format(project_name, PoolID, ObjectID, problem_type, description))
+                problem_counts[problem_type] = problem_counts.get(problem_type, 0) + 1
+    
+    print('\nVerified {} Objects in {} Pools'.format(object_count, len(futures)))
+    for problem_type, problem_count in sorted(problem_counts.items()):
+        print('    {}: {}'.format(problem_type, problem_count))
+    
+    return sum(problem_counts.values())
+
+
+# Run the verification, displaying the elapsed time even if an error occurs
+### project_folder_paths = list of Project paths (folders with .db and .key files)
+### jobs                 = number of worker processes (None = number of CPUs)
+def run_verification(project_folder_paths, jobs):
+    # Get the starting timestamp
+    start_time = time.time()
+    
+    # Run the app
+    # Catch any exceptions, so the elapsed time can be displayed even if an unpacking error occurs
+    problem_count = None
+    try:
+        problem_count = verify_projects(project_folder_paths, jobs)
+    except:
+        print('Error:\n{}'.format(traceback.format_exc()))
+    
+    # Get the elapsed time and split it into hours, minutes, seconds
+    elapsed_seconds = time.time() - start_time
+    (hours, remainder) = divmod(elapsed_seconds, 3600)
+    (minutes, seconds) = divmod(remainder, 60)
+    
+    # Display the time taken by the script to run
+    print('\nElapsed: {:02}:{:02}:{:02}'.format(int(hours), int(minutes), int(seconds)))
+    
+    # Exit with an error if anything was found, so the script can be used as a health check
+    if problem_count != 0:
+        sys.exit(1)
+
+
+def verifyProjects_project(project_folder_path, jobs = None):
+    if not os.path.isdir(project_folder_path):
+        raise RuntimeError('Project must be folder')
+    
+    run_verification([project_folder_path], jobs)
+
+
+def verifyProjects_projects(projects_folder_path, jobs = None):
+    if not os.path.isdir(projects_folder_path):
+        raise RuntimeError('Must provide folder to all projects')
+    
+    # A valid project must contain string databases
+    run_verification(project_builds.get_project_folder_paths(projects_folder_path), jobs)
+
+
+# Handle usage as script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check that all Objects of MCD projects can be read and loaded, without writing anything')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    # All Pools of a project
+    parser_project = subparsers.add_parser('project', help='Verify all Pools of a project')
+    parser_project.add_argument('project_folder_path', help='MCD project (folder containing .db and .key files)')
+    parser_project.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_project.set_defaults(func=verifyProjects_project)
+    
+    # All Pools of all projects
+    parser_all_projects = subparsers.add_parser('projects', help='Verify all Pools of all projects')
+    parser_all_projects.add_argument('projects_folder_path', help='MCD projects (folder containing folders containing .db and .key files)')
+    parser_all_projects.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser_all_projects.set_defaults(func=verifyProjects_projects)
+    
+    # Parse the provided arguments and call the appropriate function based on the command
+    args = parser.parse_args()
+    filtered_args = {k: v for k, v in vars(args).items() if k not in ('func', 'command')}
+    args.func(**filtered_args)